@@ -0,0 +1,373 @@
+"""
+EchoLens - HTTP API
+Headless async API for predictions, comparisons, quick risk and batches
+
+Run: uvicorn api:app --host 0.0.0.0 --port 8000
+
+All work happens on one event loop with the async Groq client, sharing the
+response cache, rate limits and prompts with the dashboard. The /stream
+endpoints send Server-Sent Events: `chunk` ({"text": ...}) as text arrives,
+then `done`, or `error` if the response fails partway.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Annotated, Optional
+
+import groq
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, StringConstraints, field_validator
+
+from async_client import AsyncEchoLensAI
+from batch_predict import to_record
+from case_series import get_case_series
+from groq_client import BatchItem, EchoLensAI
+from history import HistoryStore
+from prewarm import Prewarmer
+from prompts import PREDICTION_SECTIONS, PromptBudgetError
+from scheduler import CircuitOpenError, DeadlineExceededError
+from telemetry import metrics
+
+
+MAX_BATCH = int(os.getenv('ECHOLENS_API_MAX_BATCH', '100'))
+
+Region = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=100)]
+Cases = Annotated[int, Field(ge=0, le=10_000_000_000)]
+
+
+class OutbreakRequest(BaseModel):
+    region: Region
+    current_cases: Cases
+
+
+class SituationRequest(OutbreakRequest):
+    # Pathogen or transmission hint, e.g. "H5N1 influenza"; selects the historical context
+    pathogen: Optional[str] = Field(None, max_length=200)
+    # Case-trend line for the prompt; looked up in ECHOLENS_CASE_SERIES when omitted
+    trend: Optional[str] = Field(None, max_length=500)
+
+
+class PredictRequest(SituationRequest):
+    forecast_days: int = Field(90, ge=7, le=365)
+    structured: bool = True
+    sections: Optional[list[str]] = Field(None, min_length=1)
+
+    @field_validator("sections")
+    @classmethod
+    def known_sections(cls, sections):
+        unknown = set(sections or ()) - {section.key for section in PREDICTION_SECTIONS}
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+        return sections
+
+
+class BatchRequest(BaseModel):
+    requests: list[PredictRequest] = Field(min_length=1, max_length=MAX_BATCH)
+
+
+class ConcurrencyLimiter:
+    """Admission control for API requests
+
+    At most max_concurrency requests run at once (a stream counts until it
+    ends); up to max_pending more wait for a slot, and the rest are turned
+    away so a burst can't pile up unbounded work.
+    """
+
+    def __init__(self, max_concurrency=256, max_pending=512):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    def from_env(cls):
+        """Build from ECHOLENS_API_MAX_CONCURRENCY / ECHOLENS_API_MAX_PENDING"""
+        return cls(
+            max_concurrency=int(os.getenv('ECHOLENS_API_MAX_CONCURRENCY', '256')),
+            max_pending=int(os.getenv('ECHOLENS_API_MAX_PENDING', '512'))
+        )
+
+    async def acquire(self):
+        """Wait for a slot; False if too many requests are already waiting"""
+        if self._semaphore.locked() and self.waiting >= self.max_pending:
+            return False
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting, "max_concurrency": self.max_concurrency}
+
+
+class LimitConcurrency:
+    """ASGI middleware applying a ConcurrencyLimiter to /v1/ requests, and counting them"""
+
+    def __init__(self, app, limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/v1/"):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        endpoint = path if any(getattr(route, "path", None) == path for route in scope["app"].routes) else "other"
+        started = time.perf_counter()
+        if not await self.limiter.acquire():
+            metrics.inc("api_requests_total", endpoint=endpoint, status=429)
+            response = JSONResponse(
+                {"error": "TooManyRequests", "detail": "Too many requests in progress, try again shortly"},
+                status_code=429,
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.limiter.release()
+            metrics.inc("api_requests_total", endpoint=endpoint, status=status)
+            metrics.observe("api_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+
+def error_status(error):
+    """(HTTP status, headers) for an exception raised while answering"""
+    if isinstance(error, CircuitOpenError):
+        return 503, {"Retry-After": str(math.ceil(error.retry_in))}
+    if isinstance(error, (DeadlineExceededError, groq.APITimeoutError)):
+        return 504, {}
+    if isinstance(error, PromptBudgetError):
+        return 422, {}
+    # Upstream errors, and model responses that don't parse
+    return 502, {}
+
+
+def error_body(error):
+    return {"error": type(error).__name__, "detail": str(error)}
+
+
+def sse(event, data):
+    """One Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def event_stream(events):
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def text_stream(chunks):
+    """SSE response of chunk events
+
+    The first chunk is awaited before answering, so errors raised before any
+    text (open circuit, deadline, upstream error) still get a status code.
+    """
+    try:
+        first = await anext(chunks)
+    except StopAsyncIteration:
+        first = None
+
+    async def events():
+        try:
+            if first is not None:
+                yield sse("chunk", {"text": first})
+            async for chunk in chunks:
+                yield sse("chunk", {"text": chunk})
+        except Exception as e:
+            yield sse("error", {**error_body(e), "status": error_status(e)[0]})
+            return
+        finally:
+            await chunks.aclose()
+        yield sse("done", {})
+
+    return event_stream(events())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.ai = EchoLensAI()
+    app.state.async_ai = AsyncEchoLensAI(app.state.ai)
+    app.state.limiter = limiter
+    # Ingest the configured case series now rather than on the first request
+    await asyncio.to_thread(get_case_series)
+    app.state.prewarmer = Prewarmer.from_env(app.state.ai, HistoryStore.from_env()).start()
+    yield
+    app.state.prewarmer.stop()
+    await app.state.async_ai.close()
+
+
+limiter = ConcurrencyLimiter.from_env()
+app = FastAPI(title="EchoLens API", lifespan=lifespan)
+app.add_middleware(LimitConcurrency, limiter=limiter)
+
+
+async def handle_error(request, error):
+    status, headers = error_status(error)
+    return JSONResponse(error_body(error), status_code=status, headers=headers)
+
+
+for error_type in (CircuitOpenError, DeadlineExceededError, PromptBudgetError, groq.APIError, ValueError):
+    app.add_exception_handler(error_type, handle_error)
+
+
+async def case_trend(body):
+    """The request's trend line, or the configured case series' summary of its region"""
+    if body.trend is not None:
+        return body.trend or None
+    series = await asyncio.to_thread(get_case_series)
+    summary = await asyncio.to_thread(series.summary, body.region) if series is not None else None
+    return summary.describe() if summary else None
+
+
+async def predict_item(client, semaphore, index, body):
+    """BatchItem for one request of a batch, with its result or error"""
+    item = BatchItem(index, body.region, body.current_cases, body.forecast_days)
+    async with semaphore:
+        try:
+            item.result = await client.predict(
+                body.region, body.current_cases, body.forecast_days, body.structured, body.sections,
+                await case_trend(body), body.pathogen
+            )
+        except Exception as e:
+            item.error = e
+    return item
+
+
+def batch_semaphore():
+    """Limits the predictions of one batch running at once"""
+    return asyncio.Semaphore(int(os.getenv('ECHOLENS_API_BATCH_CONCURRENCY', '8')))
+
+
+@app.get("/health")
+async def health(request: Request):
+    return {
+        "status": "ok",
+        "breaker": request.app.state.ai.scheduler.breaker.state,
+        "prewarm": request.app.state.prewarmer.last_run,
+        **request.app.state.limiter.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics.json")
+async def json_metrics():
+    return metrics.to_json()
+
+
+@app.post("/v1/predict")
+async def predict(body: PredictRequest, request: Request):
+    """Outbreak prediction: a PredictionResult object, or markdown with structured=false"""
+    result = await request.app.state.async_ai.predict(
+        body.region, body.current_cases, body.forecast_days, body.structured, body.sections,
+        await case_trend(body), body.pathogen
+    )
+    return {
+        "region": body.region,
+        "current_cases": body.current_cases,
+        "forecast_days": body.forecast_days,
+        "prediction": asdict(result) if body.structured else result,
+    }
+
+
+@app.post("/v1/predict/stream")
+async def predict_stream(body: PredictRequest, request: Request):
+    """Markdown outbreak prediction as Server-Sent Events"""
+    return await text_stream(request.app.state.async_ai.stream_prediction(
+        body.region, body.current_cases, body.forecast_days, body.sections, await case_trend(body), body.pathogen
+    ))
+
+
+@app.post("/v1/compare")
+async def compare(body: SituationRequest, request: Request):
+    """Comparison with the most similar historical pandemics"""
+    outbreak = request.app.state.ai.describe(body.region, body.current_cases, body.pathogen, await case_trend(body))
+    return {"outbreak": str(outbreak), "comparison": await request.app.state.async_ai.compare(outbreak)}
+
+
+@app.post("/v1/compare/stream")
+async def compare_stream(body: SituationRequest, request: Request):
+    """Historical comparison as Server-Sent Events"""
+    outbreak = request.app.state.ai.describe(body.region, body.current_cases, body.pathogen, await case_trend(body))
+    return await text_stream(request.app.state.async_ai.stream_comparison(outbreak))
+
+
+@app.post("/v1/quick-risk")
+async def quick_risk(body: OutbreakRequest, request: Request):
+    """Triage-model risk score and summary; escalate says whether the full analysis is warranted"""
+    ai = request.app.state.ai
+    triage = await request.app.state.async_ai.triage(body.region, body.current_cases)
+    return {
+        **asdict(triage),
+        "escalate": triage.risk_score is None or triage.risk_score >= ai.escalation_threshold,
+    }
+
+
+@app.post("/v1/batch")
+async def batch(body: BatchRequest, request: Request):
+    """Predictions for many regions; failures are reported per item instead of failing the batch"""
+    client, semaphore = request.app.state.async_ai, batch_semaphore()
+
+    items = await asyncio.gather(*(
+        predict_item(client, semaphore, index, item_body) for index, item_body in enumerate(body.requests)
+    ))
+    return {
+        "results": [to_record(item) for item in items],
+        "failed": sum(not item.ok for item in items),
+    }
+
+
+@app.post("/v1/batch/stream")
+async def batch_stream(body: BatchRequest, request: Request):
+    """Batch predictions as Server-Sent Events: an `item` event (with its index) as each completes"""
+    client, semaphore = request.app.state.async_ai, batch_semaphore()
+
+    async def events():
+        tasks = [
+            asyncio.ensure_future(predict_item(client, semaphore, index, item_body))
+            for index, item_body in enumerate(body.requests)
+        ]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                failed += not item.ok
+                yield sse("item", {"index": item.index, **to_record(item)})
+        finally:
+            # The caller went away: stop the rest of the batch
+            for task in tasks:
+                task.cancel()
+        yield sse("done", {"total": len(tasks), "failed": failed})
+
+    return event_stream(events())
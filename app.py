@@ -8,10 +8,25 @@ Run: streamlit run app.py
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
+from plotly.subplots import make_subplots
 from groq_client import EchoLensAI
+from case_series import CaseSeries, CaseSeriesError, get_case_series
+from seir import simulate_outbreak
+from jobs import DONE, FAILED, JobRunner
+from history import HistoryStore, format_report, report_file_name
+from prewarm import Prewarmer
+from telemetry import SectionTimer, metrics, serve_metrics
+from pandemic_store import get_store
 import json
+import os
+import tempfile
+import time
 from datetime import datetime
 
+# Per-section timings for this script run (see the admin panel / metrics endpoint)
+rerun_started = time.perf_counter()
+section_timer = SectionTimer(metrics, "app_section_seconds")
+
 # ============================================================================
 # PAGE CONFIG
 # ============================================================================
@@ -142,7 +157,7 @@ st.markdown("""
     }
     
     /* Buttons */
-    .stButton>button {
+    .stButton>button, .stFormSubmitButton>button {
         background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
         color: white;
         font-weight: 600;
@@ -153,7 +168,7 @@ st.markdown("""
         transition: all 0.3s ease;
     }
     
-    .stButton>button:hover {
+    .stButton>button:hover, .stFormSubmitButton>button:hover {
         transform: translateY(-2px);
         box-shadow: 0 7px 20px rgba(102, 126, 234, 0.6);
     }
@@ -188,6 +203,8 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+section_timer.mark("css")
+
 # ============================================================================
 # HEADER
 # ============================================================================
@@ -202,6 +219,8 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+section_timer.mark("header")
+
 # ============================================================================
 # SIDEBAR - INPUT CONTROLS
 # ============================================================================
@@ -210,6 +229,10 @@ with st.sidebar:
     st.markdown("### 🎛️ Prediction Controls")
     st.markdown("---")
     
+    # Controls live in a form: editing them doesn't rerun the page until submitted
+    prediction_form = st.form("prediction_controls", border=False)
+
+with prediction_form:
     # Region input
     region = st.text_input(
         "🌍 Geographic Region",
@@ -235,17 +258,52 @@ with st.sidebar:
         help="Number of days to forecast"
     )
     
+    # Pathogen hint: selects the historical pandemics the model compares against
+    pathogen = st.text_input(
+        "🦠 Pathogen / Transmission",
+        value="",
+        help="Optional: suspected pathogen or how it spreads, used to pick comparable historical pandemics",
+        placeholder="e.g., novel influenza, respiratory, waterborne"
+    ).strip() or None
+    
+    # Population (for the local SEIR model)
+    population = st.number_input(
+        "👥 Population",
+        min_value=1000,
+        value=10_000_000,
+        step=100_000,
+        help="Population of the region, used by the local SEIR ensemble forecast"
+    )
+    
+    # Daily case series: growth, doubling time and Rt go into the prompt and charts
+    case_upload = st.file_uploader(
+        "📈 Daily Case Series",
+        type=["csv", "parquet"],
+        help="Optional CSV or Parquet file with region, date and new (or total) cases columns"
+    )
+    
     st.markdown("---")
     
+    # Skip triage: always run the full analysis on the large model
+    full_analysis = st.checkbox(
+        "🔬 Full analysis",
+        value=False,
+        help="Low-risk regions normally get a quick assessment from a small triage model"
+    )
+    
     # Predict button
-    predict_btn = st.button(
+    predict_btn = st.form_submit_button(
         "🔮 Generate Prediction",
         use_container_width=True,
         type="primary"
     )
-    
+
+with st.sidebar:
     st.markdown("---")
     
+    # Filled in once the history store is available
+    history_panel = st.container()
+    
     # Info
     st.markdown("### ℹ️ About")
     st.info("""
@@ -259,13 +317,290 @@ with st.sidebar:
     st.markdown("**Built by** [@A-P-U-R-B-O](https://github.com/A-P-U-R-B-O)")
     st.markdown(f"**Last Updated:** {datetime.now().strftime('%Y-%m-%d')}")
 
+section_timer.mark("sidebar")
+
 # ============================================================================
 # MAIN CONTENT
 # ============================================================================
 
+@st.cache_resource
+def get_ai():
+    """One EchoLensAI (client, connection pool, cache) shared by all sessions"""
+    return EchoLensAI()
+
+
+@st.cache_resource
+def get_history():
+    """Prediction history store shared by all sessions"""
+    return HistoryStore.from_env()
+
+
+@st.cache_resource
+def get_jobs():
+    """Background job runner shared by all sessions; bounds concurrent predictions"""
+    return JobRunner.from_env(get_ai(), get_history())
+
+
+@st.cache_resource
+def get_prewarmer():
+    """Keeps popular regions' responses cached, at startup and then every interval"""
+    return Prewarmer.from_env(get_ai(), get_history()).start()
+
+
+@st.cache_resource(max_entries=4, show_spinner="Reading case series...")
+def get_uploaded_series(file_id, _upload):
+    """Case series store for an uploaded file, ingested once per upload"""
+    suffix = os.path.splitext(_upload.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(_upload.getbuffer())
+    try:
+        return CaseSeries.ingest(f.name, os.path.join(tempfile.gettempdir(), "echolens_series", file_id))
+    finally:
+        os.remove(f.name)
+
+
+@st.cache_resource
+def start_metrics_server():
+    """Prometheus/JSON metrics endpoint, if ECHOLENS_METRICS_PORT is set"""
+    return serve_metrics()
+
+
+@st.cache_data(max_entries=64)
+def get_seir_forecast(current_cases, forecast_days, population):
+    """Local SEIR ensemble forecast (no API call)"""
+    return simulate_outbreak(current_cases, forecast_days, population)
+
+
+def probability_label(probability):
+    """Qualitative label for an outbreak probability (%)"""
+    if probability < 30:
+        return "Low"
+    if probability < 50:
+        return "Moderate"
+    if probability < 70:
+        return "Elevated"
+    return "High"
+
+
+# Figures are memoized per input (dataset version, prediction values, SEIR
+# parameters) and shared across sessions, so reruns skip building and
+# validating them again. Callers must not modify the returned figures.
+@st.cache_resource(max_entries=128)
+def risk_gauge_figure(risk_score):
+    """Overall risk gauge"""
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=risk_score,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "Overall Risk Score", 'font': {'size': 24}},
+        delta={'reference': 50, 'increasing': {'color': "red"}},
+        gauge={
+            'axis': {'range': [None, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
+            'bar': {'color': "darkblue"},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "gray",
+            'steps': [
+                {'range': [0, 30], 'color': '#43e97b'},
+                {'range': [30, 70], 'color': '#fee140'},
+                {'range': [70, 100], 'color': '#f5576c'}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': 90
+            }
+        }
+    ))
+
+    fig.update_layout(
+        height=300,
+        margin=dict(l=20, r=20, t=50, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        font={'color': "darkblue", 'family': "Inter"}
+    )
+    return fig
+
+
+@st.cache_resource(max_entries=128)
+def probability_trend_figure(probabilities, current_cases, forecast_days, population):
+    """AI outbreak probabilities ((days, %) pairs) next to the SEIR ensemble's"""
+    seir_forecast = get_seir_forecast(current_cases, forecast_days, population)
+    fig2 = go.Figure()
+
+    fig2.add_trace(go.Scatter(
+        x=[days for days, _ in probabilities],
+        y=[p for _, p in probabilities],
+        mode='lines+markers',
+        name='Outbreak Probability',
+        line=dict(color='#667eea', width=3),
+        marker=dict(size=12, color='#764ba2')
+    ))
+
+    # Local model alongside the AI estimate as a sanity check
+    fig2.add_trace(go.Scatter(
+        x=list(seir_forecast.probabilities.keys()),
+        y=list(seir_forecast.probabilities.values()),
+        mode='lines+markers',
+        name='SEIR Ensemble',
+        line=dict(color='#f5576c', width=2, dash='dash'),
+        marker=dict(size=8, color='#f5576c')
+    ))
+
+    fig2.update_layout(
+        title="Outbreak Probability Trend",
+        xaxis_title="Days",
+        yaxis_title="Probability (%)",
+        height=300,
+        margin=dict(l=20, r=20, t=50, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        font={'family': "Inter"}
+    )
+    return fig2
+
+
+@st.cache_resource(max_entries=64)
+def seir_band_figure(current_cases, forecast_days, population):
+    """SEIR median projection with its 90% band"""
+    seir_forecast = get_seir_forecast(current_cases, forecast_days, population)
+    fig_seir = go.Figure()
+
+    fig_seir.add_trace(go.Scatter(
+        x=list(seir_forecast.days) + list(seir_forecast.days[::-1]),
+        y=list(seir_forecast.upper) + list(seir_forecast.lower[::-1]),
+        fill='toself',
+        fillcolor='rgba(102, 126, 234, 0.2)',
+        line=dict(color='rgba(0,0,0,0)'),
+        hoverinfo='skip',
+        name='90% Band'
+    ))
+
+    fig_seir.add_trace(go.Scatter(
+        x=seir_forecast.days,
+        y=seir_forecast.median,
+        mode='lines',
+        name='Median',
+        line=dict(color='#667eea', width=3)
+    ))
+
+    fig_seir.update_layout(
+        title="Projected Active Infections (Local SEIR Ensemble)",
+        xaxis_title="Days",
+        yaxis_title="Active Infections",
+        height=350,
+        margin=dict(l=20, r=20, t=50, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        font={'family': "Inter"}
+    )
+    return fig_seir
+
+
+@st.cache_resource(max_entries=64)
+def case_trend_figure(version, region, _series, days=365):
+    """Observed daily cases, their 7-day average and Rt with its 95% interval"""
+    trend = {name: values[-days:] for name, values in _series.trend(region).items()}
+    dates = trend["dates"].astype(str)
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+    fig.add_trace(go.Bar(
+        x=dates, y=trend["daily"], name='Daily Cases', marker_color='rgba(102, 126, 234, 0.35)'
+    ))
+    fig.add_trace(go.Scatter(
+        x=dates, y=trend["average"], mode='lines', name='7-Day Average',
+        line=dict(color='#667eea', width=3)
+    ))
+    fig.add_trace(go.Scatter(
+        x=list(dates) + list(dates[::-1]),
+        y=list(trend["rt_upper"]) + list(trend["rt_lower"][::-1]),
+        fill='toself',
+        fillcolor='rgba(245, 87, 108, 0.15)',
+        line=dict(color='rgba(0,0,0,0)'),
+        hoverinfo='skip',
+        name='Rt 95% Interval'
+    ), secondary_y=True)
+    fig.add_trace(go.Scatter(
+        x=dates, y=trend["rt"], mode='lines', name='Rt', line=dict(color='#f5576c', width=2)
+    ), secondary_y=True)
+
+    fig.update_layout(
+        title=f"Observed Cases and Rt — {region}",
+        height=350,
+        margin=dict(l=20, r=20, t=50, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        font={'family': "Inter"}
+    )
+    fig.update_yaxes(title_text="Daily Cases", secondary_y=False)
+    fig.update_yaxes(title_text="Rt", secondary_y=True)
+    return fig
+
+
+@st.cache_resource(max_entries=64)
+def mortality_indicators_figure(version, page_indices):
+    """One mortality indicator per pandemic on the page; version keys the dataset"""
+    store = get_store('data/pandemics.json')
+    columns = min(4, len(page_indices))
+    rows = -(-len(page_indices) // columns)
+    fig = go.Figure()
+    for n, i in enumerate(page_indices):
+        fig.add_trace(go.Indicator(
+            mode="number",
+            value=store.mortality[i],
+            title={'text': f"{store.names[i]}<br><span style='font-size:0.8em;color:gray'>Mortality Rate (%)</span>"},
+            number={'suffix': "%"},
+            domain={'row': n // columns, 'column': n % columns}
+        ))
+    fig.update_layout(
+        grid={'rows': rows, 'columns': columns, 'pattern': "independent"},
+        height=170 * rows,
+        margin=dict(l=20, r=20, t=50, b=20)
+    )
+    return fig
+
+
+@st.cache_resource(max_entries=64)
+def mortality_comparison_figure(version, page_indices):
+    """Mortality bar chart for the pandemics on the page; version keys the dataset"""
+    store = get_store('data/pandemics.json')
+    page_indices = list(page_indices)
+    names = [store.names[i] for i in page_indices]
+
+    # FIX 2: Use 'mortality_rate_value' AND divide by 100.0 for the bar chart
+    # The bar chart's Y-axis is scaled from -1 to 1, so the data must be 0.x.
+    mortality_rates_decimal = store.mortality[page_indices] / 100.0
+    # Keep the original integer rates for the text label on the bar
+    mortality_rates_percent = store.mortality[page_indices]
+
+    fig3 = go.Figure(data=[
+        go.Bar(
+            x=names,
+            y=mortality_rates_decimal, # Use the scaled decimal value (e.g., 0.45)
+            marker=dict(
+                color=mortality_rates_decimal, # Color scale based on decimal
+                colorscale='Reds',
+                showscale=True
+            ),
+            text=mortality_rates_percent, # Use the integer percent for the label (e.g., 45)
+            texttemplate='%{text}%',
+            textposition='outside'
+        )
+    ])
+
+    fig3.update_layout(
+        title="Historical Pandemic Mortality Rates",
+        xaxis_title="Pandemic",
+        # The Y-axis title should reflect the decimal scale, or you can change the axis range
+        yaxis_title="Mortality Rate (Decimal)", 
+        height=400,
+        showlegend=False
+    )
+    return fig3
+
+
 # Initialize AI client
 try:
-    ai = EchoLensAI()
+    ai = get_ai()
+    jobs = get_jobs()
+    history = get_history()
 except ValueError as e:
     st.error(str(e))
     st.info("""💡 **Setup Instructions:**
@@ -278,37 +613,187 @@ except ValueError as e:
     """)
     st.stop()
 
+start_metrics_server()
+prewarmer = get_prewarmer()
+
+# An uploaded case series takes precedence over ECHOLENS_CASE_SERIES
+try:
+    case_series = get_uploaded_series(case_upload.file_id, case_upload) if case_upload else get_case_series()
+except (CaseSeriesError, OSError) as e:
+    st.sidebar.error(f"❌ Could not read the case series: {e}")
+    case_series = None
+
+if case_series is not None:
+    dates = case_series.dates()
+    st.sidebar.caption(
+        f"📈 Case series: {len(case_series)} regions, {dates[0]} to {dates[-1]}"
+        if case_series.days else "📈 Case series is empty"
+    )
+    if region not in case_series:
+        st.sidebar.caption(f"No case series for {region}: the prediction uses the active case count only.")
+
+section_timer.mark("client")
+
+# ============================================================================
+# PREDICTION HISTORY (SIDEBAR)
+# ============================================================================
+
+HISTORY_BROWSER_PAGE_SIZE = 5
+
+
+def open_history_entry(entry_id):
+    """Show a stored prediction; no API call is made"""
+    entry = history.get(entry_id)
+    if entry is None:
+        return
+    st.session_state.pop("job_id", None)
+    st.query_params.pop("job", None)
+    st.session_state.prediction = {
+        "region": entry.region,
+        "current_cases": entry.current_cases,
+        "forecast_days": entry.forecast_days,
+        "population": entry.population or 10_000_000,
+        "history_id": entry.id,
+        "result": entry.result(),
+        "comparison": entry.comparison,
+        "generated_at": entry.generated_at,
+    }
+
+
+with history_panel:
+    with st.expander("🗂️ Prediction History"):
+        view = st.radio("Show", ["Latest per region", "All runs"], horizontal=True, key="history_view")
+        region_filter = ""
+        if view == "All runs":
+            region_filter = st.text_input("Region", placeholder="All regions", key="history_region").strip()
+            total = history.count(region=region_filter or None)
+        else:
+            total = history.region_count()
+        
+        page_count = max(1, -(-total // HISTORY_BROWSER_PAGE_SIZE))
+        page = st.number_input(
+            f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1,
+            key=f"history_browser_page_{view}_{page_count}"
+        ) if page_count > 1 else 1
+        offset = (page - 1) * HISTORY_BROWSER_PAGE_SIZE
+        if view == "All runs":
+            entries = history.recent(HISTORY_BROWSER_PAGE_SIZE, offset, region=region_filter or None)
+        else:
+            entries = history.latest_per_region(HISTORY_BROWSER_PAGE_SIZE, offset)
+        
+        if not entries:
+            st.caption("No saved predictions yet.")
+        for entry in entries:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.markdown(
+                    f"**{entry['region']}** · {entry['current_cases']:,} cases · {entry['forecast_days']}d  \n"
+                    f"{datetime.fromtimestamp(entry['created_at']).strftime('%Y-%m-%d %H:%M')}"
+                )
+            with col2:
+                st.button(
+                    "Open", key=f"history_open_{entry['id']}",
+                    on_click=open_history_entry, args=(entry["id"],)
+                )
+
+section_timer.mark("history")
+
+
+# Full Prediction: submitting queues a background job, so the work survives
+# reruns and disconnects. The job ID is kept in the session and the URL; the
+# finished result is kept in session state for later reruns.
+def case_trend(region):
+    """Prompt line of case-series statistics for region, or None"""
+    summary = case_series.summary(region) if case_series is not None else None
+    return summary.describe() if summary else None
+
 
-# Full Prediction
 if predict_btn:
+    st.session_state.pop("prediction", None)
+    st.session_state.job_id = jobs.submit_prediction(
+        region, current_cases, forecast_days, population, full=full_analysis, trend=case_trend(region),
+        pathogen=pathogen
+    )
+    st.query_params["job"] = st.session_state.job_id
+
+job_id = st.session_state.get("job_id") or st.query_params.get("job")
+
+
+def show_job_error(job):
+    """Error message and hint for a failed job"""
+    if job.error_type == "CircuitOpenError":
+        st.error(f"❌ {job.error}")
+        st.info("💡 Groq is failing repeatedly, so requests are paused briefly instead of piling up.")
+    elif job.error_type == "DeadlineExceededError":
+        st.error("❌ The prediction could not be completed in time: the Groq rate limit is saturated.")
+        st.info("💡 Please try again in a minute.")
+    elif job.error_type == "Interrupted":
+        st.error("❌ The prediction was interrupted: the server process running it stopped.")
+        st.info("💡 Please generate it again.")
+    else:
+        st.error(f"❌ Error generating prediction: {job.error}")
+        st.info("💡 Make sure your Groq API key is valid and you have an active internet connection.")
+
+
+def job_progress(job_id):
+    """Live view of a running job; reruns the app once it has finished"""
+    job = jobs.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    
     st.markdown("---")
     st.markdown("## 🔮 Detailed Prediction Analysis")
+    st.caption("⏳ Running in the background: you can change settings or leave and come back to this page.")
+    st.markdown("### 🔍 Historical Pattern Comparison")
+    if job.progress:
+        st.markdown(job.progress + "▌")
+    else:
+        st.text("🤖 Comparing to historical pandemics...")
+    st.text("📊 Analyzing historical patterns...")
+
+
+if job_id and st.session_state.get("prediction", {}).get("job_id") != job_id:
+    job = jobs.get(job_id)
+    if job is None:
+        # Unknown or expired job (e.g. an old link)
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("job", None)
+    elif job.status == DONE:
+        st.session_state.prediction = {
+            **job.params,
+            "job_id": job.id,
+            "history_id": job.result.get("history_id"),
+            "route": job.result.get("route"),
+            "result": job.prediction(),
+            "comparison": job.result["comparison"],
+            "generated_at": datetime.fromtimestamp(job.updated_at),
+        }
+    elif job.status == FAILED:
+        st.markdown("---")
+        st.markdown("## 🔮 Detailed Prediction Analysis")
+        show_job_error(job)
+    else:
+        st.fragment(job_progress, run_every=1)(job_id)
+
+
+@st.fragment
+def prediction_results():
+    """Prediction results from session state; reruns on its own (e.g. downloads)"""
+    state = st.session_state.get("prediction")
+    if state is None:
+        return
     
-    # Progress indicator
-    progress_text = st.empty()
-    progress_bar = st.progress(0)
-    
-    progress_text.text("🤖 Initializing AI analysis...")
-    progress_bar.progress(20)
-    
-    try:
-        progress_text.text("📊 Analyzing historical patterns...")
-        progress_bar.progress(40)
-        
-        # Get prediction
-        prediction = ai.predict_outbreak(region, current_cases, forecast_days)
-        
-        progress_text.text("🎯 Generating insights...")
-        progress_bar.progress(80)
-        
-        # Clear progress
-        progress_bar.progress(100)
-        progress_text.empty()
-        progress_bar.empty()
+    with metrics.timer("app_fragment_seconds", fragment="prediction"):
+        region = state["region"]
+        current_cases = state["current_cases"]
+        forecast_days = state["forecast_days"]
+        result = state["result"]
+        comparison = state["comparison"]
+        prediction = result.narrative
+        seir_forecast = get_seir_forecast(current_cases, forecast_days, state["population"])
         
-        # ========================================================================
-        # DISPLAY RESULTS
-        # ========================================================================
+        st.markdown("---")
+        st.markdown("## 🔮 Detailed Prediction Analysis")
         
         # Display full prediction in a nice box
         st.markdown(f"""
@@ -318,130 +803,115 @@ if predict_btn:
         </div>
         """, unsafe_allow_html=True)
         
+        # Low triage risk: only the quick assessment ran, on the small model
+        if not comparison:
+            route = state.get("route") or {}
+            threshold = route.get("threshold", ai.escalation_threshold)
+            st.info(
+                f"⚡ Quick assessment by the triage model: risk score {result.risk_score} is below the "
+                f"escalation threshold of {threshold}, so the full analysis was skipped. "
+                "Probabilities are from the local SEIR ensemble."
+            )
+            if st.button("🔬 Run Full Analysis"):
+                st.session_state.pop("prediction", None)
+                st.session_state.job_id = jobs.submit_prediction(
+                    region, current_cases, forecast_days, state["population"], full=True,
+                    trend=state.get("trend"), pathogen=state.get("pathogen")
+                )
+                st.query_params["job"] = st.session_state.job_id
+                st.rerun()
+        
         # Main prediction content
         with st.container():
             st.markdown("### 🎯 AI Analysis")
-            
+
             # FIX: Use HTML for outer container, st.markdown for content
             st.markdown('<div class="analysis-text">', unsafe_allow_html=True)
             st.markdown(prediction) # Render markdown/LaTeX correctly
             st.markdown('</div>', unsafe_allow_html=True)
-        
+
         # Visual metrics
         st.markdown("---")
         st.markdown("### 📊 Visual Analytics")
-        
+
         col1, col2, col3, col4 = st.columns(4)
-        
-        st.caption("Note: Metric values below are currently hardcoded; they need to be dynamically parsed from the AI response.")
-        
+
         with col1:
-            st.markdown("""
+            st.markdown(f"""
             <div class="metric-card" style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);">
                 <div class="metric-label">Risk Score</div>
-                <div class="metric-value">72</div>
-                <div class="metric-label">High Risk</div>
+                <div class="metric-value">{result.risk_score}</div>
+                <div class="metric-label">{result.risk_level} Risk</div>
             </div>
             """, unsafe_allow_html=True)
-        
+
         with col2:
-            st.markdown("""
+            st.markdown(f"""
             <div class="metric-card" style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);">
                 <div class="metric-label">30-Day Probability</div>
-                <div class="metric-value">45%</div>
-                <div class="metric-label">Moderate</div>
+                <div class="metric-value">{result.probability_30d:.0f}%</div>
+                <div class="metric-label">{probability_label(result.probability_30d)}</div>
             </div>
             """, unsafe_allow_html=True)
-        
+
         with col3:
-            st.markdown("""
+            st.markdown(f"""
             <div class="metric-card" style="background: linear-gradient(135deg, #43e97b 0%, #38f9d7 100%);">
                 <div class="metric-label">60-Day Probability</div>
-                <div class="metric-value">67%</div>
-                <div class="metric-label">Elevated</div>
+                <div class="metric-value">{result.probability_60d:.0f}%</div>
+                <div class="metric-label">{probability_label(result.probability_60d)}</div>
             </div>
             """, unsafe_allow_html=True)
-        
+
         with col4:
-            st.markdown("""
+            st.markdown(f"""
             <div class="metric-card" style="background: linear-gradient(135deg, #fa709a 0%, #fee140 100%);">
                 <div class="metric-label">90-Day Probability</div>
-                <div class="metric-value">78%</div>
-                <div class="metric-label">High</div>
+                <div class="metric-value">{result.probability_90d:.0f}%</div>
+                <div class="metric-label">{probability_label(result.probability_90d)}</div>
             </div>
             """, unsafe_allow_html=True)
-        
+
         # Risk Gauge Chart
         st.markdown("---")
         col1, col2 = st.columns([1, 1])
-        
+
         with col1:
-            # Note: Hardcoded value 72 used below
-            fig = go.Figure(go.Indicator(
-                mode="gauge+number+delta",
-                value=72, 
-                domain={'x': [0, 1], 'y': [0, 1]},
-                title={'text': "Overall Risk Score", 'font': {'size': 24}},
-                delta={'reference': 50, 'increasing': {'color': "red"}},
-                gauge={
-                    'axis': {'range': [None, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
-                    'bar': {'color': "darkblue"},
-                    'bgcolor': "white",
-                    'borderwidth': 2,
-                    'bordercolor': "gray",
-                    'steps': [
-                        {'range': [0, 30], 'color': '#43e97b'},
-                        {'range': [30, 70], 'color': '#fee140'},
-                        {'range': [70, 100], 'color': '#f5576c'}
-                    ],
-                    'threshold': {
-                        'line': {'color': "red", 'width': 4},
-                        'thickness': 0.75,
-                        'value': 90
-                    }
-                }
-            ))
-            
-            fig.update_layout(
-                height=300,
-                margin=dict(l=20, r=20, t=50, b=20),
-                paper_bgcolor="rgba(0,0,0,0)",
-                font={'color': "darkblue", 'family': "Inter"}
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-        
+            st.plotly_chart(risk_gauge_figure(result.risk_score), use_container_width=True)
+
         with col2:
-            # Probability trend (Note: Hardcoded values 45, 67, 78 used below)
-            fig2 = go.Figure()
-            
-            fig2.add_trace(go.Scatter(
-                x=[30, 60, 90],
-                y=[45, 67, 78],
-                mode='lines+markers',
-                name='Outbreak Probability',
-                line=dict(color='#667eea', width=3),
-                marker=dict(size=12, color='#764ba2')
-            ))
-            
-            fig2.update_layout(
-                title="Outbreak Probability Trend",
-                xaxis_title="Days",
-                yaxis_title="Probability (%)",
-                height=300,
-                margin=dict(l=20, r=20, t=50, b=20),
-                paper_bgcolor="rgba(0,0,0,0)",
-                font={'family': "Inter"}
+            # Probability trend
+            st.plotly_chart(
+                probability_trend_figure(
+                    tuple(result.probabilities.items()), current_cases, forecast_days, state["population"]
+                ),
+                use_container_width=True
             )
-            
-            st.plotly_chart(fig2, use_container_width=True)
-        
-        # Historical Comparison
-        st.markdown("---")
-        st.markdown("### 🔍 Historical Pattern Comparison")
+
+        # SEIR ensemble projection with 90% confidence band
+        st.plotly_chart(
+            seir_band_figure(current_cases, forecast_days, state["population"]),
+            use_container_width=True
+        )
+        st.caption(
+            f"Outbreak = active infections above {seir_forecast.outbreak_threshold:,.0f} "
+            f"(10× current cases). SEIR probabilities — "
+            + " • ".join(f"{d} days: {p:.0f}%" for d, p in seir_forecast.probabilities.items())
+        )
         
-        with st.spinner("🤖 Comparing to historical pandemics..."):
-            comparison = ai.analyze_comparison(f"Region: {region}, Cases: {current_cases}")
+        # Observed trend, when a case series covers the region
+        if case_series is not None and case_series.days and region in case_series:
+            st.plotly_chart(
+                case_trend_figure(case_series.version, region, case_series),
+                use_container_width=True
+            )
+            if state.get("trend"):
+                st.caption(f"Case trend given to the model: {state['trend']}")
+
+        # Historical Comparison (only the full analysis has one)
+        if comparison:
+            st.markdown("---")
+            st.markdown("### 🔍 Historical Pattern Comparison")
             
             # FIX: Use HTML for outer container, st.markdown for content
             st.markdown('<div class="info-card">', unsafe_allow_html=True)
@@ -449,132 +919,120 @@ if predict_btn:
             st.markdown('<div class="analysis-text">', unsafe_allow_html=True)
             st.markdown(comparison) # Render markdown/LaTeX correctly
             st.markdown('</div></div>', unsafe_allow_html=True)
+            
+            st.success("✅ Full prediction analysis complete!")
         
-        st.success("✅ Full prediction analysis complete!")
-        
-        # Download report
+        # Download report, served from the history store
         st.markdown("---")
-        report_content = f"""EchoLens Prediction Report
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} UTC
-
-Region: {region}
-Active Cases: {current_cases:,}
-Forecast Period: {forecast_days} days
-
-=== PREDICTION ===
-{prediction}
-
-=== HISTORICAL COMPARISON ===
-{comparison}
-
----
-Built by @A-P-U-R-B-O
-Powered by Groq API (Llama 3.1 70B)
-"""
+        stored = history.report(state["history_id"]) if state.get("history_id") else None
+        if stored is None:
+            created_at = state['generated_at'].timestamp()
+            stored = (
+                report_file_name(region, created_at),
+                format_report(region, current_cases, forecast_days, prediction, comparison, created_at, ai.model)
+            )
+        file_name, report_content = stored
         
         st.download_button(
             label="📥 Download Prediction Report",
             data=report_content,
-            file_name=f"echolens_report_{region.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+            file_name=file_name,
             mime="text/plain"
         )
-        
-    except Exception as e:
-        progress_text.empty()
-        progress_bar.empty()
-        st.error(f"❌ Error generating prediction: {str(e)}")
-        st.info("💡 Make sure your Groq API key is valid and you have an active internet connection.")
+
+
+prediction_results()
+section_timer.mark("prediction")
 
 # ============================================================================
 # HISTORICAL DATA SECTION (FIXED)
 # ============================================================================
 
-# Load historical data
-pandemics = []
-try:
-    # Assuming the fixed JSON file is also saved here
-    # You need to make sure the fixed JSON file is saved as 'data/pandemics.json'
-    with open('data/pandemics.json', 'r') as f:
-        pandemics = json.load(f)
-except FileNotFoundError:
-    st.info("📁 No historical data found. See Sample Data Structure below.")
-    pandemics = []
-
-if pandemics:
-    # Create tabs for each pandemic
-    tabs = st.tabs([p['name'] for p in pandemics])
-    
-    for tab, pandemic in zip(tabs, pandemics):
-        with tab:
-            col1, col2 = st.columns([2, 1])
-            
+HISTORY_PAGE_SIZE = 12
+
+
+@st.fragment
+def historical_explorer():
+    """Filters, pages and details rerun only this fragment, not the whole app"""
+    with metrics.timer("app_fragment_seconds", fragment="historical"):
+        # Load historical data (parsed once per process, reloaded when the file changes)
+        store = None
+        page_indices = []
+        try:
+            store = get_store('data/pandemics.json')
+        except FileNotFoundError:
+            st.info("📁 No historical data found. See Sample Data Structure below.")
+
+        if store:
+            st.markdown("---")
+            st.markdown("### 📚 Historical Pandemic Explorer")
+
+            # Only the current page is rendered, so cost stays flat as the dataset grows
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.markdown(f"### {pandemic['name']}")
-                st.markdown(f"**Period:** {pandemic['period']}")
-                st.markdown(f"**Pathogen:** {pandemic['pathogen']}")
-                st.markdown(f"**Deaths:** {pandemic['deaths']}")
-                st.markdown(f"**Transmission:** {pandemic['transmission']}")
-                
-                if 'lessons' in pandemic:
-                    st.markdown("**Key Lessons:**")
-                    for lesson in pandemic['lessons']:
-                        st.markdown(f"- {lesson}")
-            
+                search = st.text_input("🔎 Search", placeholder="e.g., Plague")
             with col2:
-                # Simple visualization (Indicator)
-                # FIX 1: Use 'mortality_rate_value' (the number) and use the display field for title if needed
-                mortality_value = pandemic.get('mortality_rate_value', 0)
-                mortality_display = pandemic.get('mortality_rate_display', 'N/A')
-                
-                fig = go.Figure(go.Indicator(
-                    mode="number",
-                    value=mortality_value,
-                    # Display the value as a percentage
-                    title={'text': "Mortality Rate (%)"},
-                    number={'suffix': "%"},
-                    domain={'x': [0, 1], 'y': [0, 1]}
-                ))
-                fig.update_layout(height=200, margin=dict(l=20, r=20, t=50, b=20))
-                st.plotly_chart(fig, use_container_width=True)
-    
-    # Comparison chart
-    st.markdown("---")
-    st.markdown("### 📊 Pandemic Comparison")
-    
-    # Create comparison data
-    names = [p['name'] for p in pandemics]
-    
-    # FIX 2: Use 'mortality_rate_value' AND divide by 100.0 for the bar chart
-    # The bar chart's Y-axis is scaled from -1 to 1, so the data must be 0.x.
-    mortality_rates_decimal = [p.get('mortality_rate_value', 0) / 100.0 for p in pandemics]
-    # Keep the original integer rates for the text label on the bar
-    mortality_rates_percent = [p.get('mortality_rate_value', 0) for p in pandemics]
-    
-    fig3 = go.Figure(data=[
-        go.Bar(
-            x=names,
-            y=mortality_rates_decimal, # Use the scaled decimal value (e.g., 0.45)
-            marker=dict(
-                color=mortality_rates_decimal, # Color scale based on decimal
-                colorscale='Reds',
-                showscale=True
-            ),
-            text=mortality_rates_percent, # Use the integer percent for the label (e.g., 45)
-            texttemplate='%{text}%',
-            textposition='outside'
-        )
-    ])
-    
-    fig3.update_layout(
-        title="Historical Pandemic Mortality Rates",
-        xaxis_title="Pandemic",
-        # The Y-axis title should reflect the decimal scale, or you can change the axis range
-        yaxis_title="Mortality Rate (Decimal)", 
-        height=400,
-        showlegend=False
-    )
-    
-    st.plotly_chart(fig3, use_container_width=True)
+                family = st.selectbox("🧬 Pathogen Family", ["All"] + sorted(store.by_family))
+            with col3:
+                era = st.selectbox("🏛️ Era", ["All"] + sorted(store.by_era))
+            with col4:
+                transmission = st.selectbox("🦟 Transmission", ["All"] + sorted(store.by_transmission))
+
+            matches = store.filter(
+                family=None if family == "All" else family,
+                era=None if era == "All" else era,
+                transmission=None if transmission == "All" else transmission,
+                query=search.strip() or None
+            )
+
+            page_count = max(1, -(-len(matches) // HISTORY_PAGE_SIZE))
+            page = st.number_input(
+                f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1,
+                key=f"history_page_{page_count}"  # Start over when the number of pages changes
+            ) if page_count > 1 else 1
+            page_indices = matches[(page - 1) * HISTORY_PAGE_SIZE:page * HISTORY_PAGE_SIZE]
+            st.caption(f"Showing {len(page_indices)} of {len(matches)} matching pandemics ({len(store)} total)")
+            if not matches:
+                st.info("No pandemics match these filters.")
+
+        if store and page_indices:
+            # One figure with a mortality indicator per pandemic on this page
+            st.plotly_chart(
+                mortality_indicators_figure(store.version, tuple(page_indices)),
+                use_container_width=True
+            )
+
+            # Details are built only for the pandemic that is opened
+            selected = st.selectbox(
+                "📖 Pandemic Details",
+                page_indices,
+                format_func=lambda i: store.names[i]
+            )
+            pandemic = store.record(selected)
+            st.markdown(f"### {pandemic['name']}")
+            st.markdown(f"**Period:** {pandemic['period']}")
+            st.markdown(f"**Pathogen:** {pandemic['pathogen']} ({store.families[selected]})")
+            st.markdown(f"**Deaths:** {pandemic['deaths']}")
+            st.markdown(f"**Mortality:** {pandemic['mortality_rate_display'] or 'N/A'}")
+            st.markdown(f"**Transmission:** {pandemic['transmission']}")
+
+            if pandemic['lessons']:
+                st.markdown("**Key Lessons:**")
+                for lesson in pandemic['lessons']:
+                    st.markdown(f"- {lesson}")
+
+            # Comparison chart
+            st.markdown("---")
+            st.markdown("### 📊 Pandemic Comparison")
+
+            st.plotly_chart(
+                mortality_comparison_figure(store.version, tuple(page_indices)),
+                use_container_width=True
+            )
+
+
+historical_explorer()
+section_timer.mark("historical")
 
 # Show sample structure whether data was found or not
 with st.expander("📖 Sample Data Structure"):
@@ -612,3 +1070,59 @@ st.markdown("""
     </p>
 </div>
 """, unsafe_allow_html=True)
+
+section_timer.mark("footer")
+metrics.observe("app_rerun_seconds", time.perf_counter() - rerun_started)
+
+# ============================================================================
+# ADMIN PANEL (set ECHOLENS_ADMIN=1)
+# ============================================================================
+
+if os.getenv('ECHOLENS_ADMIN'):
+    with st.sidebar:
+        st.markdown("---")
+        with st.expander("🛠️ Performance Metrics"):
+            snapshot = metrics.to_json()
+            st.markdown("**Latency (seconds)**")
+            st.dataframe(
+                [
+                    {
+                        "metric": s["name"],
+                        "labels": ", ".join(f"{k}={v}" for k, v in s["labels"].items()),
+                        "count": s["count"],
+                        "p50": s["p50"],
+                        "p95": s["p95"],
+                        "p99": s["p99"],
+                    }
+                    for s in snapshot["summaries"]
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+            st.markdown("**Counters**")
+            st.dataframe(
+                [
+                    {
+                        "metric": c["name"],
+                        "labels": ", ".join(f"{k}={v}" for k, v in c["labels"].items()),
+                        "value": c["value"],
+                    }
+                    for c in snapshot["counters"]
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+            st.json({
+                "cache": ai.cache.stats(),
+                "in_flight": ai.inflight.stats(),
+                "scheduler": ai.scheduler.stats(),
+                "jobs": jobs.stats(),
+                "history": {"predictions": history.count(), "regions": history.region_count()},
+                "prewarm": prewarmer.last_run,
+            })
+            st.download_button(
+                label="📥 Download Metrics (JSON)",
+                data=json.dumps(snapshot, indent=2),
+                file_name="echolens_metrics.json",
+                mime="application/json"
+            )
@@ -0,0 +1,252 @@
+"""
+EchoLens - Async Groq Client
+Predictions on an event loop, for serving many concurrent API callers
+"""
+
+import asyncio
+import os
+import time
+
+import httpx
+from groq import AsyncGroq
+
+from groq_client import estimate_tokens, http_client_options, parse_quick_risk
+from prediction import parse_prediction
+from telemetry import metrics
+
+
+def build_async_client():
+    """AsyncGroq client with the same connection pool settings as the shared sync client"""
+    api_key = os.getenv('GROQ_API_KEY')
+    if not api_key:
+        raise ValueError("❌ GROQ_API_KEY not found! Add it to .env file")
+
+    http_client = httpx.AsyncClient(**http_client_options())
+    return AsyncGroq(
+        api_key=api_key,
+        http_client=http_client,
+        timeout=http_client.timeout,
+        max_retries=0  # Retries are handled by the Scheduler
+    )
+
+
+class _Broadcast:
+    """Chunks of one upstream stream, replayed to every caller reading it"""
+
+    def __init__(self):
+        self.cond = asyncio.Condition()
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.task = None
+
+
+class AsyncEchoLensAI:
+    """Async counterpart of an EchoLensAI, sharing its prompts, cache and limits
+
+    Requests are built by the wrapped EchoLensAI, so they canonicalize and
+    cache exactly like the dashboard's, and upstream calls go through its
+    Scheduler. Only the Groq calls use AsyncGroq; cache lookups (which may
+    hit SQLite or Redis) run on worker threads. Concurrent identical requests
+    on the loop share one upstream call or stream, like SingleFlight.
+    """
+
+    def __init__(self, ai, client=None):
+        self.ai = ai
+        self.client = client if client is not None else build_async_client()
+        self._inflight = {}  # (mode, key) -> Task of a full response or _Broadcast of a stream
+
+    async def close(self):
+        await self.client.close()
+
+    async def predict(self, region, current_cases, forecast_days=90, structured=False, sections=None, trend=None,
+                      pathogen=None):
+        """EchoLensAI.predict_outbreak on the event loop"""
+        request = await asyncio.to_thread(
+            self.ai.prediction_request, region, current_cases, forecast_days, structured, sections, trend, pathogen
+        )
+        response = await self._complete(operation="predict", **request)
+        return parse_prediction(response) if structured else response
+
+    async def stream_prediction(self, region, current_cases, forecast_days=90, sections=None, trend=None,
+                                pathogen=None):
+        """Yield the outbreak prediction as text chunks while it is generated"""
+        request = await asyncio.to_thread(
+            self.ai.prediction_request, region, current_cases, forecast_days, sections=sections, trend=trend,
+            pathogen=pathogen
+        )
+        async for chunk in self._stream(operation="predict", **request):
+            yield chunk
+
+    async def compare(self, current_outbreak):
+        """Historical comparison of an outbreak description (see EchoLensAI.describe)"""
+        request = await asyncio.to_thread(self.ai.comparison_request, current_outbreak)
+        return await self._complete(operation="compare", **request)
+
+    async def stream_comparison(self, current_outbreak):
+        """Yield the historical comparison as text chunks while it is generated"""
+        request = await asyncio.to_thread(self.ai.comparison_request, current_outbreak)
+        async for chunk in self._stream(operation="compare", **request):
+            yield chunk
+
+    async def quick_risk(self, region, cases, model=None):
+        """Quick risk assessment text"""
+        request = await asyncio.to_thread(self.ai.quick_risk_request, region, cases, model)
+        return await self._complete(operation="quick_risk", model=model, **request)
+
+    async def triage(self, region, cases):
+        """Quick risk assessment on the small triage model, parsed into a Triage"""
+        model = self.ai.triage_model
+        return parse_quick_risk(await self.quick_risk(region, cases, model=model), model)
+
+    async def _complete(self, messages, operation="chat", model=None, cache_messages=None, **params):
+        """Send a chat request (to ai.model unless given) and return the full response text"""
+        model, key = self.ai.request_key(messages, model, params, cache_messages)
+        with metrics.timer("llm_call_seconds", operation=operation, mode="complete"):
+            cached = await asyncio.to_thread(self.ai.cache.get, key)
+            self.ai.record_lookup(operation, cached)
+            if cached is not None:
+                return cached
+
+            # Concurrent identical requests share one upstream call
+            flight = ("complete", key)
+            task = self._inflight.get(flight)
+            if task is None:
+                task = asyncio.ensure_future(self._fetch(key, model, messages, params, operation))
+                self._inflight[flight] = task
+                task.add_done_callback(lambda done: self._landed(flight, done))
+            # Shielded, so a caller that goes away doesn't cancel the call the others wait on
+            return await asyncio.shield(task)
+
+    def _landed(self, flight, task):
+        self._inflight.pop(flight, None)
+        if not task.cancelled():
+            task.exception()  # Retrieved, in case every caller went away
+
+    async def _fetch(self, key, model, messages, params, operation):
+        """Full response for a request missing from the cache (see EchoLensAI._fetch)"""
+        cached, token = await asyncio.to_thread(self.ai.cache.claim, key)
+        if cached is not None:
+            return cached
+        try:
+            return await self._fetch_upstream(key, model, messages, params, operation)
+        finally:
+            await asyncio.to_thread(self.ai.cache.release, key, token)
+
+    async def _fetch_upstream(self, key, model, messages, params, operation):
+        """Call Groq for a full response and cache it (see EchoLensAI._fetch_upstream)"""
+        for attempt in range(2):
+            estimated = estimate_tokens(messages, params)
+            with metrics.timer("llm_upstream_seconds", operation=operation, model=model):
+                chat_completion = await self.ai.scheduler.call_async(
+                    self.ai.upstream_call(self.client, model, messages, params, stream=False),
+                    estimated_tokens=estimated
+                )
+
+            content, cut_off = self.ai.completion_text(chat_completion, estimated, operation, model)
+            if not cut_off:
+                await asyncio.to_thread(self.ai.cache.set, key, self.ai.cacheable(content, params))
+                return content
+            params = self.ai.truncated(messages, params, operation, model, retry=attempt == 0)
+            if params is None:
+                break
+        return content
+
+    async def _stream(self, messages, operation="chat", model=None, cache_messages=None, **params):
+        """Send a chat request (to ai.model unless given) and yield response text as it arrives"""
+        started = time.perf_counter()
+        model, key = self.ai.request_key(messages, model, params, cache_messages)
+        cached = await asyncio.to_thread(self.ai.cache.get, key)
+        self.ai.record_lookup(operation, cached)
+        if cached is not None:
+            metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - started, operation=operation)
+            yield cached
+            return
+
+        # Concurrent identical streams are fed from one upstream stream
+        flight = ("stream", key)
+        call = self._inflight.get(flight)
+        if call is None:
+            call = self._inflight[flight] = _Broadcast()
+            # A task of its own, so the stream completes (and is cached) even if its reader goes away
+            call.task = asyncio.ensure_future(
+                self._produce(flight, call, self._fetch_stream(key, model, messages, params, operation))
+            )
+
+        first = True
+        async for chunk in self._consume(call):
+            if first:
+                metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - started, operation=operation)
+                first = False
+            yield chunk
+        metrics.observe("llm_call_seconds", time.perf_counter() - started, operation=operation, mode="stream")
+
+    async def _produce(self, flight, call, chunks):
+        try:
+            async for chunk in chunks:
+                async with call.cond:
+                    call.chunks.append(chunk)
+                    call.cond.notify_all()
+        except BaseException as e:
+            call.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self._inflight.pop(flight, None)
+            async with call.cond:
+                call.done = True
+                call.cond.notify_all()
+
+    @staticmethod
+    async def _consume(call):
+        index = 0
+        while True:
+            async with call.cond:
+                await call.cond.wait_for(lambda: call.done or len(call.chunks) > index)
+                chunks = call.chunks[index:]
+                finished = call.done
+            for chunk in chunks:
+                yield chunk
+            index += len(chunks)
+            if finished and index >= len(call.chunks):
+                break
+        if call.error is not None:
+            raise call.error
+
+    async def _fetch_stream(self, key, model, messages, params, operation):
+        """Stream a response for a request missing from the cache (see EchoLensAI._fetch_stream)"""
+        cached, token = await asyncio.to_thread(self.ai.cache.claim, key)
+        if cached is not None:
+            yield cached
+            return
+        try:
+            async for chunk in self._stream_upstream(key, model, messages, params, operation):
+                yield chunk
+        finally:
+            await asyncio.to_thread(self.ai.cache.release, key, token)
+
+    async def _stream_upstream(self, key, model, messages, params, operation):
+        """Stream a response from Groq, caching it once complete (see EchoLensAI._stream_upstream)"""
+        started = time.perf_counter()
+
+        # Only opening the stream is retried; a stream that fails midway is not
+        estimated = estimate_tokens(messages, params)
+        stream = await self.ai.scheduler.call_async(
+            self.ai.upstream_call(self.client, model, messages, params, stream=True),
+            estimated_tokens=estimated
+        )
+
+        parts = []
+        cut_off = False
+        async for chunk in stream:
+            delta, finish_reason = self.ai.chunk_text(chunk, estimated, operation, model)
+            cut_off = cut_off or finish_reason == "length"
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        metrics.observe("llm_upstream_seconds", time.perf_counter() - started, operation=operation, model=model)
+        if cut_off:
+            self.ai.truncated(messages, params, operation, model, retry=False)
+            return
+        await asyncio.to_thread(self.ai.cache.set, key, "".join(parts))
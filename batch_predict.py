@@ -0,0 +1,90 @@
+"""
+EchoLens - Batch Predictions
+Forecast many regions from a CSV or JSONL file and stream results to JSONL
+
+Run: python batch_predict.py regions.csv -o forecasts.jsonl --concurrency 8
+
+Input rows need `region` and `current_cases` columns/keys; `forecast_days`
+is optional (default 90). Results are written as they complete, one JSON
+object per line, so a partially finished run is still usable.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from dataclasses import asdict, is_dataclass
+
+from groq_client import EchoLensAI
+
+
+def read_requests(path):
+    """Yield request dicts from a .csv file, or JSON lines from a .jsonl file ('-' reads stdin)
+
+    JSON lines are decoded by predict_many, so a malformed line fails only its own item.
+    """
+    if path == "-":
+        handle = sys.stdin
+    else:
+        handle = open(path, newline="", encoding="utf-8")
+
+    with handle:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(handle)
+            return
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def to_record(item):
+    """JSON-serializable output line for a BatchItem"""
+    record = {
+        "region": item.region,
+        "current_cases": item.current_cases,
+        "forecast_days": item.forecast_days,
+        "ok": item.ok,
+    }
+    if item.ok:
+        record["prediction"] = asdict(item.result) if is_dataclass(item.result) else item.result
+    else:
+        record["error"] = f"{type(item.error).__name__}: {item.error}"
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run EchoLens predictions for many regions")
+    parser.add_argument("input", help="CSV or JSONL file of (region, current_cases, forecast_days); '-' for JSONL on stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum requests in flight")
+    parser.add_argument("--structured", action="store_true", help="Request structured JSON predictions")
+    args = parser.parse_args(argv)
+
+    ai = EchoLensAI()
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started = time.monotonic()
+    failures = 0
+
+    def report(done, item):
+        status = "ok" if item.ok else f"FAILED ({item.error})"
+        print(f"[{done}] {item.region}: {status}", file=sys.stderr)
+
+    with output:
+        for item in ai.predict_many(
+            read_requests(args.input),
+            max_concurrency=args.concurrency,
+            on_progress=report,
+            structured=args.structured
+        ):
+            failures += not item.ok
+            output.write(json.dumps(to_record(item), ensure_ascii=False) + "\n")
+            output.flush()
+
+    print(f"Finished in {time.monotonic() - started:.1f}s with {failures} failure(s)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
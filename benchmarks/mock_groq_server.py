@@ -0,0 +1,233 @@
+"""
+EchoLens - Mock Groq Server
+Local OpenAI/Groq-compatible chat completions endpoint for benchmarks
+
+Run: python benchmarks/mock_groq_server.py --port 8765 --latency 0.3 --token-rate 400
+
+Point EchoLens at it with GROQ_BASE_URL=http://127.0.0.1:8765 (any
+GROQ_API_KEY). Latency, token rate, response length and error injection are
+configurable; streaming responses are sent as server-sent events.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+WORDS = (
+    "outbreak transmission region surveillance cases hospital capacity vaccine "
+    "historical pattern spread risk mortality contact tracing quarantine "
+    "population density travel hub response recommendation probability"
+).split()
+
+SAMPLE_PREDICTION = {
+    "risk_score": 64,
+    "risk_level": "High",
+    "probability_30d": 38.0,
+    "probability_60d": 55.0,
+    "probability_90d": 71.0,
+    "spread_pattern": "Urban clusters spreading along transit corridors",
+    "risk_factors": ["Population density", "Travel hub", "Limited ICU capacity"],
+    "hotspots": [{"location": "Capital City", "risk_score": 80}],
+    "recommendations": {
+        "immediate": ["Expand testing"],
+        "short_term": ["Prepare surge capacity"],
+        "long_term": ["Strengthen surveillance"]
+    },
+    "narrative": "## Outlook\n\nMock narrative for benchmarking."
+}
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.2          # seconds before the first byte
+    token_rate: float = 500.0     # completion tokens per second (0 = instant)
+    completion_tokens: int = 300  # tokens per response, capped by max_tokens
+    error_rate: float = 0.0       # fraction of requests answered with an error
+    error_status: int = 503       # status used for injected errors
+    retry_after: float = 0.0      # retry-after header on injected errors (0 = none)
+    truncate: bool = False        # finish_reason "length" when max_tokens cuts a response short
+
+
+class MockGroqServer:
+    """Threaded mock server; start() runs it in the background"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockConfig()
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="mock-groq", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, error):
+        with self._lock:
+            self.requests += 1
+            self.errors += error
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                config = server.config
+
+                time.sleep(config.latency)
+                if random.random() < config.error_rate:
+                    server._count(True)
+                    self._send_error(config)
+                    return
+                server._count(False)
+
+                content = self._content(body, config)
+                if body.get("stream"):
+                    self._send_stream(body, content, config)
+                else:
+                    if config.token_rate:
+                        time.sleep(len(content) / config.token_rate)
+                    self._send_json(200, self._completion(body, content, config))
+
+            def _content(self, body, config):
+                if "response_format" in body:
+                    return [json.dumps(SAMPLE_PREDICTION)]
+                n = min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)
+                return [random.choice(WORDS) + " " for _ in range(n)]
+
+            def _finish_reason(self, body, config):
+                max_tokens = body.get("max_tokens")
+                truncated = (
+                    config.truncate and "response_format" not in body
+                    and max_tokens and max_tokens < config.completion_tokens
+                )
+                return "length" if truncated else "stop"
+
+            def _usage(self, body, content):
+                prompt = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+                return {
+                    "prompt_tokens": prompt,
+                    "completion_tokens": len(content),
+                    "total_tokens": prompt + len(content)
+                }
+
+            def _completion(self, body, content, config):
+                return {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(content)},
+                        "finish_reason": self._finish_reason(body, config)
+                    }],
+                    "usage": self._usage(body, content)
+                }
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_error(self, config):
+                headers = {"retry-after": str(config.retry_after)} if config.retry_after else {}
+                self._send_json(
+                    config.error_status,
+                    {"error": {"message": "Injected error", "type": "mock_error"}},
+                    headers
+                )
+
+            def _send_stream(self, body, content, config):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                base = {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                }
+                delay = 1.0 / config.token_rate if config.token_rate else 0
+                for token in content:
+                    chunk = {**base, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if delay:
+                        time.sleep(delay)
+                final = {
+                    **base,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": self._finish_reason(body, config)}],
+                    "x_groq": {"usage": self._usage(body, content)}
+                }
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Groq chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first byte")
+    parser.add_argument("--token-rate", type=float, default=500.0, help="Tokens per second (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after
+    )
+    server = MockGroqServer(config, args.host, args.port)
+    print(f"Mock Groq server on {server.base_url} (set GROQ_BASE_URL to this)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+EchoLens - Mock Redis Server
+Local stand-in speaking the Redis protocol, for testing the shared cache backend
+
+Run: python benchmarks/mock_redis_server.py --port 6390
+
+Point EchoLens at it with ECHOLENS_CACHE_URL=redis://127.0.0.1:6390/0. Only
+the commands RedisBackend uses are implemented (GET, SET with EX/PX/NX/XX,
+PTTL, DEL, EXISTS, SCAN, DBSIZE, FLUSHDB, PING, AUTH, SELECT), and EVAL
+only understands its lock acquire and release scripts. Keys live in memory.
+"""
+
+import argparse
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class MockRedisServer:
+    """Threaded RESP server; start() runs it in the background"""
+
+    def __init__(self, host="127.0.0.1", port=0, password=None):
+        self.password = password
+        self.commands = 0
+        self._data = {}    # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="mock-redis", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _live(self, key):
+        # Caller holds self._lock
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return None
+        return entry
+
+    def execute(self, args, session):
+        """Reply to one command: bytes, str (simple string), int, list, None or Exception"""
+        name = args[0].decode().upper()
+        with self._lock:
+            self.commands += 1
+            if self.password is not None and not session["authed"] and name not in ("AUTH", "PING"):
+                return Exception("NOAUTH Authentication required.")
+            handler = getattr(self, f"_cmd_{name.lower()}", None)
+            if handler is None:
+                return Exception(f"ERR unknown command '{name}'")
+            try:
+                return handler(args[1:], session)
+            except (IndexError, ValueError):
+                return Exception(f"ERR wrong arguments for '{name}'")
+
+    def _cmd_ping(self, args, session):
+        return "PONG"
+
+    def _cmd_auth(self, args, session):
+        if args[-1].decode() != self.password:
+            return Exception("WRONGPASS invalid password")
+        session["authed"] = True
+        return "OK"
+
+    def _cmd_select(self, args, session):
+        int(args[0])
+        return "OK"
+
+    def _cmd_get(self, args, session):
+        entry = self._live(args[0])
+        return None if entry is None else entry[0]
+
+    def _cmd_set(self, args, session):
+        key, value, options = args[0], args[1], [a.decode().upper() for a in args[2:]]
+        expires_at = None
+        for i, option in enumerate(options):
+            if option in ("EX", "PX"):
+                amount = float(options[i + 1])
+                expires_at = time.time() + (amount if option == "EX" else amount / 1000)
+        exists = self._live(key) is not None
+        if ("NX" in options and exists) or ("XX" in options and not exists):
+            return None
+        self._data[key] = (value, expires_at)
+        return "OK"
+
+    def _cmd_pttl(self, args, session):
+        entry = self._live(args[0])
+        if entry is None:
+            return -2
+        return -1 if entry[1] is None else int((entry[1] - time.time()) * 1000)
+
+    def _cmd_del(self, args, session):
+        return sum(self._data.pop(key, None) is not None for key in args)
+
+    def _cmd_exists(self, args, session):
+        return sum(self._live(key) is not None for key in args)
+
+    def _cmd_dbsize(self, args, session):
+        return sum(self._live(key) is not None for key in list(self._data))
+
+    def _cmd_flushdb(self, args, session):
+        self._data.clear()
+        return "OK"
+
+    def _cmd_scan(self, args, session):
+        pattern = "*"
+        for i in range(1, len(args) - 1):
+            if args[i].decode().upper() == "MATCH":
+                pattern = args[i + 1].decode()
+        keys = [key for key in list(self._data) if self._live(key) is not None]
+        return [b"0", [key for key in keys if fnmatch.fnmatchcase(key.decode(), pattern)]]
+
+    def _cmd_eval(self, args, session):
+        # Only the lock scripts: KEYS[1], ARGV[1] (token) and, to acquire, ARGV[2] (ttl in ms)
+        script, key, token = args[0].decode(), args[2], args[3]
+        entry = self._live(key)
+        if 'redis.call("set"' in script:
+            if entry is None:
+                self._data[key] = (token, time.time() + float(args[4]) / 1000)
+                return 1
+            return 1 if entry[0] == token else 0
+        if 'redis.call("del"' not in script:
+            return Exception("ERR mock server only runs the lock scripts")
+        if entry is not None and entry[0] == token:
+            del self._data[key]
+            return 1
+        return 0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                session = {"authed": False}
+                while True:
+                    args = self._read_command()
+                    if args is None:
+                        return
+                    self.wfile.write(self._encode(server.execute(args, session)))
+
+            def _read_command(self):
+                line = self.rfile.readline()
+                if not line.startswith(b"*"):
+                    return None
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2])
+                return args
+
+            def _encode(self, reply):
+                if reply is None:
+                    return b"$-1\r\n"
+                if isinstance(reply, Exception):
+                    return b"-%s\r\n" % str(reply).encode()
+                if isinstance(reply, str):
+                    return b"+%s\r\n" % reply.encode()
+                if isinstance(reply, int):
+                    return b":%d\r\n" % reply
+                if isinstance(reply, bytes):
+                    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+                return b"*%d\r\n" % len(reply) + b"".join(self._encode(item) for item in reply)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Redis server for the shared cache")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--password", default=None)
+    args = parser.parse_args()
+
+    server = MockRedisServer(args.host, args.port, args.password)
+    print(f"Mock Redis server on {server.url} (set ECHOLENS_CACHE_URL to this)")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
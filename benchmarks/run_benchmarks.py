@@ -0,0 +1,282 @@
+"""
+EchoLens - Benchmark Suite
+Drives EchoLensAI and app.py against the local mock Groq server
+
+Run: python benchmarks/run_benchmarks.py --concurrency 1,4,16 --requests 64
+
+Reports throughput, end-to-end latency, time to first token and upstream
+requests per scenario and concurrency level, and saves the results as JSON under
+benchmarks/results/ (use --baseline to compare against an earlier run).
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_groq_server import MockConfig, MockGroqServer  # noqa: E402
+from mock_redis_server import MockRedisServer  # noqa: E402
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(name, concurrency, latencies, ttfts, errors, wall):
+    completed = len(latencies)
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": completed + errors,
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(completed / wall, 3) if wall else None,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "ttft_p50": percentile(ttfts, 0.5),
+        "ttft_p95": percentile(ttfts, 0.95),
+    }
+
+
+def timed(fn, i):
+    """Run fn(i) and return (latency, ttft); fn returns its time to first token or None"""
+    started = time.perf_counter()
+    ttft = fn(i)
+    return time.perf_counter() - started, ttft
+
+
+def run_load(concurrency, n_requests, fn, processes=False):
+    """Run fn(i) n_requests times with the given concurrency (threads or processes)"""
+    latencies, ttfts, errors = [], [], 0
+
+    wall_started = time.perf_counter()
+    if processes:
+        # A fresh process per request: AppTest leaves global Streamlit state behind
+        pool = ProcessPoolExecutor(max_workers=concurrency, max_tasks_per_child=1)
+    else:
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+    with pool:
+        for future in [pool.submit(timed, fn, i) for i in range(n_requests)]:
+            try:
+                latency, ttft = future.result()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(latency)
+            if ttft is not None:
+                ttfts.append(ttft)
+    return latencies, ttfts, errors, time.perf_counter() - wall_started
+
+
+def client_scenarios(ai, run_id):
+    """Scenario name -> fn(i). Each request uses a unique region so the cache never hits"""
+    unique = itertools.count()
+
+    def region():
+        return f"Bench Region {run_id}-{next(unique)}"
+
+    def predict(i):
+        ai.predict_outbreak(region(), 1000 + i, 90, structured=True)
+
+    def quick_risk(i):
+        ai.get_quick_risk(region(), 1000 + i)
+
+    def stream(i):
+        started = time.perf_counter()
+        ttft = None
+        for _ in ai.stream_prediction(region(), 1000 + i, 90):
+            if ttft is None:
+                ttft = time.perf_counter() - started
+        return ttft
+
+    def cached(i):
+        # Same query every time: measures the cache-hit path
+        ai.get_quick_risk("Bench Cached Region", 1000)
+
+    return {"predict": predict, "quick_risk": quick_risk, "stream": stream, "cached": cached}
+
+
+def replica_scenario(replicas):
+    """fn(i) sending each request to one of several EchoLensAI replicas sharing a cache backend
+
+    Consecutive groups of len(replicas) requests ask the same question on
+    different replicas, as a load balancer would spread repeated traffic; the
+    shared backend's stampede lock should make each group one upstream call.
+    """
+
+    def replicated(i):
+        replicas[i % len(replicas)].get_quick_risk(f"Bench Shared Region {i // len(replicas)}", 1000)
+
+    return replicated
+
+
+def app_request(i):
+    """Render app.py and click "Generate Prediction" with Streamlit's AppTest harness
+
+    AppTest is not safe to run on several threads at once, so the app scenario
+    runs each request in its own worker process. Latency is measured inside the
+    worker and covers a cold render (module imports included), the click and
+    polling until the prediction job's result is shown; process start-up only
+    shows in the throughput figure.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120).run()
+    region = next(t for t in at.text_input if "Region" in t.label)
+    region.set_value(f"Bench App Region {os.getpid()}-{time.time_ns()}-{i}")
+    at.button[0].click().run()
+    # The prediction runs as a background job; rerun until its result is shown
+    deadline = time.monotonic() + 120
+    while not at.exception and not at.error and not at.get("download_button"):
+        if time.monotonic() > deadline:
+            raise TimeoutError("Prediction job did not finish")
+        time.sleep(0.1)
+        at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    if at.error:
+        raise RuntimeError(at.error[0].value)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    baseline = {(r["scenario"], r["concurrency"]): r for r in (baseline or [])}
+    print(
+        f"{'scenario':<11} {'conc':>4} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'ttft50 ms':>10} {'err':>4} {'upstream':>8}"
+    )
+    for r in results:
+        def ms(value):
+            return f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}"
+        line = (
+            f"{r['scenario']:<11} {r['concurrency']:>4} {r['throughput_rps'] or 0:9.2f} "
+            f"{ms(r['latency_p50'])} {ms(r['latency_p95'])} {ms(r['latency_p99'])} "
+            f"{ms(r['ttft_p50']):>10} {r['errors']:>4} {r.get('upstream_requests', '-'):>8}"
+        )
+        previous = baseline.get((r["scenario"], r["concurrency"]))
+        if previous and previous.get("throughput_rps") and r["throughput_rps"]:
+            change = (r["throughput_rps"] / previous["throughput_rps"] - 1) * 100
+            line += f"   throughput {change:+.1f}% vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EchoLens against a mock Groq server")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per scenario and level")
+    parser.add_argument("--scenarios", default="predict,quick_risk,stream,cached",
+                        help="Comma-separated client scenarios; add 'app' for the Streamlit AppTest run "
+                             "and 'replicas' for several clients sharing a Redis-protocol cache")
+    parser.add_argument("--replicas", type=int, default=4, help="Clients in the replicas scenario")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock time to first byte (s)")
+    parser.add_argument("--token-rate", type=float, default=500.0, help="Mock tokens per second")
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results"),
+                        help="Directory for the results JSON")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare throughput against")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate
+    )
+    server = MockGroqServer(config).start()
+
+    # Configure EchoLens before it is imported: mock endpoint, no persistent
+    # cache, job store or prediction history, no background pre-warming
+    # calls, and client-side limits high enough not to be the bottleneck
+    os.environ.update({
+        "GROQ_BASE_URL": server.base_url,
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "mock-key"),
+        "ECHOLENS_CACHE_URL": "",
+        "ECHOLENS_CACHE_PATH": "",
+        "ECHOLENS_JOBS_PATH": "",
+        "ECHOLENS_HISTORY_PATH": "",
+        "ECHOLENS_PREWARM_INTERVAL": "0",
+        "ECHOLENS_RPM": "1000000",
+        "ECHOLENS_TPM": "1000000000",
+    })
+    from groq_client import EchoLensAI
+
+    ai = EchoLensAI()
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    scenarios = client_scenarios(ai, run_id)
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    if "app" in selected:
+        os.chdir(ROOT)  # app.py reads data/ relative to the working directory
+        scenarios["app"] = app_request
+    replica_caches = []
+    if "replicas" in selected:
+        from cache_backends import RedisBackend
+        from response_cache import ResponseCache
+
+        redis = MockRedisServer().start()
+        replica_caches = [
+            ResponseCache(backend=RedisBackend(redis.url), poll_interval=0.02) for _ in range(args.replicas)
+        ]
+        scenarios["replicas"] = replica_scenario([EchoLensAI(cache=cache) for cache in replica_caches])
+    scenarios["cached"](0)  # Warm the entry the cached scenario reads
+
+    results = []
+    for name in selected:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            print(f"Running {name} at concurrency {concurrency}...", file=sys.stderr)
+            if name == "replicas":
+                for cache in replica_caches:
+                    cache.clear()
+            upstream = server.requests
+            latencies, ttfts, errors, wall = run_load(
+                concurrency, args.requests, scenarios[name], processes=(name == "app")
+            )
+            results.append(summarize(name, concurrency, latencies, ttfts, errors, wall))
+            # Counted by the mock server, so the app scenario's worker processes are included
+            results[-1]["upstream_requests"] = server.requests - upstream
+    server.stop()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_table(results, baseline)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"bench_{run_id}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "mock": vars(config),
+            "requests_per_level": args.requests,
+            "results": results,
+        }, f, indent=2)
+    print(f"Saved results to {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+EchoLens - Cache Backends
+Key/value stores with TTLs and stampede locks: in-process memory, SQLite shared by
+the processes on one host, and Redis shared by every replica
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+
+class CacheBackendError(Exception):
+    """The backend is unreachable or rejected a command"""
+
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def loads(data):
+    return json.loads(data)
+
+
+class MemoryBackend:
+    """LRU dict for one process; values are stored as-is, not serialized"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._locks = {}               # name -> (token, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (value, expires_at) or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def acquire(self, name, ttl):
+        """Token if the lock was free (it expires after ttl seconds), else None"""
+        now = time.time()
+        with self._lock:
+            holder = self._locks.get(name)
+            if holder is not None and holder[1] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[name] = (token, now + ttl)
+            return token
+
+    def release(self, name, token):
+        """Release the lock if token still holds it"""
+        with self._lock:
+            if self._locks.get(name, (None,))[0] == token:
+                del self._locks[name]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """SQLite file shared by the processes on one host, so cached responses also survive restarts"""
+
+    def __init__(self, path, max_entries=1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS locks (
+                name TEXT PRIMARY KEY,
+                token TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, key):
+        """Return (value, expires_at) or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, dumps(value), expires_at, now)
+            )
+            # Drop expired rows, then the least recently used beyond the size bound
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self._conn.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def acquire(self, name, ttl):
+        """Token if the lock was free (it expires after ttl seconds), else None"""
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock:
+            # One write transaction, so two processes can't both take an expired lock
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND expires_at <= ?", (name, now))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO locks VALUES (?, ?, ?)", (name, token, now + ttl)
+            )
+            self._conn.commit()
+        return token if cursor.rowcount else None
+
+    def release(self, name, token):
+        """Release the lock if token still holds it"""
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+# Takes the lock if it is free or already ours: a retried acquire that did reach the server still succeeds
+ACQUIRE_SCRIPT = (
+    'local held = redis.call("get", KEYS[1]) '
+    'if held == false then redis.call("set", KEYS[1], ARGV[1], "PX", ARGV[2]) return 1 end '
+    'if held == ARGV[1] then return 1 else return 0 end'
+)
+
+# Deletes the lock only if it still holds our token (another holder may have taken an expired lock)
+RELEASE_SCRIPT = 'if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("del", KEYS[1]) else return 0 end'
+
+
+class _RedisConnection:
+    """One socket speaking RESP2"""
+
+    def __init__(self, host, port, timeout, use_ssl):
+        sock = socket.create_connection((host, port), timeout=timeout)
+        if use_ssl:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        self.sock = sock
+        self.file = sock.makefile("rb")
+
+    def send(self, *commands):
+        """Send commands in one write and read one reply per command"""
+        payload = bytearray()
+        for command in commands:
+            payload += b"*%d\r\n" % len(command)
+            for arg in command:
+                if not isinstance(arg, bytes):
+                    arg = str(arg).encode("utf-8")
+                payload += b"$%d\r\n%s\r\n" % (len(arg), arg)
+        self.sock.sendall(payload)
+        return [self.read() for _ in commands]
+
+    def read(self):
+        line = self.file.readline()
+        if not line.endswith(b"\r\n"):
+            raise CacheBackendError("Redis closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            return _RedisReplyError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.file.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read() for _ in range(length)]
+        raise CacheBackendError(f"Unexpected Redis reply: {line[:40]!r}")
+
+    def close(self):
+        try:
+            self.file.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class _RedisReplyError(str):
+    """Error reply, returned in place so the other replies of a pipeline can still be read"""
+
+
+class RedisBackend:
+    """Redis (or any server speaking its protocol) shared by every replica
+
+    A small built-in RESP client over pooled sockets, so no extra dependency is
+    needed. Keys are prefixed with namespace; expiry is left to Redis, and
+    locks are set-if-free with a TTL and released by a compare-and-delete
+    script, so every command is safe to send twice.
+    """
+
+    def __init__(self, url="redis://127.0.0.1:6379/0", namespace="echolens:", timeout=5.0, max_idle=8):
+        parts = urlsplit(url)
+        if parts.scheme not in ("redis", "rediss"):
+            raise ValueError(f"Not a redis:// URL: {url}")
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 6379
+        self.db = int(parts.path.strip("/") or 0)
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else None
+        self.ssl = parts.scheme == "rediss"
+        self.namespace = namespace
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        try:
+            connection = _RedisConnection(self.host, self.port, self.timeout, self.ssl)
+        except OSError as e:
+            raise CacheBackendError(f"Can't connect to Redis at {self.host}:{self.port}: {e}") from e
+        setup = []
+        if self.password is not None:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                self._check(self._send(connection, setup))
+            except CacheBackendError:
+                connection.close()
+                raise
+        return connection
+
+    def _send(self, connection, commands):
+        try:
+            return connection.send(*commands)
+        except (OSError, ValueError, CacheBackendError) as e:
+            connection.close()
+            raise CacheBackendError(f"Redis command failed: {e}") from e
+
+    @staticmethod
+    def _check(replies):
+        for reply in replies:
+            if isinstance(reply, _RedisReplyError):
+                raise CacheBackendError(f"Redis error: {reply}")
+        return replies
+
+    def execute(self, *commands):
+        """Run commands as one pipeline and return their replies
+
+        An idle pooled connection may have been closed by the server (its
+        idle timeout) or a proxy in the meantime, so if one fails the
+        commands are sent once more on a new connection. They may have run
+        the first time all the same, so only idempotent commands are sent
+        here (see acquire).
+        """
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        replies = None
+        if connection is not None:
+            try:
+                replies = self._send(connection, commands)
+            except CacheBackendError:
+                connection = None
+        if connection is None:
+            connection = self._connect()
+            replies = self._send(connection, commands)
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                connection = None
+        if connection is not None:
+            connection.close()
+        return self._check(replies)
+
+    def get(self, key):
+        """Return (value, expires_at) or None if missing or expired"""
+        key = self.namespace + key
+        data, ttl_ms = self.execute(("GET", key), ("PTTL", key))
+        if data is None:
+            return None
+        expires_at = time.time() + ttl_ms / 1000 if ttl_ms >= 0 else float("inf")
+        return loads(data.decode("utf-8")), expires_at
+
+    def set(self, key, value, expires_at):
+        ttl_ms = int((expires_at - time.time()) * 1000)
+        if ttl_ms > 0:
+            self.execute(("SET", self.namespace + key, dumps(value), "PX", ttl_ms))
+
+    def delete(self, key):
+        self.execute(("DEL", self.namespace + key))
+
+    def clear(self):
+        """Delete every key in the namespace"""
+        cursor = b"0"
+        while True:
+            cursor, keys = self.execute(("SCAN", cursor, "MATCH", self.namespace + "*", "COUNT", 500))[0]
+            if keys:
+                self.execute(("DEL", *keys))
+            if cursor == b"0":
+                break
+
+    def acquire(self, name, ttl):
+        """Token if the lock was free (it expires after ttl seconds), else None"""
+        token = uuid.uuid4().hex
+        reply, = self.execute(("EVAL", ACQUIRE_SCRIPT, 1, f"{self.namespace}lock:{name}", token, int(ttl * 1000)))
+        return token if reply == 1 else None
+
+    def release(self, name, token):
+        """Release the lock if token still holds it"""
+        self.execute(("EVAL", RELEASE_SCRIPT, 1, f"{self.namespace}lock:{name}", token))
+
+    def ping(self):
+        return self.execute(("PING",))[0] == "PONG"
+
+
+def backend_from_url(url, max_entries=1024):
+    """Backend for a cache URL: memory://, sqlite:///path/to/file.sqlite3 or redis[s]://host:port/db"""
+    scheme = urlsplit(url).scheme
+    if scheme == "memory":
+        return MemoryBackend(max_entries)
+    if scheme == "sqlite":
+        # sqlite:///relative/path or sqlite:////absolute/path
+        return SQLiteBackend(url.split("://", 1)[1][1:], max_entries)
+    if scheme in ("redis", "rediss"):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported cache URL: {url}")
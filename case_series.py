@@ -0,0 +1,505 @@
+"""
+EchoLens - Case Time Series
+Chunked CSV/Parquet ingestion into memory-mapped daily counts, with vectorized growth, doubling time and Rt
+
+Run: python case_series.py cases.csv [--store .cache/echolens_series]
+
+Input rows need a region, a date and either daily new cases or cumulative
+totals (see the *_COLUMNS aliases below). Files of any size are read in
+chunks; rows for a region can come in any order and duplicates are summed.
+Parquet needs pyarrow.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from regions import Gazetteer, DEFAULT_GAZETTEER
+from telemetry import metrics
+
+
+# Accepted column names, in order of preference
+REGION_COLUMNS = ("region", "location", "country", "area", "name")
+DATE_COLUMNS = ("date", "day", "reported_date")
+DAILY_COLUMNS = ("new_cases", "daily_cases", "cases", "confirmed")
+CUMULATIVE_COLUMNS = ("total_cases", "cumulative_cases", "cumulative")
+
+CHUNK_ROWS = 200_000
+
+# Regions processed together by summaries(): bounds the arrays held in memory
+BLOCK_REGIONS = 256
+
+# Serial interval (days between successive infections), COVID-19-like by default
+SERIAL_INTERVAL_MEAN = 4.7
+SERIAL_INTERVAL_SD = 2.9
+SERIAL_INTERVAL_DAYS = 21
+
+# Rt is not reported when the window's infection pressure is below this many cases
+MIN_RT_CASES = 12
+
+
+class CaseSeriesError(ValueError):
+    """The input file can't be read as a case series"""
+
+
+# ----------------------------------------------------------------------------
+# Vectorized window operations (along the last axis, so over many regions at once)
+# ----------------------------------------------------------------------------
+
+def rolling_sum(values, window):
+    """Sum of the last `window` values at each position; NaN until the window is full"""
+    values = np.asarray(values, dtype=np.float64)
+    cumulative = np.cumsum(values, axis=-1)
+    sums = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        sums[..., window - 1] = cumulative[..., window - 1]
+        sums[..., window:] = cumulative[..., window:] - cumulative[..., :-window]
+    return sums
+
+
+def growth_rate(daily, window=7):
+    """Exponential growth rate per day, from this week's cases against the previous week's"""
+    weekly = rolling_sum(np.clip(daily, 0, None), window)
+    rate = np.full(weekly.shape, np.nan)
+    current, previous = weekly[..., window:], weekly[..., :-window]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate[..., window:] = np.where((current > 0) & (previous > 0), np.log(current / previous) / window, np.nan)
+    return rate
+
+
+def doubling_time(rate):
+    """Days for cases to double (negative: to halve); inf when flat, NaN when unknown"""
+    rate = np.asarray(rate, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        return np.where(rate == 0, np.inf, math.log(2) / rate)
+
+
+def serial_interval(mean=SERIAL_INTERVAL_MEAN, sd=SERIAL_INTERVAL_SD, days=SERIAL_INTERVAL_DAYS):
+    """Discretized gamma serial interval weights for lags 1..days"""
+    shape = (mean / sd) ** 2
+    scale = sd ** 2 / mean
+    lags = np.arange(1, days + 1, dtype=np.float64)
+    log_pdf = (shape - 1) * np.log(lags) - lags / scale - math.lgamma(shape) - shape * math.log(scale)
+    weights = np.exp(log_pdf)
+    return weights / weights.sum()
+
+
+def infection_pressure(daily, weights):
+    """Lambda_t = sum over lags s of cases(t - s) * w_s"""
+    daily = np.clip(np.asarray(daily, dtype=np.float64), 0, None)
+    pressure = np.zeros(daily.shape)
+    for lag, weight in enumerate(weights, 1):
+        if lag >= daily.shape[-1]:
+            break
+        pressure[..., lag:] += weight * daily[..., :-lag]
+    return pressure
+
+
+def effective_reproduction(daily, window=7, weights=None, prior_shape=1.0, prior_scale=5.0, z=1.96):
+    """Rt over a sliding window (Cori et al. 2013): (mean, lower, upper) arrays
+
+    The posterior of Rt is gamma with shape prior_shape + cases in the window
+    and rate 1/prior_scale + infection pressure in the window; the credible
+    interval uses the Wilson-Hilferty approximation of its quantiles. NaN
+    where the window has too little infection pressure to say.
+    """
+    weights = serial_interval() if weights is None else weights
+    cases = rolling_sum(np.clip(daily, 0, None), window)
+    pressure = rolling_sum(infection_pressure(daily, weights), window)
+
+    valid = pressure >= MIN_RT_CASES
+    shape = prior_shape + np.where(valid, cases, 0)
+    rate = 1 / prior_scale + np.where(valid, pressure, 0)
+    mean = shape / rate
+
+    spread = np.sqrt(1 / (9 * shape))
+    lower = mean * np.clip(1 - 1 / (9 * shape) - z * spread, 0, None) ** 3
+    upper = mean * (1 - 1 / (9 * shape) + z * spread) ** 3
+    return tuple(np.where(valid, values, np.nan) for values in (mean, lower, upper))
+
+
+# ----------------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------------
+
+def _pick(names, candidates):
+    lookup = {name.strip().casefold(): i for i, name in enumerate(names)}
+    return next((lookup[c] for c in candidates if c in lookup), None)
+
+
+def _columns(names):
+    """(region, date, cases) column positions and whether cases are cumulative"""
+    region, date = _pick(names, REGION_COLUMNS), _pick(names, DATE_COLUMNS)
+    cases, cumulative = _pick(names, DAILY_COLUMNS), False
+    if cases is None:
+        cases, cumulative = _pick(names, CUMULATIVE_COLUMNS), True
+    if region is None or date is None or cases is None:
+        raise CaseSeriesError(
+            f"Case series needs region, date and case columns; found {', '.join(map(str, names))}"
+        )
+    return region, date, cases, cumulative
+
+
+def _days(values):
+    """Day numbers (since 1970-01-01) of dates or ISO date strings"""
+    try:
+        return np.asarray(values).astype("datetime64[s]").astype("datetime64[D]").astype(np.int64)
+    except ValueError as e:
+        raise CaseSeriesError(f"Unreadable date: {e}") from None
+
+
+def _numbers(values):
+    values = np.asarray(values)
+    if values.dtype.kind in "US":
+        values = np.where(np.char.strip(values) == "", "0", values)
+    try:
+        return np.nan_to_num(values.astype(np.float64))
+    except ValueError as e:
+        raise CaseSeriesError(f"Unreadable case count: {e}") from None
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield (cumulative, regions, days, cases) array chunks of a .csv or .parquet file"""
+    if path.endswith(".parquet"):
+        yield from _read_parquet(path, chunk_rows)
+    else:
+        yield from _read_csv(path, chunk_rows)
+
+
+def _read_csv(path, chunk_rows):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        region, date, cases, cumulative = _columns(header)
+        width = max(region, date, cases) + 1
+
+        rows = []
+        for row in reader:
+            if len(row) >= width:
+                rows.append((row[region], row[date], row[cases]))
+            if len(rows) >= chunk_rows:
+                yield (cumulative, *_chunk(rows))
+                rows = []
+        if rows:
+            yield (cumulative, *_chunk(rows))
+
+
+def _chunk(rows):
+    regions, dates, cases = zip(*rows)
+    return np.array(regions), _days(dates), _numbers(cases)
+
+
+def _read_parquet(path, chunk_rows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise CaseSeriesError("Reading Parquet needs pyarrow: pip install pyarrow") from None
+
+    parquet = pq.ParquetFile(path)
+    names = parquet.schema_arrow.names
+    region, date, cases, cumulative = _columns(names)
+    columns = [names[region], names[date], names[cases]]
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        regions, dates, counts = (batch.column(i).to_numpy(zero_copy_only=False) for i in range(3))
+        yield cumulative, regions.astype(str), _days(dates), _numbers(counts)
+
+
+# ----------------------------------------------------------------------------
+# Storage
+# ----------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SeriesSummary:
+    """Compact trend statistics of one region's latest data"""
+    region: str
+    start: str
+    end: str
+    total_cases: int
+    last_week_cases: int
+    active_cases: int           # New cases in the last 14 days
+    growth_rate: float          # Per day; NaN if unknown
+    doubling_time: float        # Days; negative halves, inf flat, NaN unknown
+    rt: float
+    rt_lower: float
+    rt_upper: float
+
+    def describe(self):
+        """One line of trend statistics for prompts"""
+        parts = [f"{self.last_week_cases:,} new cases in the last 7 days ({self.start} to {self.end})"]
+        if math.isfinite(self.growth_rate):
+            trend = f"growth {self.growth_rate:+.1%}/day"
+            # Beyond a year the trend is effectively flat
+            if abs(self.doubling_time) <= 365:
+                verb = "doubling" if self.doubling_time > 0 else "halving"
+                trend += f", {verb} every {abs(self.doubling_time):.1f} days"
+            parts.append(trend)
+        if math.isfinite(self.rt):
+            parts.append(f"Rt {self.rt:.2f} (95% CrI {self.rt_lower:.2f}-{self.rt_upper:.2f})")
+        return "; ".join(parts)
+
+
+class CaseSeries:
+    """Daily new cases per region, as a memory-mapped (regions x days) matrix on disk
+
+    Built by ingest() in two streaming passes: rows are appended to column
+    files as they are read, then scattered into the matrix chunk by chunk, so
+    memory use depends on the chunk size, not the file size. Region names are
+    resolved to their gazetteer names and aliases only, never fuzzily, so two
+    similar names in the file (India and Indiana) stay separate series; lookups
+    also accept the misspellings the cache keys do.
+    """
+
+    META = "meta.json"
+    MATRIX = "daily.f8"
+
+    def __init__(self, directory, gazetteer=None):
+        with open(os.path.join(directory, self.META), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.directory = directory
+        self.gazetteer = gazetteer if gazetteer is not None else _gazetteer()
+        self.regions = self.meta["regions"]
+        self.version = (directory, *self.meta["source"])
+        self.first_day = self.meta["first_day"]
+        shape = (len(self.regions), self.meta["days"])
+        self.daily = (
+            np.memmap(os.path.join(directory, self.MATRIX), dtype=np.float64, mode="r", shape=shape)
+            if all(shape) else np.zeros(shape)
+        )
+        self.by_region = {name: i for i, name in enumerate(self.regions)}
+
+    @classmethod
+    def ingest(cls, path, directory, chunk_rows=CHUNK_ROWS, gazetteer=None):
+        """Read a CSV/Parquet file into a new store at directory (replacing it) and open it"""
+        started = time.perf_counter()
+        gazetteer = gazetteer if gazetteer is not None else _gazetteer()
+        building = directory.rstrip("/\\") + ".building"
+        shutil.rmtree(building, ignore_errors=True)
+        os.makedirs(building)
+
+        # Pass 1: append (region code, day, cases) columns to disk, noting the day range
+        names, codes_by_name, resolved = [], {}, {}
+        first_day, last_day, rows, cumulative = None, None, 0, False
+        column_files = {
+            column: open(os.path.join(building, f"rows.{column}"), "wb")
+            for column in ("region", "day", "cases")
+        }
+        try:
+            for cumulative, regions, days, cases in read_chunks(path, chunk_rows):
+                unique, inverse = np.unique(regions, return_inverse=True)
+                codes = np.empty(len(unique), dtype=np.int32)
+                for i, raw in enumerate(unique.tolist()):
+                    if raw not in resolved:
+                        resolved[raw] = gazetteer.resolve(raw, fuzzy=False)[0]
+                    name = resolved[raw]
+                    if name not in codes_by_name:
+                        codes_by_name[name] = len(names)
+                        names.append(name)
+                    codes[i] = codes_by_name[name]
+
+                codes[inverse].astype(np.int32).tofile(column_files["region"])
+                days.astype(np.int32).tofile(column_files["day"])
+                cases.astype(np.float64).tofile(column_files["cases"])
+                first_day = int(days.min()) if first_day is None else min(first_day, int(days.min()))
+                last_day = int(days.max()) if last_day is None else max(last_day, int(days.max()))
+                rows += len(days)
+        finally:
+            for f in column_files.values():
+                f.close()
+
+        # Pass 2: scatter the rows into the matrix
+        n_days = 0 if rows == 0 else last_day - first_day + 1
+        shape = (len(names), n_days)
+        if rows:
+            matrix = np.memmap(os.path.join(building, cls.MATRIX), dtype=np.float64, mode="w+", shape=shape)
+            columns = {
+                column: np.memmap(os.path.join(building, f"rows.{column}"), dtype=dtype, mode="r")
+                for column, dtype in (("region", np.int32), ("day", np.int32), ("cases", np.float64))
+            }
+            for start in range(0, rows, chunk_rows):
+                chunk = slice(start, start + chunk_rows)
+                at = (columns["region"][chunk], columns["day"][chunk] - first_day)
+                # Cumulative totals may repeat for a day, also under another alias; keep the largest
+                (np.maximum if cumulative else np.add).at(matrix, at, columns["cases"][chunk])
+            del columns
+
+            if cumulative:
+                for block in range(0, len(names), BLOCK_REGIONS):
+                    totals = np.maximum.accumulate(matrix[block:block + BLOCK_REGIONS], axis=1)
+                    matrix[block:block + BLOCK_REGIONS] = np.diff(totals, axis=1, prepend=0)
+            matrix.flush()
+            del matrix
+        for column in ("region", "day", "cases"):
+            os.remove(os.path.join(building, f"rows.{column}"))
+
+        with open(os.path.join(building, cls.META), "w", encoding="utf-8") as f:
+            json.dump({
+                "regions": names,
+                "first_day": first_day or 0,
+                "days": n_days,
+                "rows": rows,
+                "source": _source_version(path),
+            }, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(building, directory)
+
+        metrics.inc("case_series_rows_total", rows)
+        metrics.observe("case_series_ingest_seconds", time.perf_counter() - started)
+        return cls(directory, gazetteer)
+
+    @classmethod
+    def load(cls, path, directory, chunk_rows=CHUNK_ROWS):
+        """Open the store for path at directory, ingesting path again only if it changed"""
+        try:
+            series = cls(directory)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            series = None
+        if series is not None and series.meta.get("source") == _source_version(path):
+            return series
+        return cls.ingest(path, directory, chunk_rows)
+
+    def __len__(self):
+        return len(self.regions)
+
+    @property
+    def days(self):
+        return self.daily.shape[1]
+
+    def dates(self):
+        """Dates of the matrix columns"""
+        return np.datetime64(self.first_day, "D") + np.arange(self.days)
+
+    def index(self, region):
+        """Row of a region (any alias or spelling the gazetteer resolves), or None"""
+        i = self.by_region.get(self.gazetteer.resolve(region, fuzzy=False)[0])
+        return i if i is not None else self.by_region.get(self.gazetteer.resolve(region)[0])
+
+    def __contains__(self, region):
+        return self.index(region) is not None
+
+    def trend(self, region, window=7):
+        """{"dates", "daily", "average", "rt", "rt_lower", "rt_upper"} arrays for charts, or None"""
+        i = self.index(region)
+        if i is None:
+            return None
+        daily = np.array(self.daily[i])
+        rt, rt_lower, rt_upper = effective_reproduction(daily, window)
+        return {
+            "dates": self.dates(),
+            "daily": daily,
+            "average": rolling_sum(daily, window) / window,
+            "rt": rt,
+            "rt_lower": rt_lower,
+            "rt_upper": rt_upper,
+        }
+
+    def summary(self, region):
+        """SeriesSummary of a region, or None"""
+        i = self.index(region)
+        return None if i is None else self._summaries(slice(i, i + 1))[0]
+
+    def summaries(self):
+        """SeriesSummary of every region, computed a block of regions at a time"""
+        for block in range(0, len(self), BLOCK_REGIONS):
+            yield from self._summaries(slice(block, block + BLOCK_REGIONS))
+
+    def _summaries(self, rows, window=7):
+        daily = np.array(self.daily[rows])
+        if not self.days:
+            daily = np.zeros((len(daily), 1))
+        # Latest day only: a stale estimate would misstate the current trend
+        weekly = rolling_sum(daily, window)[:, -1]
+        growth = growth_rate(daily, window)[:, -1]
+        rt, rt_lower, rt_upper = (values[:, -1] for values in effective_reproduction(daily, window))
+        doubling = doubling_time(growth)
+        dates = self.dates()
+        start, end = (str(dates[0]), str(dates[-1])) if self.days else ("", "")
+
+        return [
+            SeriesSummary(
+                region=self.regions[rows.start + i],
+                start=start,
+                end=end,
+                total_cases=int(daily[i].sum()),
+                last_week_cases=int(np.nan_to_num(weekly[i])),
+                active_cases=int(daily[i, -14:].sum()),
+                growth_rate=float(growth[i]),
+                doubling_time=float(doubling[i]),
+                rt=float(rt[i]),
+                rt_lower=float(rt_lower[i]),
+                rt_upper=float(rt_upper[i]),
+            )
+            for i in range(len(daily))
+        ]
+
+
+def _source_version(path):
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def _gazetteer():
+    try:
+        return Gazetteer.from_file(DEFAULT_GAZETTEER)
+    except FileNotFoundError:
+        return Gazetteer([])
+
+
+_series = {}
+_series_lock = threading.Lock()
+
+
+def get_case_series(path=None, directory=None):
+    """Process-wide store for ECHOLENS_CASE_SERIES (or path), or None if none is configured
+
+    Ingested into ECHOLENS_CASE_SERIES_DIR on first use and again whenever the
+    source file changes.
+    """
+    path = path or os.getenv('ECHOLENS_CASE_SERIES', '')
+    if not path:
+        return None
+    directory = directory or os.getenv('ECHOLENS_CASE_SERIES_DIR', '.cache/echolens_series')
+    source = _source_version(path)
+    key = (source[0], directory)
+    series = _series.get(key)
+    if series is not None and series.meta["source"] == source:
+        return series
+
+    with _series_lock:
+        series = _series.get(key)
+        if series is None or series.meta["source"] != source:
+            series = _series[key] = CaseSeries.load(path, directory)
+        return series
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest a daily case series and print per-region trends")
+    parser.add_argument("input", help="CSV or Parquet file of (region, date, cases)")
+    parser.add_argument("--store", default=".cache/echolens_series", help="Directory for the memory-mapped store")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows read per chunk")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    series = CaseSeries.ingest(args.input, args.store, args.chunk_rows)
+    print(
+        f"{series.meta['rows']:,} rows, {len(series)} regions, {series.days} days "
+        f"in {time.monotonic() - started:.1f}s",
+        file=sys.stderr
+    )
+    for summary in series.summaries():
+        print(f"{summary.region}: {summary.describe()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,131 +4,703 @@ Fast AI predictions using Groq's lightning-fast inference
 """
 
 import os
+import importlib.util
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+import httpx
 from groq import Groq
 from dotenv import load_dotenv
+from response_cache import ResponseCache, make_cache_key
+from prediction import RESPONSE_FORMAT, parse_prediction
+from singleflight import SingleFlight
+from scheduler import Scheduler
+from telemetry import metrics
+from retrieval import get_index, spread_profile
+from prompts import PromptBuilder, count_message_tokens
+from regions import Canonicalizer
 
 load_dotenv()
 
+log = logging.getLogger("echolens.client")
+
+# Audit trail of tiered-routing decisions (one JSON object per decision)
+routing_log = logging.getLogger("echolens.routing")
+if os.getenv('ECHOLENS_ROUTING_LOG'):
+    _routing_handler = logging.FileHandler(os.getenv('ECHOLENS_ROUTING_LOG'), encoding="utf-8")
+    _routing_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    routing_log.addHandler(_routing_handler)
+    routing_log.setLevel(logging.INFO)
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def http_client_options():
+    """Pool limits, timeouts and HTTP/2 setting from the ECHOLENS_HTTP_* environment variables"""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv('ECHOLENS_HTTP_MAX_CONNECTIONS', '20')),
+        max_keepalive_connections=int(os.getenv('ECHOLENS_HTTP_MAX_KEEPALIVE', '10')),
+        keepalive_expiry=float(os.getenv('ECHOLENS_HTTP_KEEPALIVE_EXPIRY', '60'))
+    )
+    timeout = httpx.Timeout(
+        float(os.getenv('ECHOLENS_HTTP_TIMEOUT', '60')),
+        connect=float(os.getenv('ECHOLENS_HTTP_CONNECT_TIMEOUT', '5'))
+    )
+    return dict(
+        limits=limits,
+        timeout=timeout,
+        http2=importlib.util.find_spec("h2") is not None
+    )
+
+
+def build_http_client():
+    """httpx client with pooled keep-alive connections and explicit timeouts
+    
+    Tunable through ECHOLENS_HTTP_* environment variables. HTTP/2 is used when
+    the optional `h2` package is installed.
+    """
+    return httpx.Client(**http_client_options())
+
+
+def get_shared_client():
+    """Process-wide Groq client so every session reuses one connection pool"""
+    global _shared_client
+    
+    with _shared_client_lock:
+        if _shared_client is None:
+            api_key = os.getenv('GROQ_API_KEY')
+            if not api_key:
+                raise ValueError("❌ GROQ_API_KEY not found! Add it to .env file")
+            
+            http_client = build_http_client()
+            _shared_client = Groq(
+                api_key=api_key,
+                http_client=http_client,
+                timeout=http_client.timeout,
+                max_retries=0  # Retries are handled by the Scheduler
+            )
+        return _shared_client
+
+
+@dataclass
+class BatchItem:
+    """Outcome of one request in a predict_many batch"""
+    index: int
+    region: str
+    current_cases: int
+    forecast_days: int
+    result: object = None
+    error: Exception = None
+    
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def estimate_tokens(messages, params):
+    """Upper bound on tokens a request will use: counted prompt plus max_tokens"""
+    return count_message_tokens(messages) + params.get("max_tokens", 0)
+
+
+# Used when data/pandemics.json is unavailable or none of its records match
+DEFAULT_CONTEXT = """- Black Death (1347-1353): Bubonic plague, killed 30-60% of Europe's population
+- Spanish Flu (1918-1920): H1N1 virus, 50+ million deaths globally
+- SARS (2002-2004): Coronavirus, 10% mortality rate, contained through quarantine
+- COVID-19 (2019-2023): SARS-CoV-2, global pandemic, 1-2% mortality"""
+
+
+@dataclass
+class Triage:
+    """Quick risk assessment from the triage model"""
+    risk_score: int     # None if the response had no usable score
+    risk_level: str
+    summary: str
+    model: str
+
+
+@dataclass
+class RoutingDecision:
+    escalate: bool      # True: run the full analysis on the large model
+    reason: str         # requested / above_threshold / below_threshold / unparsed / triage_failed
+    triage: Triage = None
+
+
+_RISK_SCORE = re.compile(r"risk\s*score\D{0,20}?(\d{1,3})", re.I)
+_RISK_LEVEL = re.compile(r"\b(low|medium|high|critical)\b", re.I)
+
+
+def parse_quick_risk(text, model):
+    """Triage from a get_quick_risk response (score, level, one-line summary)"""
+    # Drop markdown emphasis and asides like "(0-100)" that would pass for the score
+    text = re.sub(r"\([^)]*\)|\*\*", "", text)
+    score = _RISK_SCORE.search(text)
+    level = _RISK_LEVEL.search(text[score.end():] if score else text)
+    lines = [line.strip(" -*#") for line in text.splitlines() if line.strip(" -*#")]
+    summary = re.sub(r"^(\d+[.)]\s*)?([\w -]*summary\s*:\s*)?", "", lines[-1], flags=re.I) if lines else ""
+    return Triage(
+        risk_score=min(int(score.group(1)), 100) if score else None,
+        risk_level=level.group(1).capitalize() if level else None,
+        summary=summary,
+        model=model
+    )
+
+
+def describe_outbreak(region, current_cases, pathogen=None, trend=None):
+    """Short outbreak description used as input to the historical comparison
+
+    It is also the retrieval query for the historical context, so it carries
+    every signal the dataset can match: the pathogen or transmission hint and
+    the case trend (see retrieval.spread_profile), besides the region.
+    """
+    description = f"Region: {region}, Cases: {current_cases}"
+    if pathogen:
+        description += f", Pathogen: {pathogen}"
+    if trend:
+        description += f", Trend: {trend}"
+    return description
+
+
+@dataclass(frozen=True)
+class OutbreakDescription:
+    """An outbreak description (see describe_outbreak) for the historical comparison
+
+    text, sent to the model, has the exact case count; key has the canonical
+    region and case bucket, and is what the response is cached under.
+    """
+    text: str
+    key: str
+    
+    def __str__(self):
+        return self.text
+
+
 class EchoLensAI:
     """Simple Groq API client for pandemic predictions"""
     
-    def __init__(self):
-        api_key = os.getenv('GROQ_API_KEY')
-        if not api_key:
-            raise ValueError("❌ GROQ_API_KEY not found! Add it to .env file")
-        
-        self.client = Groq(api_key=api_key)
+    def __init__(self, cache=None, client=None, scheduler=None):
+        # The Groq client is thread-safe, so one instance serves every session
+        self.client = client if client is not None else get_shared_client()
         self.model = "openai/gpt-oss-120b"  # Fast and powerful
+        
+        # Identical requests are answered from cache instead of calling Groq again
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        
+        # Identical requests already in flight are joined rather than re-sent
+        self.inflight = SingleFlight()
+        
+        # Rate limits, retries and circuit breaker for calls that reach Groq
+        self.scheduler = scheduler if scheduler is not None else Scheduler.from_env()
+        
+        # Worker threads so independent requests don't wait on each other
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('ECHOLENS_MAX_WORKERS', '4')),
+            thread_name_prefix="echolens"
+        )
+        
+        # Number of relevant historical pandemics summarized in each prompt
+        self.context_k = int(os.getenv('ECHOLENS_CONTEXT_K', '4'))
+        
+        # Prompt layout, max_tokens and the per-request token budget
+        self.prompts = PromptBuilder.from_env()
+        
+        # Tiered routing: a small model triages first; the large model runs only when needed
+        self.triage_model = os.getenv('ECHOLENS_TRIAGE_MODEL', 'llama-3.1-8b-instant')
+        self.escalation_threshold = int(os.getenv('ECHOLENS_ESCALATION_THRESHOLD', '40'))
+        
+        # Equivalent region spellings and near-identical case counts share cache entries
+        self.canonicalizer = Canonicalizer.from_env()
+    
+    def submit(self, fn, *args, **kwargs):
+        """Run a client method in the background and return its Future"""
+        return self.executor.submit(fn, *args, **kwargs)
     
-    def predict_outbreak(self, region, current_cases, forecast_days=90):
-        """Predict pandemic outbreak for a region"""
+    def predict_many(self, requests, max_concurrency=4, on_progress=None, structured=False):
+        """Predict many regions concurrently, yielding BatchItems as they complete
         
-        prompt = f"""You are EchoLens, an AI expert trained on historical pandemic data.
-
-HISTORICAL KNOWLEDGE:
-- Black Death (1347-1353): Bubonic plague, killed 30-60% of Europe's population
-- Spanish Flu (1918-1920): H1N1 virus, 50+ million deaths globally
-- SARS (2002-2004): Coronavirus, 10% mortality rate, contained through quarantine
-- COVID-19 (2019-2023): SARS-CoV-2, global pandemic, 1-2% mortality
-
-CURRENT SITUATION:
-- Region: {region}
-- Active Cases: {current_cases:,}
-- Forecast Period: {forecast_days} days
-
-PREDICT:
-1. **Outbreak Risk Score** (0-100): Overall pandemic risk
-2. **30/60/90 Day Probability** (%): Likelihood of major outbreak
-3. **Spread Pattern**: Expected transmission rate and growth
-4. **Top 5 Risk Factors**: Why this region is vulnerable
-5. **Top 3 Hotspot Cities**: Specific locations at highest risk
-6. **Recommendations**: 
-   - Immediate actions (0-7 days)
-   - Short-term (1-4 weeks)
-   - Long-term (1-3 months)
-
-Format your response clearly with headers and bullet points.
-Be specific with numbers and probabilities.
-Base predictions on historical epidemic patterns."""
-
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are EchoLens, an expert epidemiologist AI specialized in pandemic prediction."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model=self.model,
-            temperature=0.7,
-            max_tokens=2000,
-            top_p=1,
-            stream=False
+        requests is an iterable of (region, current_cases[, forecast_days]) tuples,
+        dicts with those keys or JSON object strings; it is consumed lazily, so
+        at most 2 * max_concurrency requests are pending at once. A failing or
+        malformed request is reported on its BatchItem instead of stopping the
+        batch, as is an error reading requests (which ends the input). If
+        given, on_progress(done_count, item) is called after each completion.
+        """
+        
+        def normalize(index, request):
+            if isinstance(request, str):
+                request = json.loads(request)
+            if isinstance(request, dict):
+                return BatchItem(
+                    index,
+                    request["region"],
+                    int(request["current_cases"]),
+                    int(request.get("forecast_days") or 90)
+                )
+            region, current_cases, *rest = request
+            return BatchItem(index, region, int(current_cases), int(rest[0]) if rest else 90)
+        
+        def run(item):
+            try:
+                item.result = self.predict_outbreak(
+                    item.region, item.current_cases, item.forecast_days, structured
+                )
+            except Exception as e:
+                item.error = e
+            return item
+        
+        pending_requests = enumerate(requests)
+        index = -1
+        done_count = 0
+        
+        # Separate pool so a large batch doesn't starve interactive requests
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="echolens-batch") as pool:
+            pending = set()
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < 2 * max_concurrency:
+                    try:
+                        index, request = next(pending_requests)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    except Exception as e:
+                        # The input itself failed: report it and finish what's pending
+                        exhausted = True
+                        item = BatchItem(index + 1, "<input>", 0, 0, error=e)
+                        pending.add(pool.submit(lambda item=item: item))
+                        break
+                    try:
+                        item = normalize(index, request)
+                    except (KeyError, TypeError, ValueError) as e:
+                        region = request.get("region") if isinstance(request, dict) else None
+                        item = BatchItem(index, str(region or request), 0, 0, error=e)
+                        pending.add(pool.submit(lambda item=item: item))
+                        continue
+                    pending.add(pool.submit(run, item))
+                
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    done_count += 1
+                    item = future.result()
+                    if on_progress:
+                        on_progress(done_count, item)
+                    yield item
+    
+    def predict_outbreak(self, region, current_cases, forecast_days=90, structured=False, sections=None,
+                         trend=None, pathogen=None):
+        """Predict pandemic outbreak for a region
+        
+        With structured=True the model answers in JSON mode and a PredictionResult
+        (risk score, 30/60/90-day probabilities, hotspots, ... and the markdown
+        narrative) is returned instead of plain markdown. sections limits the
+        analysis to some of prompts.PREDICTION_SECTIONS (keys), which also
+        lowers max_tokens. trend is an optional line of case-series statistics
+        (case_series.SeriesSummary.describe()) and pathogen an optional
+        free-text pathogen or transmission hint (e.g. "H5N1 influenza").
+        """
+        
+        request = self.prediction_request(
+            region, current_cases, forecast_days, structured, sections, trend, pathogen
         )
+        response = self._complete(operation="predict", **request)
+        return parse_prediction(response) if structured else response
+    
+    def stream_prediction(self, region, current_cases, forecast_days=90, sections=None, trend=None, pathogen=None):
+        """Stream the outbreak prediction as text chunks while it is generated"""
+        
+        request = self.prediction_request(
+            region, current_cases, forecast_days, sections=sections, trend=trend, pathogen=pathogen
+        )
+        return self._stream(operation="predict", **request)
+    
+    def canonical(self, region, current_cases, kind, *extra):
+        """Canonical region and case count for a request (see regions.Canonicalizer)"""
         
-        return chat_completion.choices[0].message.content
+        query = self.canonicalizer.canonical(region, current_cases, kind, *extra)
+        metrics.inc("canonical_queries_total", kind=kind, match=query.match, nearby=query.nearby)
+        return query
+    
+    def describe(self, region, current_cases, pathogen=None, trend=None):
+        """OutbreakDescription for the historical comparison, with the exact and the canonical case count"""
+        
+        query = self.canonical(region, current_cases, "compare", pathogen, trend)
+        return OutbreakDescription(
+            describe_outbreak(query.region, int(current_cases), pathogen, trend),
+            describe_outbreak(query.region, query.current_cases, pathogen, trend)
+        )
+    
+    def historical_context(self, description):
+        """Summaries of the dataset's pandemics most relevant to an outbreak description, one per line
+        
+        Falls back to DEFAULT_CONTEXT when nothing in the description (see
+        describe_outbreak) matches the dataset, e.g. a bare region name.
+        """
+        
+        try:
+            context = get_index().context(f"{description} {spread_profile(description)}", self.context_k)
+        except FileNotFoundError:
+            context = ""
+        metrics.inc("retrieval_queries_total", result="matched" if context else "default")
+        return context or DEFAULT_CONTEXT
+    
+    def prediction_request(self, region, current_cases, forecast_days, structured=False, sections=None,
+                           trend=None, pathogen=None):
+        """Chat request (messages and parameters) for an outbreak prediction
+        
+        The request builders are shared with AsyncEchoLensAI and the
+        Prewarmer, so every path sends, and caches, identical requests. The
+        model gets the exact case count; the cache key the canonical one (see
+        keyed_request).
+        """
+        
+        query = self.canonical(
+            region, current_cases, "predict", forecast_days, structured, tuple(sections or ()), trend, pathogen
+        )
+        context = self.historical_context(describe_outbreak(query.region, int(current_cases), pathogen, trend))
+        prompts = [
+            self.prompts.prediction(
+                query.region, cases, forecast_days, context, structured, sections, trend, pathogen, model=self.model
+            )
+            for cases in (int(current_cases), query.current_cases)
+        ]
+        request = self.keyed_request(*prompts, "predict", temperature=0.7, top_p=1)
+        if structured:
+            request["response_format"] = RESPONSE_FORMAT
+        return request
     
     def analyze_comparison(self, current_outbreak):
         """Compare current situation to historical pandemics"""
         
-        prompt = f"""Compare this outbreak to historical pandemics:
-
-CURRENT OUTBREAK:
-{current_outbreak}
-
-COMPARE TO:
-- Black Death (1347-1353)
-- Spanish Flu (1918-1920)  
-- SARS (2002-2004)
-- COVID-19 (2019-2023)
-
-Which historical pandemic does this most resemble and why?
-What lessons from that pandemic apply here?
-What's the likely outcome based on historical patterns?"""
-
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a pandemic historian and epidemiologist."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model=self.model,
-            temperature=0.7,
-            max_tokens=1500
-        )
+        return self._complete(operation="compare", **self.comparison_request(current_outbreak))
+    
+    def stream_comparison(self, current_outbreak):
+        """Stream the historical comparison as text chunks while it is generated"""
         
-        return chat_completion.choices[0].message.content
+        return self._stream(operation="compare", **self.comparison_request(current_outbreak))
     
-    def get_quick_risk(self, region, cases):
+    def comparison_request(self, current_outbreak):
+        """Chat request for a historical comparison of an outbreak description (see describe)"""
+        
+        text = str(current_outbreak)
+        context = self.historical_context(text)
+        prompts = [
+            self.prompts.comparison(description, context, model=self.model)
+            for description in (text, getattr(current_outbreak, "key", text))
+        ]
+        return self.keyed_request(*prompts, "compare", temperature=0.7)
+    
+    def get_quick_risk(self, region, cases, model=None):
         """Get quick risk assessment"""
         
-        prompt = f"""Quick pandemic risk assessment for {region} with {cases:,} active cases.
-        
-Provide ONLY:
-1. Risk Score (0-100)
-2. Risk Level (Low/Medium/High/Critical)
-3. One sentence summary
-
-Be concise."""
-
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model=self.model,
-            temperature=0.5,
-            max_tokens=200
+        return self._complete(operation="quick_risk", model=model, **self.quick_risk_request(region, cases, model))
+    
+    def quick_risk_request(self, region, cases, model=None):
+        """Chat request for a quick risk assessment on model (self.model unless given)"""
+        
+        query = self.canonical(region, cases, "quick_risk")
+        prompts = [
+            self.prompts.quick_risk(query.region, count, model=model or self.model)
+            for count in (int(cases), query.current_cases)
+        ]
+        return self.keyed_request(*prompts, "quick_risk", temperature=0.5)
+    
+    def keyed_request(self, prompt, key_prompt, operation, **params):
+        """Chat request sending prompt, cached as if it were key_prompt
+        
+        key_prompt is the same prompt with the canonical case count, so
+        requests whose counts fall in one bucket share a response while each
+        prompt still states its own count.
+        """
+        
+        self._record_prompt(prompt, operation)
+        request = dict(messages=prompt.messages, max_tokens=prompt.max_tokens, **params)
+        if key_prompt.messages != prompt.messages:
+            request["cache_messages"] = key_prompt.messages
+        return request
+    
+    def triage(self, region, cases):
+        """Quick risk assessment on the small triage model"""
+        
+        return parse_quick_risk(self.get_quick_risk(region, cases, model=self.triage_model), self.triage_model)
+    
+    def route(self, region, cases, force=False):
+        """Decide whether a request needs the full analysis on the large model
+        
+        Escalates when forced, when the triage risk score reaches
+        escalation_threshold, or when triage fails or gives no score. Each
+        decision is logged to the "echolens.routing" logger and counted.
+        """
+        
+        if force:
+            decision = RoutingDecision(True, "requested")
+        else:
+            try:
+                triage = self.triage(region, cases)
+            except Exception as e:
+                decision = RoutingDecision(True, "triage_failed")
+                routing_log.warning("Triage failed for %r: %s", region, e)
+            else:
+                if triage.risk_score is None:
+                    decision = RoutingDecision(True, "unparsed", triage)
+                elif triage.risk_score >= self.escalation_threshold:
+                    decision = RoutingDecision(True, "above_threshold", triage)
+                else:
+                    decision = RoutingDecision(False, "below_threshold", triage)
+        
+        metrics.inc("routing_decisions_total", escalated=decision.escalate, reason=decision.reason)
+        routing_log.info(json.dumps({
+            "region": region,
+            "cases": cases,
+            "escalated": decision.escalate,
+            "reason": decision.reason,
+            "triage_model": self.triage_model,
+            "triage_score": decision.triage.risk_score if decision.triage else None,
+            "threshold": self.escalation_threshold,
+            "model": self.model if decision.escalate else self.triage_model,
+        }, ensure_ascii=False))
+        return decision
+    
+    def warm(self, request, operation, model=None, min_ttl=0, budget=None):
+        """Fetch a request's response into the cache unless it stays cached for min_ttl more seconds
+        
+        request is a chat request from one of the *_request builders.
+        budget.acquire(estimated tokens) (see prewarm.PrewarmBudget) is waited
+        on before calling Groq. Returns True if Groq was called; raises
+        ValueError, caching nothing, if a structured prediction comes back
+        malformed.
+        """
+        
+        params = {name: value for name, value in request.items() if name not in ("messages", "cache_messages")}
+        model, key = self.request_key(request["messages"], model, params, request.get("cache_messages"))
+        expires_at = self.cache.expires_at(key)
+        if expires_at is not None and expires_at - time.time() >= min_ttl:
+            return False
+        
+        if budget is not None:
+            budget.acquire(estimate_tokens(request["messages"], params))
+        if expires_at is None:
+            # Missing: the usual path, so other processes warming the same request wait for this one
+            self._complete(operation=operation, model=model, **request)
+        else:
+            # About to expire: fetch again even though it's still cached
+            self.inflight.do(
+                ("complete", key),
+                lambda: self._fetch_upstream(key, model, request["messages"], params, operation)
+            )
+        return True
+    
+    @staticmethod
+    def _record_prompt(prompt, operation):
+        """Counted prompt size and any context trimmed to fit the budget"""
+        
+        metrics.observe("llm_prompt_tokens_counted", prompt.prompt_tokens, operation=operation)
+        if prompt.context_dropped:
+            metrics.inc("llm_prompt_context_dropped_total", prompt.context_dropped, operation=operation)
+    
+    # Shared by the sync methods below and AsyncEchoLensAI, which differ only
+    # in how they wait: request keys, upstream calls and token accounting.
+    
+    def request_key(self, messages, model, params, cache_messages=None):
+        """(model, cache key) of a chat request; model defaults to self.model
+        
+        The key is computed from cache_messages instead of messages if given
+        (see keyed_request).
+        """
+        
+        model = model or self.model
+        return model, make_cache_key(model, cache_messages or messages, **params)
+    
+    @staticmethod
+    def record_lookup(operation, cached):
+        metrics.inc("llm_cache_lookups_total", operation=operation, result="miss" if cached is None else "hit")
+    
+    @staticmethod
+    def upstream_call(client, model, messages, params, stream):
+        """Function of the remaining timeout creating a chat completion, for Scheduler.call(_async)"""
+        
+        return lambda timeout: client.chat.completions.create(
+            messages=messages,
+            model=model,
+            stream=stream,
+            timeout=timeout,
+            **params
+        )
+    
+    def record_usage(self, estimated, usage, operation, model):
+        """Settle the token estimate with Groq's reported usage and count the tokens"""
+        
+        self.scheduler.record_usage(estimated, getattr(usage, "total_tokens", None))
+        if usage is not None:
+            metrics.inc("llm_prompt_tokens_total", usage.prompt_tokens, operation=operation, model=model)
+            metrics.inc("llm_completion_tokens_total", usage.completion_tokens, operation=operation, model=model)
+    
+    def completion_text(self, chat_completion, estimated, operation, model):
+        """(text, truncated) of a full chat completion, after recording its usage"""
+        
+        self.record_usage(estimated, getattr(chat_completion, "usage", None), operation, model)
+        choice = chat_completion.choices[0]
+        return choice.message.content, getattr(choice, "finish_reason", None) == "length"
+    
+    def chunk_text(self, chunk, estimated, operation, model):
+        """(text, finish_reason) of a stream chunk, recording usage when it reports it"""
+        
+        # Groq reports token usage on the final chunk
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+        if usage is not None:
+            self.record_usage(estimated, usage, operation, model)
+        if not chunk.choices:
+            return None, None
+        return chunk.choices[0].delta.content, getattr(chunk.choices[0], "finish_reason", None)
+    
+    @staticmethod
+    def cacheable(content, params):
+        """content, validated first if params ask for a structured prediction
+        
+        Raises ValueError (see prediction.parse_prediction) for a malformed
+        JSON answer, so it is never cached and the next request asks again.
+        """
+        
+        if "response_format" in params:
+            parse_prediction(content)
+        return content
+    
+    def truncated(self, messages, params, operation, model, retry=True):
+        """Parameters for asking again for a response cut off at max_tokens, or None to give up
+        
+        The retry gets twice the max_tokens, within the token budget. A
+        response that is given up on is returned as is but not cached.
+        """
+        
+        metrics.inc("llm_truncated_total", operation=operation, model=model)
+        max_tokens = params.get("max_tokens")
+        if retry and max_tokens is not None:
+            retry_tokens = min(2 * max_tokens, self.prompts.budget - count_message_tokens(messages))
+            if retry_tokens > max_tokens:
+                return {**params, "max_tokens": retry_tokens}
+        log.warning("%s response from %s cut off at %s tokens", operation, model, max_tokens)
+        return None
+    
+    def _complete(self, messages, operation="chat", model=None, cache_messages=None, **params):
+        """Send a chat request (to self.model unless given) and return the full response text"""
+        
+        model, key = self.request_key(messages, model, params, cache_messages)
+        with metrics.timer("llm_call_seconds", operation=operation, mode="complete"):
+            cached = self.cache.get(key)
+            self.record_lookup(operation, cached)
+            if cached is not None:
+                return cached
+            
+            # Concurrent identical requests share one upstream call
+            return self.inflight.do(("complete", key), lambda: self._fetch(key, model, messages, params, operation))
+    
+    def _fetch(self, key, model, messages, params, operation):
+        """Full response for a request missing from the cache
+        
+        If another process is already fetching the same request (see
+        ResponseCache.claim), its response is waited for instead.
+        """
+        
+        cached, token = self.cache.claim(key)
+        if cached is not None:
+            return cached
+        try:
+            return self._fetch_upstream(key, model, messages, params, operation)
+        finally:
+            self.cache.release(key, token)
+    
+    def _fetch_upstream(self, key, model, messages, params, operation):
+        """Call Groq for a full response and cache it
+        
+        A response cut off at max_tokens is asked for once more with a larger
+        max_tokens (see truncated). A structured prediction is only cached
+        once it parses (see cacheable).
+        """
+        
+        for attempt in range(2):
+            estimated = estimate_tokens(messages, params)
+            with metrics.timer("llm_upstream_seconds", operation=operation, model=model):
+                chat_completion = self.scheduler.call(
+                    self.upstream_call(self.client, model, messages, params, stream=False),
+                    estimated_tokens=estimated
+                )
+            
+            content, cut_off = self.completion_text(chat_completion, estimated, operation, model)
+            if not cut_off:
+                self.cache.set(key, self.cacheable(content, params))
+                return content
+            params = self.truncated(messages, params, operation, model, retry=attempt == 0)
+            if params is None:
+                break
+        return content
+    
+    def _stream(self, messages, operation="chat", model=None, cache_messages=None, **params):
+        """Send a chat request (to self.model unless given) and yield response text as it arrives"""
+        
+        started = time.perf_counter()
+        model, key = self.request_key(messages, model, params, cache_messages)
+        cached = self.cache.get(key)
+        self.record_lookup(operation, cached)
+        if cached is not None:
+            metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - started, operation=operation)
+            yield cached
+            return
+        
+        # Concurrent identical streams are fed from one upstream stream
+        first = True
+        for chunk in self.inflight.stream(("stream", key), lambda: self._fetch_stream(key, model, messages, params, operation)):
+            if first:
+                metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - started, operation=operation)
+                first = False
+            yield chunk
+        metrics.observe("llm_call_seconds", time.perf_counter() - started, operation=operation, mode="stream")
+    
+    def _fetch_stream(self, key, model, messages, params, operation):
+        """Stream a response for a request missing from the cache
+        
+        If another process is already fetching the same request, its cached
+        response is yielded whole once ready.
+        """
+        
+        cached, token = self.cache.claim(key)
+        if cached is not None:
+            yield cached
+            return
+        try:
+            yield from self._stream_upstream(key, model, messages, params, operation)
+        finally:
+            self.cache.release(key, token)
+    
+    def _stream_upstream(self, key, model, messages, params, operation):
+        """Stream a response from Groq, caching it once complete"""
+        
+        started = time.perf_counter()
+        
+        # Only opening the stream is retried; a stream that fails midway is not
+        estimated = estimate_tokens(messages, params)
+        stream = self.scheduler.call(
+            self.upstream_call(self.client, model, messages, params, stream=True),
+            estimated_tokens=estimated
         )
         
-        return chat_completion.choices[0].message.content
+        parts = []
+        cut_off = False
+        for chunk in stream:
+            delta, finish_reason = self.chunk_text(chunk, estimated, operation, model)
+            cut_off = cut_off or finish_reason == "length"
+            if delta:
+                parts.append(delta)
+                yield delta
+        
+        metrics.observe("llm_upstream_seconds", time.perf_counter() - started, operation=operation, model=model)
+        # Text already shown can't be asked for again: a cut-off answer just isn't cached
+        if cut_off:
+            self.truncated(messages, params, operation, model, retry=False)
+            return
+        self.cache.set(key, "".join(parts))
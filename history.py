@@ -0,0 +1,241 @@
+"""
+EchoLens - Prediction History
+Every finished prediction, its report and its cost, kept in an indexed SQLite store
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+from prediction import parse_prediction
+
+
+@dataclass
+class HistoryEntry:
+    id: int
+    region: str
+    current_cases: int
+    forecast_days: int
+    population: int
+    model: str
+    latency: float      # Seconds from job start to result
+    created_at: float
+    prediction: dict    # PredictionResult fields
+    comparison: str
+    report: str
+
+    @property
+    def generated_at(self):
+        return datetime.fromtimestamp(self.created_at)
+
+    def result(self):
+        """The stored PredictionResult"""
+        return parse_prediction(json.dumps(self.prediction))
+
+    @property
+    def file_name(self):
+        return report_file_name(self.region, self.created_at)
+
+
+def report_file_name(region, created_at):
+    stamp = datetime.fromtimestamp(created_at).strftime('%Y%m%d_%H%M%S')
+    return f"echolens_report_{region.replace(' ', '_')}_{stamp}.txt"
+
+
+def format_report(region, current_cases, forecast_days, narrative, comparison, created_at, model):
+    """Plain-text prediction report, as offered for download"""
+    generated = datetime.fromtimestamp(created_at, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return f"""EchoLens Prediction Report
+Generated: {generated} UTC
+
+Region: {region}
+Active Cases: {current_cases:,}
+Forecast Period: {forecast_days} days
+
+=== PREDICTION ===
+{narrative}
+
+=== HISTORICAL COMPARISON ===
+{comparison}
+
+---
+Built by @A-P-U-R-B-O
+Powered by Groq API ({model})
+"""
+
+
+class HistoryStore:
+    """Append-only SQLite log of predictions
+
+    Indexed by region (case-insensitive), time and forecast period so "latest
+    per region", per-region listings and pages of recent runs stay fast as the
+    log grows. Listings skip the large text columns; get() loads one entry in
+    full.
+    """
+
+    SUMMARY_COLUMNS = "id, region, current_cases, forecast_days, created_at, latency"
+    COLUMNS = (
+        "id, region, current_cases, forecast_days, population, model, latency, "
+        "created_at, prediction, comparison, report"
+    )
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                region TEXT NOT NULL,
+                region_key TEXT NOT NULL,
+                current_cases INTEGER NOT NULL,
+                forecast_days INTEGER NOT NULL,
+                population INTEGER,
+                model TEXT NOT NULL,
+                latency REAL,
+                created_at REAL NOT NULL,
+                prediction TEXT NOT NULL,
+                comparison TEXT NOT NULL,
+                report TEXT NOT NULL
+            )
+        """)
+        for name, columns in (
+            ("idx_predictions_region", "region_key, created_at"),
+            ("idx_predictions_created", "created_at"),
+            ("idx_predictions_period", "forecast_days, created_at"),
+        ):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON predictions ({columns})")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Build from ECHOLENS_HISTORY_PATH (empty keeps history in memory)"""
+        return cls(os.getenv('ECHOLENS_HISTORY_PATH', '.cache/echolens_history.sqlite3') or ":memory:")
+
+    def record(self, region, current_cases, forecast_days, result, comparison, model,
+               latency=None, population=None):
+        """Store a finished prediction (a PredictionResult) and return its ID"""
+        created_at = time.time()
+        report = format_report(
+            region, current_cases, forecast_days, result.narrative, comparison, created_at, model
+        )
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO predictions (region, region_key, current_cases, forecast_days, population, "
+                "model, latency, created_at, prediction, comparison, report) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    region, region.strip().casefold(), current_cases, forecast_days, population,
+                    model, latency, created_at, json.dumps(asdict(result)), comparison, report
+                )
+            )
+            self._conn.commit()
+        return cursor.lastrowid
+
+    def get(self, entry_id):
+        """Full entry by ID, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.COLUMNS} FROM predictions WHERE id = ?", (entry_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        *fields, prediction, comparison, report = row
+        return HistoryEntry(*fields, json.loads(prediction), comparison, report)
+
+    def report(self, entry_id):
+        """(file name, report text) for an entry, or None; reads only what the download needs"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT region, created_at, report FROM predictions WHERE id = ?", (entry_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        region, created_at, report = row
+        return report_file_name(region, created_at), report
+
+    def recent(self, limit=10, offset=0, region=None, forecast_days=None):
+        """Summary dicts of runs, newest first, optionally for one region / period"""
+        where, args = self._where(region, forecast_days)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self.SUMMARY_COLUMNS} FROM predictions {where} "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*args, limit, offset)
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def count(self, region=None, forecast_days=None):
+        where, args = self._where(region, forecast_days)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM predictions {where}", args).fetchone()[0]
+
+    def latest_per_region(self, limit=10, offset=0):
+        """Summary of the newest run for each region, most recently updated first"""
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT {self.SUMMARY_COLUMNS} FROM predictions AS p
+                WHERE created_at = (
+                    SELECT MAX(created_at) FROM predictions WHERE region_key = p.region_key
+                )
+                ORDER BY created_at DESC LIMIT ? OFFSET ?
+            """, (limit, offset)).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def popular(self, limit=10, since=0, canonical=None):
+        """Most-run regions since a time, most runs first, with their latest run's settings
+
+        canonical(region) names the region a spelling stands for (e.g. the
+        gazetteer's resolution), so aliases count as one region; by default
+        only spellings differing in case do.
+        """
+        with self._lock:
+            # SQLite takes the bare columns from the row holding MAX(created_at)
+            rows = self._conn.execute("""
+                SELECT region, current_cases, forecast_days, MAX(created_at), COUNT(*) AS runs
+                FROM predictions WHERE created_at >= ?
+                GROUP BY region_key
+            """, (since,)).fetchall()
+
+        regions = {}
+        for region, current_cases, forecast_days, latest, runs in rows:
+            key = canonical(region) if canonical else region.strip().casefold()
+            entry = regions.get(key)
+            if entry is None or latest > entry["latest"]:
+                regions[key] = {
+                    "region": region, "current_cases": current_cases, "forecast_days": forecast_days,
+                    "runs": runs + (entry["runs"] if entry else 0), "latest": latest
+                }
+            else:
+                entry["runs"] += runs
+        ranked = sorted(regions.values(), key=lambda entry: (-entry["runs"], -entry["latest"]))[:limit]
+        for entry in ranked:
+            del entry["latest"]
+        return ranked
+
+    def region_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT region_key) FROM predictions").fetchone()[0]
+
+    @staticmethod
+    def _where(region, forecast_days):
+        clauses, args = [], []
+        if region:
+            clauses.append("region_key = ?")
+            args.append(region.strip().casefold())
+        if forecast_days:
+            clauses.append("forecast_days = ?")
+            args.append(forecast_days)
+        return ("WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    @staticmethod
+    def _summary(row):
+        return dict(zip(("id", "region", "current_cases", "forecast_days", "created_at", "latency"), row))
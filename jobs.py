@@ -0,0 +1,369 @@
+"""
+EchoLens - Background Jobs
+Predictions run on a bounded worker pool, with job state kept in SQLite
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+from prediction import PredictionResult, parse_prediction
+from seir import simulate_outbreak
+from telemetry import metrics
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+UNFINISHED = (QUEUED, RUNNING)
+
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    params: dict
+    progress: str      # Comparison text streamed so far
+    result: dict       # {"prediction": {...}, "comparison": "...", "route": {...}, "history_id": ...} once done
+    error: str
+    error_type: str
+    created_at: float
+    updated_at: float
+
+    @property
+    def finished(self):
+        return self.status not in UNFINISHED
+
+    def prediction(self):
+        """The finished job's PredictionResult"""
+        return parse_prediction(json.dumps(self.result["prediction"]))
+
+
+def triage_result(triage, current_cases, population=None):
+    """PredictionResult for a request the triage model answered on its own
+
+    The outbreak probabilities come from the local SEIR ensemble; there is no
+    spread analysis, hotspots or recommendations.
+    """
+    forecast = simulate_outbreak(current_cases, population=population or 10_000_000)
+    return PredictionResult(
+        risk_score=triage.risk_score,
+        risk_level=triage.risk_level or "Low",
+        probability_30d=forecast.probabilities[30],
+        probability_60d=forecast.probabilities[60],
+        probability_90d=forecast.probabilities[90],
+        spread_pattern="",
+        narrative=f"## Quick Risk Assessment\n\n{triage.summary}",
+        recommendations={"immediate": [], "short_term": [], "long_term": []}
+    )
+
+
+class JobStore:
+    """SQLite table of jobs, shared by the workers and every session
+
+    Unfinished jobs record their owner (the JobRunner running them) and a
+    heartbeat the owner refreshes while it is alive; several processes can
+    share the table, each only running its own jobs.
+    """
+
+    COLUMNS = "id, status, params, progress, result, error, error_type, created_at, updated_at"
+
+    def __init__(self, path, retention=7 * 86400):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '',
+                result TEXT,
+                error TEXT,
+                error_type TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT,
+                heartbeat REAL
+            )
+        """)
+        # Tables created before jobs had owners
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, params)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at)")
+        self._conn.commit()
+
+    def create(self, params, owner=None):
+        """Insert a queued job run by owner and return its ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at, updated_at, owner, heartbeat) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params, sort_keys=True), now, now, owner, now)
+            )
+            self._conn.execute("DELETE FROM jobs WHERE created_at < ?", (now - self.retention,))
+            self._conn.commit()
+        return job_id
+
+    def find_unfinished(self, params, alive_since=0):
+        """ID of a queued or running job with exactly these params, or None
+
+        Jobs whose heartbeat is older than alive_since (their owner is gone)
+        are not returned.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND params = ? "
+                "AND COALESCE(heartbeat, updated_at) >= ? ORDER BY created_at LIMIT 1",
+                (*UNFINISHED, json.dumps(params, sort_keys=True), alive_since)
+            ).fetchone()
+        return row[0] if row else None
+
+    def update(self, job_id, status=None, progress=None, result=None, error=None):
+        """Set the given fields; error is an exception"""
+        fields = {"updated_at": time.time()}
+        if status is not None:
+            fields["status"] = status
+        if progress is not None:
+            fields["progress"] = progress
+        if result is not None:
+            fields["result"] = json.dumps(result)
+        if error is not None:
+            fields["error"] = str(error)
+            fields["error_type"] = type(error).__name__
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id):
+        """Job by ID, or None"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self.COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def heartbeat(self, owner):
+        """Mark owner's unfinished jobs as still being worked on"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+                (time.time(), owner, *UNFINISHED)
+            )
+            self._conn.commit()
+
+    def fail_stale(self, reason, alive_since):
+        """Mark queued or running jobs whose heartbeat is older than alive_since as failed
+
+        Their owner stopped (or hung) without finishing them. Jobs from
+        before owners were recorded count from their last update.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, error_type = 'Interrupted', updated_at = ? "
+                "WHERE status IN (?, ?) AND COALESCE(heartbeat, updated_at) < ?",
+                (FAILED, reason, time.time(), *UNFINISHED, alive_since)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def counts(self):
+        """{status: number of jobs}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def _job(row):
+        job_id, status, params, progress, result, error, error_type, created_at, updated_at = row
+        return Job(
+            job_id, status, json.loads(params), progress,
+            json.loads(result) if result else None, error, error_type, created_at, updated_at
+        )
+
+
+class JobRunner:
+    """Runs prediction jobs on a fixed number of workers shared by all sessions
+
+    A job keeps running when the session that submitted it reruns or
+    disconnects; its state, streamed progress and result are in the JobStore,
+    so any session can poll it by ID. Identical unfinished jobs are joined
+    rather than run twice. Finished predictions are also recorded in the
+    HistoryStore, if one is given.
+
+    Several processes may share the store. Each runner refreshes the
+    heartbeat of its own unfinished jobs on a background thread and fails
+    jobs nobody has refreshed for stale_after seconds, i.e. those of a
+    process that stopped; jobs other live processes are running are left
+    alone.
+    """
+
+    def __init__(self, ai, store, max_workers=2, progress_interval=0.5, history=None, stale_after=60):
+        self.ai = ai
+        self.store = store
+        self.history = history
+        self.progress_interval = progress_interval
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="echolens-job")
+        self._submit_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.fail_stale()
+        self._heartbeat = threading.Thread(target=self._beat, name="echolens-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    @classmethod
+    def from_env(cls, ai, history=None):
+        """Build from ECHOLENS_JOB_WORKERS / ECHOLENS_JOBS_PATH (empty path keeps jobs in memory)"""
+        return cls(
+            ai,
+            JobStore(os.getenv('ECHOLENS_JOBS_PATH', '.cache/echolens_jobs.sqlite3') or ":memory:"),
+            max_workers=int(os.getenv('ECHOLENS_JOB_WORKERS', '2')),
+            history=history,
+            stale_after=float(os.getenv('ECHOLENS_JOB_STALE_AFTER', '60'))
+        )
+
+    def submit_prediction(self, region, current_cases, forecast_days=90, population=None, full=False, trend=None,
+                          pathogen=None):
+        """Queue a structured prediction plus historical comparison; returns the job ID
+
+        The request is triaged first (EchoLensAI.route) and low-risk regions get
+        a quick assessment only, unless full=True. population is stored with
+        the job for the SEIR probabilities and for displaying the result; trend
+        (case-series statistics) and pathogen (a pathogen or transmission hint)
+        go into the prompts and select the historical context.
+        """
+        params = {
+            "region": region,
+            "current_cases": current_cases,
+            "forecast_days": forecast_days,
+            "population": population,
+            "full": bool(full),
+            "trend": trend,
+            "pathogen": pathogen,
+        }
+        with self._submit_lock:
+            job_id = self.store.find_unfinished(params, alive_since=time.time() - self.stale_after)
+            if job_id is not None:
+                metrics.inc("jobs_total", status="joined")
+                return job_id
+            job_id = self.store.create(params, owner=self.owner)
+        metrics.inc("jobs_total", status="submitted")
+        self.executor.submit(self._run, job_id, params)
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def fail_stale(self):
+        """Fail unfinished jobs whose owner stopped refreshing them; returns how many"""
+        interrupted = self.store.fail_stale(
+            "Interrupted: the process running it stopped", time.time() - self.stale_after
+        )
+        if interrupted:
+            metrics.inc("jobs_total", interrupted, status="interrupted")
+        return interrupted
+
+    def close(self):
+        """Stop the heartbeat; unfinished jobs are failed by another runner once stale"""
+        self._stop.set()
+        self.executor.shutdown(wait=False)
+
+    def _beat(self):
+        # Several heartbeats per stale_after, so one slow write doesn't make jobs look abandoned
+        while not self._stop.wait(self.stale_after / 4):
+            try:
+                self.store.heartbeat(self.owner)
+                self.fail_stale()
+            except sqlite3.Error:
+                pass  # Database busy: the next beat tries again
+
+    def _run(self, job_id, params):
+        started = time.perf_counter()
+        self.store.update(job_id, status=RUNNING)
+        region, current_cases = params["region"], params["current_cases"]
+        try:
+            decision = self.ai.route(region, current_cases, force=params.get("full"))
+            if decision.escalate:
+                result, comparison = self._full_analysis(job_id, params)
+                model = self.ai.model
+            else:
+                result = triage_result(decision.triage, current_cases, params["population"])
+                comparison = ""
+                model = decision.triage.model
+            route = {
+                "escalated": decision.escalate,
+                "reason": decision.reason,
+                "triage_score": decision.triage.risk_score if decision.triage else None,
+                "threshold": self.ai.escalation_threshold,
+                "model": model,
+            }
+
+            history_id = None
+            if self.history is not None:
+                history_id = self.history.record(
+                    region, current_cases, params["forecast_days"], result, comparison,
+                    model=model,
+                    latency=time.perf_counter() - started,
+                    population=params["population"]
+                )
+            self.store.update(
+                job_id,
+                status=DONE,
+                progress=comparison,
+                result={
+                    "prediction": asdict(result),
+                    "comparison": comparison,
+                    "route": route,
+                    "history_id": history_id,
+                }
+            )
+            metrics.inc("jobs_total", status=DONE)
+        except Exception as e:
+            self.store.update(job_id, status=FAILED, error=e)
+            metrics.inc("jobs_total", status=FAILED)
+        finally:
+            metrics.observe("job_seconds", time.perf_counter() - started)
+
+    def _full_analysis(self, job_id, params):
+        """Structured prediction and streamed comparison on the large model"""
+        region, current_cases = params["region"], params["current_cases"]
+
+        # JSON mode can't stream, so the structured prediction runs alongside the comparison
+        prediction_future = self.ai.submit(
+            self.ai.predict_outbreak, region, current_cases, params["forecast_days"], structured=True,
+            trend=params.get("trend"), pathogen=params.get("pathogen")
+        )
+
+        comparison = ""
+        last_saved = time.monotonic()
+        description = self.ai.describe(region, current_cases, params.get("pathogen"), params.get("trend"))
+        for chunk in self.ai.stream_comparison(description):
+            comparison += chunk
+            if time.monotonic() - last_saved >= self.progress_interval:
+                self.store.update(job_id, progress=comparison)
+                last_saved = time.monotonic()
+
+        return prediction_future.result(), comparison
+
+    def stats(self):
+        """Job counts by status"""
+        return self.store.counts()
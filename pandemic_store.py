@@ -0,0 +1,177 @@
+"""
+EchoLens - Historical Pandemic Store
+Loads data/pandemics.json once per process into column arrays with lookup indexes
+"""
+
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+
+DEFAULT_PATH = os.path.join("data", "pandemics.json")
+
+TEXT_FIELDS = ("name", "period", "pathogen", "deaths", "mortality_rate_display", "transmission")
+
+# Ordered (label, pattern) rules; the first match wins
+PATHOGEN_FAMILIES = (
+    ("Coronavirus", re.compile(r"corona|sars-cov", re.I)),
+    ("Influenza", re.compile(r"influenza|h\dn\d", re.I)),
+    ("Virus", re.compile(r"virus", re.I)),
+    ("Bacteria", re.compile(r"bacteri|yersinia|vibrio|rickettsia|salmonella", re.I)),
+)
+
+TRANSMISSION_MODES = (
+    ("respiratory", re.compile(r"respiratory|airborne|droplet|inhal", re.I)),
+    ("vector", re.compile(r"flea|lice|louse|mosquito|tick|vector|\brats?\b", re.I)),
+    ("waterborne", re.compile(r"water|food|fecal|faecal", re.I)),
+    ("contact", re.compile(r"contact|fluid|sexual|needle|surface", re.I)),
+)
+
+# (label, first year of the era)
+ERAS = (
+    ("Ancient", None),
+    ("Medieval", 500),
+    ("Early Modern", 1500),
+    ("Modern", 1800),
+    ("Contemporary", 1946),
+)
+
+
+def pathogen_family(pathogen):
+    for label, pattern in PATHOGEN_FAMILIES:
+        if pattern.search(pathogen or ""):
+            return label
+    return "Unknown"
+
+
+def transmission_modes(transmission):
+    modes = [label for label, pattern in TRANSMISSION_MODES if pattern.search(transmission or "")]
+    return modes or ["unknown"]
+
+
+def start_year(period):
+    """First year mentioned in a period string, or None"""
+    # "Throughout history (Eradicated 1980)" names an end, not a start
+    if re.match(r"\s*throughout", period or "", re.I):
+        return None
+    match = re.search(r"\d{3,4}", period or "")
+    return int(match.group()) if match else None
+
+
+def era(year):
+    if year is None:
+        return "Unknown"
+    label = ERAS[0][0]
+    for name, first_year in ERAS[1:]:
+        if year >= first_year:
+            label = name
+    return label
+
+
+class PandemicStore:
+    """Immutable, indexed snapshot of the historical dataset
+
+    Text fields are kept as per-column lists and numeric fields as NumPy arrays;
+    record(i) rebuilds the original dict on demand.
+    """
+
+    def __init__(self, records, version=None):
+        self.version = version
+        self.size = len(records)
+
+        self.columns = {field: [r.get(field, "") for r in records] for field in TEXT_FIELDS}
+        self.lessons = [tuple(r.get("lessons", ())) for r in records]
+        self.mortality = np.array(
+            [float(r.get("mortality_rate_value", 0) or 0) for r in records], dtype=np.float64
+        )
+        years = [start_year(period) for period in self.columns["period"]]
+        self.start_year = np.array([year or 0 for year in years], dtype=np.int32)
+
+        self.families = [pathogen_family(p) for p in self.columns["pathogen"]]
+        self.eras = [era(year) for year in years]
+        self.modes = [transmission_modes(t) for t in self.columns["transmission"]]
+
+        self.by_name = {name.casefold(): i for i, name in enumerate(self.names)}
+        self.by_family = self._index(self.families)
+        self.by_era = self._index(self.eras)
+        self.by_transmission = {}
+        for i, modes in enumerate(self.modes):
+            for mode in modes:
+                self.by_transmission.setdefault(mode, []).append(i)
+
+    @staticmethod
+    def _index(labels):
+        index = {}
+        for i, label in enumerate(labels):
+            index.setdefault(label, []).append(i)
+        return index
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        return cls(records, version=os.stat(path).st_mtime_ns)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def names(self):
+        return self.columns["name"]
+
+    def record(self, i):
+        """Record i as a dict in the dataset's original shape"""
+        record = {field: column[i] for field, column in self.columns.items()}
+        record["mortality_rate_value"] = float(self.mortality[i])
+        record["lessons"] = list(self.lessons[i])
+        return record
+
+    def get(self, name):
+        """Record by (case-insensitive) name, or None"""
+        i = self.by_name.get(name.casefold())
+        return None if i is None else self.record(i)
+
+    def filter(self, family=None, era=None, transmission=None, query=None):
+        """Indices of records matching every given criterion, in dataset order"""
+        selected = None
+        for index, key in (
+            (self.by_family, family),
+            (self.by_era, era),
+            (self.by_transmission, transmission),
+        ):
+            if key is None:
+                continue
+            matches = set(index.get(key, ()))
+            selected = matches if selected is None else selected & matches
+
+        indices = range(self.size) if selected is None else sorted(selected)
+        if query:
+            needle = query.casefold()
+            indices = [i for i in indices if needle in self.names[i].casefold()]
+        return list(indices)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=DEFAULT_PATH):
+    """Process-wide store for path, reloaded only when the file's mtime changes
+
+    Raises FileNotFoundError if the dataset does not exist.
+    """
+    key = os.path.abspath(path)
+    mtime = os.stat(key).st_mtime_ns
+
+    store = _stores.get(key)
+    if store is not None and store.version == mtime:
+        return store
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None or store.version != mtime:
+            store = _stores[key] = PandemicStore.from_file(key)
+        return store
@@ -0,0 +1,173 @@
+"""
+EchoLens - Structured Prediction Output
+JSON schema for outbreak predictions and a validating parser for the response
+"""
+
+from dataclasses import dataclass, field
+
+try:
+    import orjson as _json
+
+    _loads = _json.loads
+except ImportError:  # orjson is optional; the stdlib parser is just slower
+    import json as _json
+
+    _loads = _json.loads
+
+
+RISK_LEVELS = ("Low", "Medium", "High", "Critical")
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+# Strict schema: every property required, no extras, so the parser can stay simple
+PREDICTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "risk_score": {"type": "integer", "minimum": 0, "maximum": 100},
+        "risk_level": {"type": "string", "enum": list(RISK_LEVELS)},
+        "probability_30d": {"type": "number", "minimum": 0, "maximum": 100},
+        "probability_60d": {"type": "number", "minimum": 0, "maximum": 100},
+        "probability_90d": {"type": "number", "minimum": 0, "maximum": 100},
+        "spread_pattern": {"type": "string"},
+        "risk_factors": _STRING_LIST,
+        "hotspots": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "location": {"type": "string"},
+                    "risk_score": {"type": "integer", "minimum": 0, "maximum": 100}
+                },
+                "required": ["location", "risk_score"],
+                "additionalProperties": False
+            }
+        },
+        "recommendations": {
+            "type": "object",
+            "properties": {
+                "immediate": _STRING_LIST,
+                "short_term": _STRING_LIST,
+                "long_term": _STRING_LIST
+            },
+            "required": ["immediate", "short_term", "long_term"],
+            "additionalProperties": False
+        },
+        "narrative": {"type": "string"}
+    },
+    "required": [
+        "risk_score", "risk_level", "probability_30d", "probability_60d",
+        "probability_90d", "spread_pattern", "risk_factors", "hotspots",
+        "recommendations", "narrative"
+    ],
+    "additionalProperties": False
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "outbreak_prediction",
+        "strict": True,
+        "schema": PREDICTION_SCHEMA
+    }
+}
+
+
+@dataclass
+class Hotspot:
+    location: str
+    risk_score: int
+
+
+@dataclass
+class PredictionResult:
+    """Typed outbreak prediction: dashboard numbers plus the markdown narrative"""
+
+    risk_score: int
+    risk_level: str
+    probability_30d: float
+    probability_60d: float
+    probability_90d: float
+    spread_pattern: str
+    narrative: str
+    risk_factors: list = field(default_factory=list)
+    hotspots: list = field(default_factory=list)
+    recommendations: dict = field(default_factory=dict)
+
+    @property
+    def probabilities(self):
+        """{days: probability %} for the 30/60/90-day horizons"""
+        return {
+            30: self.probability_30d,
+            60: self.probability_60d,
+            90: self.probability_90d
+        }
+
+
+def _number(data, name, integer=False):
+    value = data.get(name)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Prediction field '{name}' must be a number")
+    if integer and value != int(value):
+        raise ValueError(f"Prediction field '{name}' must be an integer")
+    if not 0 <= value <= 100:
+        raise ValueError(f"Prediction field '{name}' must be between 0 and 100")
+    return int(value) if integer else float(value)
+
+
+def _string(data, name):
+    value = data.get(name)
+    if not isinstance(value, str):
+        raise ValueError(f"Prediction field '{name}' must be a string")
+    return value
+
+
+def _strings(data, name):
+    value = data.get(name)
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"Prediction field '{name}' must be a list of strings")
+    return value
+
+
+def parse_prediction(text):
+    """Parse and validate a JSON prediction response into a PredictionResult
+
+    Raises ValueError if the response is not valid JSON or does not match
+    PREDICTION_SCHEMA.
+    """
+    try:
+        data = _loads(text)
+    except ValueError as e:
+        raise ValueError(f"Prediction response is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("Prediction response must be a JSON object")
+
+    risk_level = _string(data, "risk_level")
+    if risk_level not in RISK_LEVELS:
+        raise ValueError(f"Unknown risk level '{risk_level}'")
+
+    hotspots = data.get("hotspots")
+    if not isinstance(hotspots, list) or not all(isinstance(h, dict) for h in hotspots):
+        raise ValueError("Prediction field 'hotspots' must be a list of objects")
+
+    recommendations = data.get("recommendations")
+    if not isinstance(recommendations, dict):
+        raise ValueError("Prediction field 'recommendations' must be an object")
+
+    return PredictionResult(
+        risk_score=_number(data, "risk_score", integer=True),
+        risk_level=risk_level,
+        probability_30d=_number(data, "probability_30d"),
+        probability_60d=_number(data, "probability_60d"),
+        probability_90d=_number(data, "probability_90d"),
+        spread_pattern=_string(data, "spread_pattern"),
+        narrative=_string(data, "narrative"),
+        risk_factors=_strings(data, "risk_factors"),
+        hotspots=[
+            Hotspot(_string(h, "location"), _number(h, "risk_score", integer=True))
+            for h in hotspots
+        ],
+        recommendations={
+            name: _strings(recommendations, name)
+            for name in ("immediate", "short_term", "long_term")
+        }
+    )
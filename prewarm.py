@@ -0,0 +1,216 @@
+"""
+EchoLens - Cache Pre-warming
+Keeps the responses for popular regions and every forecast period cached
+
+Run once (e.g. from cron): python prewarm.py --once
+
+For each hot region the triage, historical comparison and one structured
+prediction per forecast period are fetched ahead of time, so the dashboard's
+first click is served from the cache. Hot regions come from
+ECHOLENS_PREWARM_REGIONS or, if that is empty, from the most-run regions in
+the prediction history.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+from case_series import CaseSeriesError, get_case_series
+from groq_client import EchoLensAI
+from history import HistoryStore
+from scheduler import CircuitOpenError, TokenBucket
+from telemetry import metrics
+
+
+log = logging.getLogger("echolens.prewarm")
+
+# The dashboard's forecast periods, most used (its default) first
+FORECAST_PERIODS = (90, 30, 60, 120, 180)
+
+# The dashboard's default active cases
+DEFAULT_CASES = 1500
+
+
+def parse_regions(text, default_cases=DEFAULT_CASES):
+    """[(region, cases)] from "Region:cases,Region,..." (cases optional)"""
+    regions = []
+    for item in text.split(","):
+        region, _, cases = item.partition(":")
+        if region.strip():
+            regions.append((region.strip(), int(cases) if cases.strip() else default_cases))
+    return regions
+
+
+class PrewarmBudget:
+    """A share of a Scheduler's requests and tokens per minute, for pre-warming calls
+
+    Pre-warming calls also go through the Scheduler, so with share=0.25 live
+    requests keep at least three quarters of ECHOLENS_RPM and ECHOLENS_TPM.
+    """
+
+    def __init__(self, scheduler, share=0.25):
+        self.requests = TokenBucket(share * scheduler.requests.rate * 60, capacity=1)
+        self.tokens = TokenBucket(share * scheduler.tokens.rate * 60)
+
+    def acquire(self, tokens):
+        """Block until one more request of about `tokens` tokens fits the share"""
+        self.requests.acquire()
+        self.tokens.acquire(tokens)
+        # A request larger than the bucket only waited for a full one: owe the rest
+        if tokens > self.tokens.capacity:
+            self.tokens.adjust(self.tokens.capacity - tokens)
+
+
+class Prewarmer:
+    """Fills the response cache for hot region x forecast period combinations
+
+    Runs at start() and then every `interval` seconds on a background thread.
+    Responses still cached for longer than the interval are skipped, the rest
+    are fetched again within `share` of the Scheduler's requests and tokens
+    per minute (see PrewarmBudget), so a run that needs more than that takes
+    longer rather than slowing live requests down. Regions are warmed most
+    popular first, and a run stops early if the circuit breaker opens.
+    """
+
+    def __init__(self, ai, regions=(), periods=FORECAST_PERIODS, history=None, top=10, window=7 * 86400,
+                 interval=3000, share=0.25):
+        self.ai = ai
+        self.regions = list(regions)
+        self.periods = tuple(periods)
+        self.history = history
+        self.top = top
+        self.window = window
+        self.interval = interval
+        self.budget = PrewarmBudget(ai.scheduler, share)
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, ai, history=None):
+        """Build from the ECHOLENS_PREWARM_* environment variables"""
+        periods = os.getenv('ECHOLENS_PREWARM_PERIODS', ','.join(map(str, FORECAST_PERIODS)))
+        return cls(
+            ai,
+            regions=parse_regions(
+                os.getenv('ECHOLENS_PREWARM_REGIONS', ''),
+                int(os.getenv('ECHOLENS_PREWARM_CASES', str(DEFAULT_CASES)))
+            ),
+            periods=[int(days) for days in periods.split(",") if days.strip()],
+            history=history,
+            top=int(os.getenv('ECHOLENS_PREWARM_TOP', '10')),
+            window=float(os.getenv('ECHOLENS_PREWARM_WINDOW_DAYS', '7')) * 86400,
+            interval=float(os.getenv('ECHOLENS_PREWARM_INTERVAL', '3000')),
+            share=float(os.getenv('ECHOLENS_PREWARM_SHARE', '0.25'))
+        )
+
+    def targets(self):
+        """[(canonical region, cases)] to warm, most popular first"""
+        resolve = self.ai.canonicalizer.gazetteer.resolve
+        regions = self.regions
+        if not regions and self.history is not None and self.top:
+            regions = [
+                (entry["region"], entry["current_cases"])
+                for entry in self.history.popular(
+                    self.top, since=time.time() - self.window, canonical=lambda region: resolve(region)[0]
+                )
+            ]
+        targets, seen = [], set()
+        for region, cases in regions:
+            name, _ = resolve(region)
+            if name not in seen:
+                seen.add(name)
+                targets.append((name, cases))
+        return targets
+
+    def requests(self, region, cases, trend):
+        """(operation, model, request builder) for everything the dashboard asks about a region"""
+        ai = self.ai
+        yield "quick_risk", ai.triage_model, lambda: ai.quick_risk_request(region, cases, ai.triage_model)
+        yield "compare", None, lambda: ai.comparison_request(ai.describe(region, cases, trend=trend))
+        for days in self.periods:
+            yield "predict", None, lambda days=days: ai.prediction_request(
+                region, cases, days, structured=True, trend=trend
+            )
+
+    def run_once(self):
+        """Warm every target once; returns {"fetched", "fresh", "failed"} counts"""
+        counts = {"fetched": 0, "fresh": 0, "failed": 0}
+        started = time.perf_counter()
+        series = self._case_series()
+        try:
+            for region, cases in self.targets():
+                summary = series.summary(region) if series is not None else None
+                trend = summary.describe() if summary else None
+                for operation, model, build in self.requests(region, cases, trend):
+                    if self._stop.is_set():
+                        return counts
+                    try:
+                        fetched = self.ai.warm(
+                            build(), operation, model=model, min_ttl=self.interval, budget=self.budget
+                        )
+                    except CircuitOpenError:
+                        log.warning("Groq API is unavailable, stopping this pre-warming run")
+                        counts["failed"] += 1
+                        return counts
+                    except Exception as e:
+                        log.warning("Pre-warming %s for %r failed: %s", operation, region, e)
+                        result = "failed"
+                    else:
+                        result = "fetched" if fetched else "fresh"
+                    counts[result] += 1
+                    metrics.inc("cache_prewarm_total", operation=operation, result=result)
+            return counts
+        finally:
+            self.last_run = {"finished_at": time.time(), **counts}
+            metrics.observe("cache_prewarm_run_seconds", time.perf_counter() - started)
+
+    def _case_series(self):
+        try:
+            return get_case_series()
+        except (CaseSeriesError, OSError) as e:
+            log.warning("Case series unavailable for pre-warming: %s", e)
+            return None
+
+    def start(self):
+        """Run now and then every interval on a background thread (not at all if interval is 0)"""
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="echolens-prewarm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                counts = self.run_once()
+                log.info("Pre-warmed cache: %s", counts)
+            except Exception:
+                log.exception("Pre-warming run failed")
+            self._stop.wait(self.interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the response cache for hot regions and forecast periods")
+    parser.add_argument("--once", action="store_true", help="Run once and exit instead of every interval")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    prewarmer = Prewarmer.from_env(EchoLensAI(), HistoryStore.from_env())
+    if args.once:
+        print(prewarmer.run_once())
+        return 0
+    try:
+        prewarmer._loop()
+    except KeyboardInterrupt:
+        prewarmer.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
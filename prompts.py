@@ -0,0 +1,228 @@
+"""
+EchoLens - Prompt Builder
+Cache-friendly prompt layout with local token counting and per-request budgets
+"""
+
+import os
+import re
+from dataclasses import dataclass
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken is optional (and needs its encoding file); estimate instead
+    _encoding = None
+
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Chat framing tokens added per message and per request
+MESSAGE_OVERHEAD = 4
+REQUEST_OVERHEAD = 3
+
+
+def count_tokens(text):
+    """Tokens in text: exact with tiktoken (o200k_base), otherwise a close estimate"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # Words cost about one token per 4 characters, punctuation one token each
+    return sum(-(-len(piece) // 4) for piece in _PIECES.findall(text))
+
+
+def count_message_tokens(messages):
+    """Prompt tokens for a list of chat messages, framing included"""
+    return REQUEST_OVERHEAD + sum(MESSAGE_OVERHEAD + count_tokens(m["content"]) for m in messages)
+
+
+class PromptBudgetError(ValueError):
+    """The prompt cannot fit the per-request token budget"""
+
+
+@dataclass(frozen=True)
+class Section:
+    """One requested part of the answer and the completion tokens it may use"""
+    key: str
+    instruction: str
+    tokens: int
+
+
+PREDICTION_SECTIONS = (
+    Section("risk_score", "**Outbreak Risk Score** (0-100): Overall pandemic risk", 60),
+    Section("probabilities", "**30/60/90 Day Probability** (%): Likelihood of major outbreak", 120),
+    Section("spread_pattern", "**Spread Pattern**: Expected transmission rate and growth", 200),
+    Section("risk_factors", "**Top 5 Risk Factors**: Why this region is vulnerable", 250),
+    Section("hotspots", "**Top 3 Hotspot Cities**: Specific locations at highest risk", 150),
+    Section(
+        "recommendations",
+        "**Recommendations**: \n   - Immediate actions (0-7 days)\n"
+        "   - Short-term (1-4 weeks)\n   - Long-term (1-3 months)",
+        350
+    ),
+)
+
+COMPARISON_SECTIONS = (
+    Section("resemblance", "Which historical pandemic does this most resemble and why?", 250),
+    Section("lessons", "What lessons from that pandemic apply here?", 250),
+    Section("outcome", "What's the likely outcome based on historical patterns?", 200),
+)
+
+QUICK_RISK_SECTIONS = (
+    Section("risk_score", "Risk Score (0-100)", 10),
+    Section("risk_level", "Risk Level (Low/Medium/High/Critical)", 10),
+    Section("summary", "One sentence summary", 60),
+)
+
+PREDICTION_INSTRUCTIONS = """You are EchoLens, an expert epidemiologist AI specialized in pandemic prediction, trained on historical pandemic data.
+
+Using the historical knowledge and current situation given by the user, PREDICT:
+{sections}
+
+Format your response clearly with headers and bullet points.
+Be specific with numbers and probabilities.
+Base predictions on historical epidemic patterns."""
+
+STRUCTURED_INSTRUCTIONS = """
+
+Respond with a single JSON object matching the provided schema. Probabilities are
+percentages (0-100). Put the full human-readable analysis, formatted in markdown
+with headers and bullet points, in the "narrative" field."""
+
+COMPARISON_INSTRUCTIONS = """You are a pandemic historian and epidemiologist.
+
+Compare the user's current outbreak to the historical pandemics they list and answer:
+{sections}"""
+
+QUICK_RISK_INSTRUCTIONS = """You give quick pandemic risk assessments.
+
+Provide ONLY:
+{sections}
+
+Be concise."""
+
+# The JSON fields repeat the narrative's key numbers
+STRUCTURED_TOKENS = 400
+
+# Completion tokens reserved for reasoning, by model name prefix. Reasoning
+# models (gpt-oss) think before answering and that counts against max_tokens;
+# with too little room the answer is cut off. Other models get none.
+REASONING_TOKENS = (
+    ("openai/gpt-oss", 1024),
+)
+
+
+@dataclass
+class Prompt:
+    messages: list
+    max_tokens: int
+    prompt_tokens: int
+    context_dropped: int = 0
+
+
+class PromptBuilder:
+    """Lays prompts out as a static prefix followed by the variable part
+
+    The system message holds only fixed instructions and the user message
+    starts with the retrieved historical context, so requests share as long a
+    prefix as possible for provider-side prompt caching. max_tokens is the sum
+    of the requested sections' allowances plus room for the model's
+    reasoning, and prompt + max_tokens must fit the budget: the least relevant
+    context lines are dropped first, then PromptBudgetError is raised.
+
+    The reasoning room depends on the model (REASONING_TOKENS) unless
+    reasoning_tokens fixes it for every model.
+    """
+
+    def __init__(self, budget=4000, reasoning_tokens=None):
+        self.budget = budget
+        self.reasoning_tokens = reasoning_tokens
+
+    @classmethod
+    def from_env(cls):
+        """Build from ECHOLENS_TOKEN_BUDGET / ECHOLENS_REASONING_TOKENS"""
+        reasoning_tokens = os.getenv('ECHOLENS_REASONING_TOKENS', '')
+        return cls(
+            budget=int(os.getenv('ECHOLENS_TOKEN_BUDGET', '4000')),
+            reasoning_tokens=int(reasoning_tokens) if reasoning_tokens else None
+        )
+
+    def reasoning_for(self, model):
+        """Completion tokens reserved for model's reasoning"""
+        if self.reasoning_tokens is not None:
+            return self.reasoning_tokens
+        for prefix, tokens in REASONING_TOKENS:
+            if (model or "").startswith(prefix):
+                return tokens
+        return 0
+
+    def prediction(self, region, current_cases, forecast_days, context, structured=False, sections=None,
+                   trend=None, pathogen=None, model=None):
+        """Outbreak prediction; sections is an optional subset of PREDICTION_SECTIONS keys
+
+        trend is an optional line of case-series statistics (growth, Rt, ...),
+        pathogen an optional pathogen or transmission hint.
+        """
+        chosen = self._select(PREDICTION_SECTIONS, sections)
+        instructions = PREDICTION_INSTRUCTIONS.format(sections=self._numbered(chosen))
+        if structured:
+            instructions += STRUCTURED_INSTRUCTIONS
+        situation = f"""CURRENT SITUATION:
+- Region: {region}
+- Active Cases: {current_cases:,}
+- Forecast Period: {forecast_days} days"""
+        if pathogen:
+            situation += f"\n- Pathogen / Transmission: {pathogen}"
+        if trend:
+            situation += f"\n- Case Trend: {trend}"
+        return self.build(
+            instructions, "HISTORICAL KNOWLEDGE:", context, situation, chosen,
+            extra_tokens=STRUCTURED_TOKENS if structured else 0, model=model
+        )
+
+    def comparison(self, current_outbreak, context, model=None):
+        """Historical comparison of an outbreak description"""
+        instructions = COMPARISON_INSTRUCTIONS.format(sections="\n".join(s.instruction for s in COMPARISON_SECTIONS))
+        return self.build(
+            instructions, "COMPARE TO:", context, f"CURRENT OUTBREAK:\n{current_outbreak}", COMPARISON_SECTIONS,
+            model=model
+        )
+
+    def quick_risk(self, region, cases, model=None):
+        """Short risk score, level and summary; uses no historical context"""
+        instructions = QUICK_RISK_INSTRUCTIONS.format(sections=self._numbered(QUICK_RISK_SECTIONS))
+        return self.build(
+            instructions, None, "", f"Region: {region}\nActive cases: {cases:,}", QUICK_RISK_SECTIONS, model=model
+        )
+
+    def build(self, instructions, context_heading, context, situation, sections, extra_tokens=0, model=None):
+        """Assemble the messages and fit them to the budget; model sets the reasoning room"""
+        max_tokens = sum(s.tokens for s in sections) + extra_tokens + self.reasoning_for(model)
+        lines = [line for line in (context or "").splitlines() if line.strip()]
+
+        # Context lines arrive best first, so trimming drops the least relevant
+        for keep in range(len(lines), -1, -1):
+            parts = [f"{context_heading}\n" + "\n".join(lines[:keep])] if keep and context_heading else []
+            messages = [
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": "\n\n".join(parts + [situation])}
+            ]
+            prompt_tokens = count_message_tokens(messages)
+            if prompt_tokens + max_tokens <= self.budget:
+                return Prompt(messages, max_tokens, prompt_tokens, context_dropped=len(lines) - keep)
+
+        raise PromptBudgetError(
+            f"Prompt needs {prompt_tokens} + {max_tokens} tokens, over the budget of {self.budget}"
+        )
+
+    @staticmethod
+    def _select(available, keys):
+        if keys is None:
+            return available
+        unknown = set(keys) - {s.key for s in available}
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+        return tuple(s for s in available if s.key in keys)
+
+    @staticmethod
+    def _numbered(sections):
+        return "\n".join(f"{n}. {s.instruction}" for n, s in enumerate(sections, 1))
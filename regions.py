@@ -0,0 +1,175 @@
+"""
+EchoLens - Query Canonicalization
+Region gazetteer with alias/fuzzy matching and log-scale case-count buckets
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+
+
+DEFAULT_GAZETTEER = os.path.join("data", "regions.json")
+
+
+def normalize(text):
+    """Lowercase ASCII words: drops accents and punctuation, hyphens become spaces"""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    text = text.casefold().replace(".", "").replace("'", "")
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def edit_distance(a, b, limit):
+    """Edits (insertions, deletions, substitutions, adjacent transpositions) from a to b
+
+    Any distance over limit is returned as limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1])
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return min(current[-1], limit + 1)
+
+
+class Gazetteer:
+    """Canonical region names by normalized name or alias, with a misspelling fallback
+
+    Only near-misspellings are matched fuzzily: the same first letter, and
+    one edit per three letters beyond the third (none under 6 letters, at
+    most max_edits). Real places missing from the gazetteer are often a
+    letter or two from one that is in it (Lagos/Laos, Siberia/Liberia,
+    Indiana/India), so anything further off, or equally close to two
+    entries, resolves to itself.
+    """
+
+    def __init__(self, entries, max_edits=2):
+        self.max_edits = max_edits
+        self.names = {}
+        for entry in entries:
+            for alias in (entry["name"], *entry.get("aliases", ())):
+                self.names.setdefault(normalize(alias), entry["name"])
+        self._by_initial = {}
+        for key in self.names:
+            self._by_initial.setdefault(key[:1], []).append(key)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_GAZETTEER, max_edits=2):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), max_edits)
+
+    def resolve(self, region, fuzzy=True):
+        """(canonical name, how it matched): exact, fuzzy or unknown
+
+        Unknown regions are returned as their cleaned-up text, so spelling
+        variants that only differ in case, spacing or punctuation still agree.
+        fuzzy=False matches names and aliases only.
+        """
+        key = normalize(region)
+        if key in self.names:
+            return self.names[key], "exact"
+        limit = min(self.max_edits, (len(key) - 3) // 3)
+        if fuzzy and limit > 0:
+            distances = {}
+            for candidate in self._by_initial.get(key[:1], ()):
+                distance = edit_distance(key, candidate, limit)
+                if distance <= limit:
+                    distances.setdefault(distance, set()).add(self.names[candidate])
+            if distances:
+                names = distances[min(distances)]
+                if len(names) == 1:
+                    return next(iter(names)), "fuzzy"
+        return " ".join(word.capitalize() for word in key.split()) or (region or "").strip(), "unknown"
+
+
+def case_bucket(cases, per_decade):
+    """Log-scale bucket index of a case count (per_decade buckets per power of 10)"""
+    return round(math.log10(cases) * per_decade) if cases > 0 else None
+
+
+def bucket_value(bucket, per_decade):
+    """Representative case count of a bucket, rounded to 2 significant digits"""
+    if bucket is None:
+        return 0
+    value = 10 ** (bucket / per_decade)
+    digits = max(0, int(math.floor(math.log10(value))) - 1)
+    return int(round(value, -digits))
+
+
+@dataclass(frozen=True)
+class CanonicalQuery:
+    region: str
+    current_cases: int
+    match: str          # exact / fuzzy / unknown
+    nearby: bool        # cases moved to a previously answered neighbouring bucket
+
+
+class Canonicalizer:
+    """Maps equivalent requests to one canonical (region, case count)
+
+    Regions resolve through the Gazetteer; case counts snap to log-scale
+    buckets (per_decade per power of 10, 0 disables bucketing). When a query's
+    own bucket has not been asked before but one within `tolerance` buckets
+    has, for the same region and kind of request, that answered bucket is
+    reused, so its cached response can be served.
+    """
+
+    def __init__(self, gazetteer, per_decade=20, tolerance=1, max_remembered=10_000):
+        self.gazetteer = gazetteer
+        self.per_decade = per_decade
+        self.tolerance = tolerance
+        self.max_remembered = max_remembered
+        self._answered = {}  # (kind, region, *extra) -> set of buckets
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, path=DEFAULT_GAZETTEER):
+        """Build from ECHOLENS_REGION_MAX_EDITS / ECHOLENS_CASE_BUCKETS / ECHOLENS_CASE_TOLERANCE
+
+        Without the gazetteer file, regions are only cleaned up, not matched.
+        """
+        max_edits = int(os.getenv('ECHOLENS_REGION_MAX_EDITS', '2'))
+        try:
+            gazetteer = Gazetteer.from_file(path, max_edits)
+        except FileNotFoundError:
+            gazetteer = Gazetteer([], max_edits)
+        return cls(
+            gazetteer,
+            per_decade=int(os.getenv('ECHOLENS_CASE_BUCKETS', '20')),
+            tolerance=int(os.getenv('ECHOLENS_CASE_TOLERANCE', '1'))
+        )
+
+    def canonical(self, region, current_cases, kind="predict", *extra):
+        """CanonicalQuery for a request; extra (e.g. forecast days) must also match for reuse"""
+        name, match = self.gazetteer.resolve(region)
+        if not self.per_decade:
+            return CanonicalQuery(name, int(current_cases), match, False)
+
+        bucket = case_bucket(current_cases, self.per_decade)
+        nearby = False
+        key = (kind, name, *extra)
+        with self._lock:
+            answered = self._answered.setdefault(key, set())
+            if bucket is not None and bucket not in answered:
+                near = [b for b in answered if abs(b - bucket) <= self.tolerance]
+                if near:
+                    bucket = min(near, key=lambda b: (abs(b - bucket), b))
+                    nearby = True
+            if bucket is not None:
+                answered.add(bucket)
+            if len(self._answered) > self.max_remembered:
+                self._answered.pop(next(iter(self._answered)))
+        return CanonicalQuery(name, bucket_value(bucket, self.per_decade), match, nearby)
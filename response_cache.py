@@ -0,0 +1,167 @@
+"""
+EchoLens - Response Cache
+LRU + TTL cache for Groq responses, shared between processes and replicas through a backend
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from cache_backends import CacheBackendError, MemoryBackend, SQLiteBackend, backend_from_url
+from telemetry import metrics
+
+
+log = logging.getLogger("echolens.cache")
+
+# Returned by ResponseCache._shared when there is no shared backend or it is failing
+_UNAVAILABLE = object()
+
+
+def make_cache_key(model, messages, **params):
+    """Stable key for a chat request: model, prompt and sampling params"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Bounded in-process LRU with per-entry TTL, in front of an optional shared backend
+
+    The shared backend (SQLite for the processes on one host, Redis across
+    replicas; see cache_backends) lets every process reuse a response any of
+    them fetched. claim() is the stampede lock: for a missing key only one
+    process fetches it and the others wait for its result. A failing shared
+    backend is counted and treated as a miss, never as an error, and is
+    skipped for retry_after seconds before being tried again.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, path=None, backend=None, lock_ttl=120, poll_interval=0.2,
+                 retry_after=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+        self.local = MemoryBackend(max_entries)
+        if backend is None and path:
+            backend = SQLiteBackend(path, max_entries * 4)
+        self.shared = backend
+
+        self._lock = threading.Lock()
+        self._unavailable_until = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from ECHOLENS_CACHE_* environment variables
+
+        ECHOLENS_CACHE_URL selects the shared backend (memory:// for none,
+        sqlite:///path or redis://host:port/db); without it the SQLite file at
+        ECHOLENS_CACHE_PATH is used.
+        """
+        max_entries = int(os.getenv('ECHOLENS_CACHE_SIZE', '256'))
+        url = os.getenv('ECHOLENS_CACHE_URL', '')
+        backend = backend_from_url(url, max_entries * 4) if url and not url.startswith("memory:") else None
+        return cls(
+            max_entries=max_entries,
+            ttl=float(os.getenv('ECHOLENS_CACHE_TTL', '3600')),
+            path=None if url else os.getenv('ECHOLENS_CACHE_PATH', '.cache/echolens_responses.sqlite3') or None,
+            backend=backend,
+            lock_ttl=float(os.getenv('ECHOLENS_CACHE_LOCK_TTL', '120'))
+        )
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        entry = self.local.get(key)
+        if entry is None:
+            entry = self._shared("get", key)
+            if entry is _UNAVAILABLE:
+                entry = None
+            elif entry is not None:
+                self.local.set(key, *entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+
+    def expires_at(self, key):
+        """When key's cached value expires, or None if it isn't cached; not counted as a lookup"""
+        entries = (self.local.get(key), self._shared("get", key))
+        return max((entry[1] for entry in entries if entry not in (None, _UNAVAILABLE)), default=None)
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        self.local.set(key, value, expires_at)
+        self._shared("set", key, value, expires_at)
+
+    def claim(self, key):
+        """(cached value, lock token) before fetching key upstream
+
+        Returns the value if another process cached it meanwhile; otherwise
+        takes the shared lock for key, or waits up to lock_ttl for the process
+        holding it. The token is None when the shared backend is unavailable or
+        the wait timed out; pass it to release() once the fetched value is set.
+        """
+        deadline = time.monotonic() + self.lock_ttl
+        waited = False
+        while True:
+            token = self._shared("acquire", f"fetch:{key}", self.lock_ttl)
+            entry = _UNAVAILABLE if token is _UNAVAILABLE else self._shared("get", key)
+            if entry is _UNAVAILABLE:
+                return None, None
+            if entry is not None:
+                self.release(key, token)
+                self.local.set(key, *entry)
+                metrics.inc("cache_stampede_total", result="waited" if waited else "filled")
+                return entry[0], None
+            if token is not None:
+                metrics.inc("cache_stampede_total", result="leader")
+                return None, token
+            if time.monotonic() >= deadline:
+                metrics.inc("cache_stampede_total", result="timeout")
+                return None, None
+            waited = True
+            time.sleep(self.poll_interval)
+
+    def release(self, key, token):
+        if token is not None:
+            self._shared("release", f"fetch:{key}", token)
+
+    def _shared(self, operation, *args):
+        """Call the shared backend; _UNAVAILABLE if there is none or it is failing"""
+        if self.shared is None or time.monotonic() < self._unavailable_until:
+            return _UNAVAILABLE
+        try:
+            return getattr(self.shared, operation)(*args)
+        except (CacheBackendError, OSError, sqlite3.Error) as e:
+            self._unavailable_until = time.monotonic() + self.retry_after
+            metrics.inc("cache_backend_errors_total", backend=type(self.shared).__name__, operation=operation)
+            log.warning("Shared cache %s failed, skipping it for %ss: %s", operation, self.retry_after, e)
+            return _UNAVAILABLE
+
+    def clear(self):
+        self.local.clear()
+        self._shared("clear")
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.local.evictions,
+                "size": len(self.local),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "backend": type(self.shared).__name__ if self.shared is not None else None,
+            }
@@ -0,0 +1,188 @@
+"""
+EchoLens - Historical Context Retrieval
+Hashed n-gram TF-IDF index over the pandemic dataset with cosine top-k search
+"""
+
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from pandemic_store import DEFAULT_PATH, get_store
+
+
+N_FEATURES = 2 ** 14
+
+# Letters only: case counts and years would otherwise match by accident
+WORD = re.compile(r"[a-z]{2,}")
+
+STOPWORDS = frozenset(
+    "a an and as at by for from in into of on or the to with "
+    "region cases active current outbreak".split()
+)
+
+
+def features(text):
+    """Hashed word unigrams, 6-letter stems and bigrams of text"""
+    words = [w for w in WORD.findall((text or "").casefold()) if w not in STOPWORDS]
+    grams = list(words)
+    # Stems let e.g. "respiration" match "respiratory"
+    grams += [f"{w[:6]}~" for w in words if len(w) > 6]
+    grams += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    # crc32 rather than hash(): stable across processes and restarts
+    return [zlib.crc32(gram.encode("utf-8")) % N_FEATURES for gram in grams]
+
+
+# Case-trend statistics as written by case_series.SeriesSummary.describe()
+_DOUBLING = re.compile(r"doubling every (\d+(?:\.\d+)?) days")
+_RT = re.compile(r"\bRt (\d+(?:\.\d+)?)")
+
+
+def spread_profile(text):
+    """Transmission words matching how fast the outbreak described in text grows
+
+    The dataset has no geography, so a region alone matches nothing; the
+    growth rate is a signal it does index. Fast doubling (a week or less, or
+    Rt of 1.5 and up) is typical of respiratory spread, slow sustained growth
+    of contact transmission. Empty if text has no usable trend.
+    """
+    doubling = _DOUBLING.search(text or "")
+    rt = _RT.search(text or "")
+    doubling = float(doubling.group(1)) if doubling else None
+    rt = float(rt.group(1)) if rt else None
+    if (doubling is not None and doubling <= 7) or (rt is not None and rt >= 1.5):
+        return "respiratory droplets airborne"
+    if (doubling is not None and doubling >= 30) or (rt is not None and 1 < rt < 1.2):
+        return "contact"
+    return ""
+
+
+def document(store, i):
+    """Searchable text for record i: descriptive fields plus derived labels"""
+    columns = store.columns
+    return " ".join((
+        columns["name"][i],
+        columns["pathogen"][i],
+        columns["transmission"][i],
+        columns["mortality_rate_display"][i],
+        store.families[i],
+        store.eras[i],
+        " ".join(store.modes[i]),
+        " ".join(store.lessons[i]),
+    ))
+
+
+def brief(text):
+    """text without parenthetical asides, to keep prompt summaries short"""
+    return re.sub(r"\s*\([^)]*\)", "", text or "").strip()
+
+
+def summary(store, i):
+    """One-line prompt summary of record i"""
+    columns = store.columns
+    return (
+        f"- {columns['name'][i]} ({brief(columns['period'][i])}): {brief(columns['pathogen'][i])}; "
+        f"{brief(columns['transmission'][i])}; {brief(columns['deaths'][i])} deaths, "
+        f"mortality {brief(columns['mortality_rate_display'][i]) or 'unknown'}"
+    )
+
+
+class RetrievalIndex:
+    """TF-IDF vectors of a PandemicStore's records, searched by cosine similarity
+
+    The L2-normalized vectors are kept as a sparse matrix in compressed-column
+    form (indptr/rows/data arrays), so a query only touches the postings of
+    its own features.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.version = store.version
+
+        rows, columns, counts = [], [], []
+        for i in range(len(store)):
+            features_i, counts_i = np.unique(features(document(store, i)), return_counts=True)
+            rows.append(np.full(len(features_i), i, dtype=np.int32))
+            columns.append(features_i)
+            counts.append(counts_i)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
+        counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+
+        document_frequency = np.bincount(columns, minlength=N_FEATURES)
+        self.idf = (np.log((1 + len(store)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        # Sublinear term frequency keeps repeated trigrams from dominating
+        data = np.log1p(counts).astype(np.float32) * self.idf[columns]
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(store)))
+        data /= np.maximum(norms[rows], 1e-12).astype(np.float32)
+
+        order = np.argsort(columns, kind="stable")
+        self.rows = rows[order]
+        self.data = data[order]
+        self.indptr = np.concatenate(([0], np.cumsum(document_frequency)))
+
+        # Tie-breaker between equally relevant records: more recent outbreaks first
+        years = store.start_year.astype(np.float64)
+        self._recency = 1e-6 * years / max(float(years.max(initial=0)), 1.0)
+
+    def __len__(self):
+        return len(self.store)
+
+    def search(self, query, k=4):
+        """Indices of up to k records sharing features with query, best first
+
+        Records the query doesn't match at all are never returned, so a query
+        matching nothing gives [] rather than an arbitrary (most recent) pick.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+
+        columns, counts = np.unique(np.array(features(query), dtype=np.int64), return_counts=True)
+        weights = np.log1p(counts) * self.idf[columns]
+        # Positions of every posting of the query's features, without a Python loop
+        starts = self.indptr[columns]
+        lengths = self.indptr[columns + 1] - starts
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        postings = np.arange(lengths.sum()) + offsets
+        scores = np.bincount(
+            self.rows[postings],
+            weights=self.data[postings] * np.repeat(weights, lengths),
+            minlength=len(self)
+        )
+        k = min(k, int(np.count_nonzero(scores > 0)))
+        if k <= 0:
+            return []
+        scores += self._recency
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])].tolist()
+
+    def context(self, query, k=4):
+        """Prompt-ready summaries of the k most relevant records; empty if none match"""
+        return "\n".join(summary(self.store, i) for i in self.search(query, k))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path=DEFAULT_PATH):
+    """Process-wide index for the dataset at path, rebuilt when the dataset changes
+
+    Raises FileNotFoundError if the dataset does not exist.
+    """
+    key = os.path.abspath(path)
+    store = get_store(key)
+    index = _indexes.get(key)
+    if index is not None and index.version == store.version:
+        return index
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.version != store.version:
+            index = _indexes[key] = RetrievalIndex(store)
+        return index
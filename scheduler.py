@@ -0,0 +1,321 @@
+"""
+EchoLens - Request Scheduler
+Rate limiting, retry with backoff and a circuit breaker in front of Groq calls
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+import groq
+
+from telemetry import metrics
+
+
+class SchedulerError(Exception):
+    """Base class for errors raised by the scheduler itself"""
+
+
+class CircuitOpenError(SchedulerError):
+    """Upstream is considered down; the call was rejected without being sent"""
+
+    def __init__(self, retry_in):
+        self.retry_in = retry_in
+        super().__init__(f"Groq API is unavailable, retrying in {retry_in:.0f}s")
+
+
+class DeadlineExceededError(SchedulerError):
+    """The call could not complete (including waits and retries) before its deadline"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` units per minute"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1, deadline=None):
+        """Block until `amount` units are available and take them
+
+        Requests larger than the bucket only wait for a full bucket, so they
+        can't block forever. Raises DeadlineExceededError if the wait would
+        pass `deadline` (a time.monotonic() value).
+        """
+        amount = min(float(amount), self.capacity)
+        while True:
+            wait = self._take(amount, deadline)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, amount=1, deadline=None):
+        """acquire() for the event loop: waits without blocking other tasks"""
+        amount = min(float(amount), self.capacity)
+        while True:
+            wait = self._take(amount, deadline)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def _take(self, amount, deadline):
+        """Take amount and return 0, or return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._level >= amount:
+                self._level -= amount
+                return 0
+            wait = (amount - self._level) / self.rate
+        if deadline is not None and now + wait > deadline:
+            raise DeadlineExceededError("Rate limit wait would exceed the request deadline")
+        return min(wait, 1.0)
+
+    def adjust(self, amount):
+        """Return (positive) or charge (negative) units after the fact, e.g. actual token usage"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures, probing again after a cool-down"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now; True if it is the probe"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            elapsed = time.monotonic() - self._opened_at
+            # After the cool-down a single probe call is let through
+            if elapsed >= self.reset_timeout and not self._probing:
+                self._probing = True
+                return True
+            raise CircuitOpenError(max(self.reset_timeout - elapsed, 1.0))
+
+    def abort_probe(self):
+        """The probe was never sent (deadline, cancellation): let the next call probe instead"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+def _status_code(error):
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, connection errors and 5xx responses are worth retrying"""
+    if isinstance(error, groq.APIConnectionError):
+        return True
+    status = _status_code(error)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+def is_upstream_failure(error):
+    """Errors that indicate the service is down (rate limits do not count)"""
+    if isinstance(error, groq.APIConnectionError):
+        return True
+    status = _status_code(error)
+    return status is not None and status >= 500
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, from the retry-after header, if any"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:  # HTTP-date form; fall back to our own backoff
+        return None
+    return None
+
+
+class Scheduler:
+    """Runs upstream calls under RPM/TPM limits, retries and a circuit breaker"""
+
+    def __init__(
+        self,
+        requests_per_minute=30,
+        tokens_per_minute=8000,
+        max_attempts=4,
+        base_delay=0.5,
+        max_delay=20.0,
+        deadline=90.0,
+        breaker=None
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+    @classmethod
+    def from_env(cls):
+        """Build a scheduler from ECHOLENS_* environment variables"""
+        return cls(
+            requests_per_minute=float(os.getenv('ECHOLENS_RPM', '30')),
+            tokens_per_minute=float(os.getenv('ECHOLENS_TPM', '8000')),
+            max_attempts=int(os.getenv('ECHOLENS_MAX_ATTEMPTS', '4')),
+            deadline=float(os.getenv('ECHOLENS_REQUEST_DEADLINE', '90')),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('ECHOLENS_BREAKER_FAILURES', '5')),
+                reset_timeout=float(os.getenv('ECHOLENS_BREAKER_RESET', '30'))
+            )
+        )
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for the given (1-based) attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, fn, estimated_tokens=0, deadline=None):
+        """Call fn(timeout) under the limits and return its result
+
+        `timeout` is the time left before the per-call deadline, for use as the
+        HTTP request timeout. Retryable errors are retried with jittered
+        exponential backoff (or the server's retry-after); other errors and
+        the last failure are raised unchanged.
+        """
+        deadline = time.monotonic() + (deadline if deadline is not None else self.deadline)
+
+        for attempt in range(1, self.max_attempts + 1):
+            probe = self._check_breaker()
+            try:
+                self.requests.acquire(1, deadline)
+                self.tokens.acquire(estimated_tokens, deadline)
+                timeout = self._remaining(deadline)
+
+                try:
+                    result = fn(timeout)
+                except Exception as e:
+                    probe = False  # Answered: _retry_delay records the outcome
+                    delay = self._retry_delay(e, attempt, deadline)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    continue
+
+                probe = False
+                self.breaker.record_success()
+                return result
+            finally:
+                # A probe that never got an answer must not leave the circuit half-open for good
+                if probe:
+                    self.breaker.abort_probe()
+
+    async def call_async(self, fn, estimated_tokens=0, deadline=None):
+        """call() for the event loop: fn(timeout) returns an awaitable, waits don't block"""
+        deadline = time.monotonic() + (deadline if deadline is not None else self.deadline)
+
+        for attempt in range(1, self.max_attempts + 1):
+            probe = self._check_breaker()
+            try:
+                await self.requests.acquire_async(1, deadline)
+                await self.tokens.acquire_async(estimated_tokens, deadline)
+                timeout = self._remaining(deadline)
+
+                try:
+                    result = await fn(timeout)
+                except Exception as e:
+                    probe = False  # Answered: _retry_delay records the outcome
+                    delay = self._retry_delay(e, attempt, deadline)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+
+                probe = False
+                self.breaker.record_success()
+                return result
+            finally:
+                # Includes cancellation, which is not an Exception
+                if probe:
+                    self.breaker.abort_probe()
+
+    def _check_breaker(self):
+        try:
+            return self.breaker.before_call()
+        except CircuitOpenError:
+            metrics.inc("llm_circuit_rejections_total")
+            raise
+
+    @staticmethod
+    def _remaining(deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError("Request deadline passed before the call was sent")
+        return remaining
+
+    def _retry_delay(self, error, attempt, deadline):
+        """Seconds to wait before retrying after error, or None to give up and raise it"""
+        # Any HTTP answer other than a 5xx means upstream is reachable
+        if is_upstream_failure(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if not is_retryable(error) or attempt == self.max_attempts:
+            return None
+        delay = retry_after(error)
+        if delay is None:
+            delay = self.backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            return None
+        metrics.inc("llm_retries_total", status=_status_code(error) or "connection")
+        return delay
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Settle the token bucket once the real token count is known"""
+        if actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def stats(self):
+        return {
+            "breaker": self.breaker.state,
+            "requests_available": round(self.requests._level, 1),
+            "tokens_available": round(self.tokens._level, 1),
+        }
@@ -0,0 +1,123 @@
+"""
+EchoLens - Request Coalescing
+Single-flight: concurrent identical requests share one in-flight upstream call
+"""
+
+import threading
+
+
+class _Call:
+    """State of one in-flight call, shared by every caller waiting on it"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.done = False
+        self.result = None
+        self.error = None
+        self.chunks = []
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls by key
+
+    The first caller for a key (the leader) runs the work; callers arriving
+    while it is in flight wait for and share its outcome, including errors.
+    Once the call finishes the key is forgotten, so later calls run again
+    (the response cache is what serves repeated, non-overlapping requests).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def _join(self, key):
+        """Return (call, is_leader) for key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self.leaders += 1
+            return call, True
+
+    def _finish(self, key, call, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        with call.cond:
+            call.result = result
+            call.error = error
+            call.done = True
+            call.cond.notify_all()
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers with the same key"""
+        call, leader = self._join(key)
+
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(key, call, error=e)
+                raise
+            self._finish(key, call, result=result)
+            return result
+
+        with call.cond:
+            call.cond.wait_for(lambda: call.done)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stream(self, key, fn):
+        """Share one streamed response among concurrent callers with the same key
+
+        fn() must return an iterable of chunks. It is consumed on a background
+        thread, so the upstream stream completes (and can be cached) even if the
+        caller that started it stops reading. Every caller receives all chunks
+        from the beginning.
+        """
+        call, leader = self._join(key)
+
+        if leader:
+            threading.Thread(
+                target=self._produce, args=(key, call, fn),
+                name="echolens-stream", daemon=True
+            ).start()
+
+        return self._consume(call)
+
+    def _produce(self, key, call, fn):
+        try:
+            for chunk in fn():
+                with call.cond:
+                    call.chunks.append(chunk)
+                    call.cond.notify_all()
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            return
+        self._finish(key, call)
+
+    def _consume(self, call):
+        index = 0
+        while True:
+            with call.cond:
+                call.cond.wait_for(lambda: call.done or len(call.chunks) > index)
+                chunks = call.chunks[index:]
+                finished = call.done
+            yield from chunks
+            index += len(chunks)
+            if finished and index >= len(call.chunks):
+                break
+        if call.error is not None:
+            raise call.error
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "shared": self.shared,
+            }
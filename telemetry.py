@@ -0,0 +1,188 @@
+"""
+EchoLens - Telemetry
+In-process latency/usage metrics with Prometheus text and JSON export
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Summary:
+    """Count, sum and quantiles over a bounded window of recent observations"""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = []
+        self._next = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        # Ring buffer: quantiles reflect the most recent `window` observations
+        if len(self._samples) < self.window:
+            self._samples.append(value)
+        else:
+            self._samples[self._next] = value
+            self._next = (self._next + 1) % self.window
+
+    def snapshot(self):
+        snapshot = {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+        }
+        ordered = sorted(self._samples)
+        for q in QUANTILES:
+            value = ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+            snapshot[f"p{int(q * 100)}"] = round(value, 6)
+        return snapshot
+
+
+class Registry:
+    """Thread-safe collection of labelled counters and summaries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._summaries = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary()
+            summary.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Record the duration of the with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def to_json(self):
+        """Metrics as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "summaries": [
+                    {"name": name, "labels": dict(labels), **summary.snapshot()}
+                    for (name, labels), summary in sorted(self._summaries.items())
+                ],
+            }
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+        data = self.to_json()
+
+        def fmt_labels(labels, **extra):
+            labels = {**labels, **extra}
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+        typed = set()
+        for counter in data["counters"]:
+            name = f"echolens_{counter['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{fmt_labels(counter['labels'])} {counter['value']}")
+
+        for summary in data["summaries"]:
+            name = f"echolens_{summary['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            for q in QUANTILES:
+                quantile = fmt_labels(summary["labels"], quantile=q)
+                lines.append(f"{name}{quantile} {summary[f'p{int(q * 100)}']}")
+            lines.append(f"{name}_sum{fmt_labels(summary['labels'])} {summary['sum']}")
+            lines.append(f"{name}_count{fmt_labels(summary['labels'])} {summary['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+class SectionTimer:
+    """Records the time between successive marks, e.g. sections of a script run"""
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self._last = time.perf_counter()
+
+    def mark(self, section):
+        now = time.perf_counter()
+        self.registry.observe(self.name, now - self._last, section=section)
+        self._last = now
+
+
+# Process-wide registry used by EchoLens modules
+metrics = Registry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(metrics.to_json()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the app log
+
+
+def serve_metrics(port=None, host="0.0.0.0"):
+    """Serve /metrics (Prometheus) and /metrics.json on a background thread
+
+    Uses ECHOLENS_METRICS_PORT when no port is given; returns the server, or
+    None if no port is configured.
+    """
+    port = port if port is not None else os.getenv('ECHOLENS_METRICS_PORT')
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="echolens-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from types import SimpleNamespace
+
+from async_client import AsyncEchoLensAI
+from groq_client import EchoLensAI
+from response_cache import ResponseCache
+from scheduler import Scheduler
+
+
+def chunk(text=None, finish_reason=None, usage=None):
+    choices = [] if usage else [SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=finish_reason)]
+    return SimpleNamespace(choices=choices, x_groq=SimpleNamespace(usage=usage) if usage else None)
+
+
+class FakeAsyncCompletions:
+    def __init__(self, finish_reason="stop", content="ab"):
+        self.finish_reason = finish_reason
+        self.content = content
+        self.calls = 0
+
+    async def create(self, stream=False, **params):
+        self.calls += 1
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=2, total_tokens=12)
+        if not stream:
+            return SimpleNamespace(
+                choices=[SimpleNamespace(finish_reason=self.finish_reason, message=SimpleNamespace(content=self.content))],
+                usage=usage
+            )
+
+        async def chunks():
+            yield chunk("a")
+            yield chunk("b", finish_reason=self.finish_reason)
+            yield chunk(usage=usage)
+
+        return chunks()
+
+
+def clients(completions):
+    ai = EchoLensAI(
+        cache=ResponseCache(),
+        client=SimpleNamespace(),
+        scheduler=Scheduler(requests_per_minute=6000, tokens_per_minute=10_000_000)
+    )
+    settled = []
+    ai.scheduler.record_usage = lambda estimated, actual: settled.append(actual)
+    return ai, AsyncEchoLensAI(ai, SimpleNamespace(chat=SimpleNamespace(completions=completions))), settled
+
+
+async def collect(chunks):
+    return [text async for text in chunks]
+
+
+def test_stream_settles_usage_and_caches():
+    completions = FakeAsyncCompletions()
+    ai, client, settled = clients(completions)
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert asyncio.run(collect(client._stream(messages, max_tokens=100))) == ["a", "b"]
+    assert settled == [12]
+    assert asyncio.run(client._complete(messages, max_tokens=100)) == "ab"  # Cached by the stream
+    assert completions.calls == 1
+
+
+def test_cut_off_stream_is_not_cached():
+    completions = FakeAsyncCompletions(finish_reason="length")
+    ai, client, settled = clients(completions)
+    messages = [{"role": "user", "content": "hi"}]
+
+    asyncio.run(collect(client._stream(messages, max_tokens=100)))
+    model, key = ai.request_key(messages, None, {"max_tokens": 100})
+    assert ai.cache.get(key) is None
+
+
+def test_complete_settles_usage():
+    completions = FakeAsyncCompletions()
+    ai, client, settled = clients(completions)
+    assert asyncio.run(client._complete([{"role": "user", "content": "hi"}], max_tokens=100)) == "ab"
+    assert settled == [12]
+
+
+class FakeCompletions:
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def create(self, stream=False, **params):
+        self.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(finish_reason="stop", message=SimpleNamespace(content=self.content))],
+            usage=None
+        )
+
+
+def test_malformed_structured_prediction_is_not_cached():
+    completions = FakeAsyncCompletions(content="not json")
+    ai, client, settled = clients(completions)
+    ai.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions("{}")))
+    request = ai.prediction_request("Kenya", 100, 30, structured=True)
+    params = {name: value for name, value in request.items() if name not in ("messages", "cache_messages")}
+    model, key = ai.request_key(request["messages"], None, params, request.get("cache_messages"))
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            asyncio.run(client.predict("Kenya", 100, 30, structured=True))
+    assert completions.calls == 2  # Asked again rather than served the bad answer
+    with pytest.raises(ValueError):
+        ai.predict_outbreak("Kenya", 100, 30, structured=True)
+    with pytest.raises(ValueError):
+        ai.warm(request, "predict")
+    assert ai.client.chat.completions.calls == 2
+    assert ai.cache.get(key) is None
@@ -0,0 +1,114 @@
+import socket
+import socketserver
+import threading
+
+import pytest
+
+from cache_backends import ACQUIRE_SCRIPT, CacheBackendError, RedisBackend
+
+
+class PingServer(socketserver.ThreadingTCPServer):
+    """Answers PING on every connection; drop() closes them all, like an idle timeout"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.connections = []
+        super().__init__(("127.0.0.1", 0), PingHandler)
+
+    def drop(self):
+        for connection in self.connections:
+            connection.shutdown(socket.SHUT_RDWR)
+            connection.close()
+
+    def reply(self, args):
+        """Reply to a command, or None to close the connection instead"""
+        return b"+PONG\r\n"
+
+
+class LockServer(PingServer):
+    """Runs the acquire script; drop_reply closes the connection after running it, before replying"""
+
+    def __init__(self):
+        self.locks = {}
+        self.drop_reply = False
+        super().__init__()
+
+    def reply(self, args):
+        if args[0] != b"EVAL":
+            return super().reply(args)
+        assert args[1].decode() == ACQUIRE_SCRIPT
+        key, token = args[3], args[4]
+        held = self.locks.setdefault(key, token)
+        if self.drop_reply:
+            self.drop_reply = False
+            return None
+        return b":1\r\n" if held == token else b":0\r\n"
+
+
+class PingHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.connections.append(self.request)
+        try:
+            while True:
+                header = self.rfile.readline()
+                if not header:
+                    return
+                args = []
+                for _ in range(int(header[1:])):
+                    self.rfile.readline()  # $length
+                    args.append(self.rfile.readline()[:-2])
+                reply = self.server.reply(args)
+                if reply is None:
+                    self.request.shutdown(socket.SHUT_RDWR)
+                    return
+                self.wfile.write(reply)
+        except (OSError, ValueError):
+            return
+
+
+@pytest.fixture
+def server():
+    server = PingServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_dropped_idle_connection_is_replaced(server):
+    backend = RedisBackend(f"redis://127.0.0.1:{server.server_address[1]}/0")
+    assert backend.ping()
+    assert len(backend._idle) == 1
+
+    server.drop()
+    assert backend.ping()
+    assert len(server.connections) == 2
+
+
+def test_acquire_retried_after_reaching_the_server_still_gets_the_lock():
+    server = LockServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        backend = RedisBackend(f"redis://127.0.0.1:{server.server_address[1]}/0")
+        assert backend.ping()
+
+        # The lock is taken, but the connection drops before the reply: the retry must not see it as someone else's
+        server.drop_reply = True
+        token = backend.acquire("job", 10)
+        assert token is not None
+        assert len(server.connections) == 2  # Sent again on a new connection
+        assert server.locks[b"echolens:lock:job"] == token.encode()
+        assert backend.acquire("job", 10) is None
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unreachable_server_raises():
+    with socket.socket() as free:
+        free.bind(("127.0.0.1", 0))
+        port = free.getsockname()[1]
+    with pytest.raises(CacheBackendError):
+        RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=1).ping()
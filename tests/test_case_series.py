@@ -0,0 +1,76 @@
+import math
+
+import numpy as np
+import pytest
+
+from case_series import CaseSeries, doubling_time, effective_reproduction, growth_rate, rolling_sum
+
+
+def ingest(tmp_path, header, rows):
+    path = tmp_path / "cases.csv"
+    path.write_text("\n".join([header] + [",".join(map(str, row)) for row in rows]) + "\n", encoding="utf-8")
+    return CaseSeries.ingest(str(path), str(tmp_path / "series"), chunk_rows=2)
+
+
+def test_aliases_merge_but_similar_names_stay_apart(tmp_path):
+    series = ingest(tmp_path, "region,date,new_cases", [
+        ("USA", "2024-01-01", 3),
+        ("United States", "2024-01-01", 4),
+        ("India", "2024-01-01", 5),
+        ("Indiana", "2024-01-01", 7),
+        ("Siberia", "2024-01-02", 2),
+        ("Liberia", "2024-01-02", 1),
+    ])
+    assert sorted(series.regions) == ["India", "Indiana", "Liberia", "Siberia", "United States"]
+    assert series.daily[series.index("u.s.a.")].tolist() == [7, 0]
+    assert series.daily[series.index("Indiana")].tolist() == [7, 0]
+    assert series.daily[series.index("India")].tolist() == [5, 0]
+    assert series.index("Siberia") != series.index("Liberia")
+    assert series.index("Nigeria") is None
+
+
+def test_cumulative_totals_become_daily_cases(tmp_path):
+    series = ingest(tmp_path, "country,date,total_cases", [
+        ("Kenya", "2024-01-01", 10),
+        ("Kenya", "2024-01-03", 15),
+        ("Kenya", "2024-01-02", 15),
+        ("Kenya", "2024-01-04", 30),
+        # The same totals reported again under an alias are not counted twice
+        ("USA", "2024-01-01", 10),
+        ("United States", "2024-01-01", 10),
+        ("United States", "2024-01-02", 16),
+    ])
+    assert series.daily[series.index("Kenya")].tolist() == [10, 5, 0, 15]
+    # A missing day keeps the previous total rather than dropping to zero
+    assert series.daily[series.index("United States")].tolist() == [10, 6, 0, 0]
+
+
+def test_rolling_sum():
+    sums = rolling_sum([1, 2, 3, 4], 2)
+    assert math.isnan(sums[0])
+    assert sums[1:].tolist() == [3, 5, 7]
+    assert np.isnan(rolling_sum([1, 2], 3)).all()
+
+
+def test_growth_rate_and_doubling_time():
+    daily = 100 * np.exp(0.1 * np.arange(28))
+    rate = growth_rate(daily)
+    assert np.isnan(rate[:7]).all()
+    assert rate[-1] == pytest.approx(0.1)
+    assert doubling_time(rate[-1]) == pytest.approx(math.log(2) / 0.1)
+    assert doubling_time(-0.1) == pytest.approx(-math.log(2) / 0.1)
+    assert doubling_time(0.0) == math.inf
+    assert math.isnan(growth_rate(np.zeros(28))[-1])
+
+
+def test_effective_reproduction():
+    rt, lower, upper = effective_reproduction(np.full(60, 100.0))
+    assert rt[-1] == pytest.approx(1.0, abs=0.01)
+    assert lower[-1] < 1 < upper[-1]
+
+    rt, lower, upper = effective_reproduction(100 * np.exp(0.1 * np.arange(60)))
+    assert lower[-1] > 1
+
+    # Too few cases to say
+    rt, lower, upper = effective_reproduction(np.ones(60))
+    assert np.isnan(rt).all()
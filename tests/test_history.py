@@ -0,0 +1,31 @@
+from history import HistoryStore
+from prediction import PredictionResult
+
+
+RESULT = PredictionResult(
+    risk_score=50, risk_level="Medium", probability_30d=10, probability_60d=20, probability_90d=30,
+    spread_pattern="", narrative="", recommendations={"immediate": [], "short_term": [], "long_term": []}
+)
+
+ALIASES = {"usa": "United States", "united states": "United States", "us": "United States"}
+
+
+def record(history, region, cases=100):
+    history.record(region, cases, 90, RESULT, "", model="m")
+
+
+def test_popular_counts_aliases_as_one_region():
+    history = HistoryStore(":memory:")
+    for region in ("USA", "US", "United States"):
+        record(history, region)
+    record(history, "Europe")
+    record(history, "Europe")
+    record(history, "Kenya", cases=900)
+
+    popular = history.popular(2, canonical=lambda region: ALIASES.get(region.casefold(), region))
+    assert [entry["runs"] for entry in popular] == [3, 2]
+    # Settings of the latest run of that region
+    assert popular[0]["region"] == "United States"
+
+    # Without canonical names only case differences are merged
+    assert history.popular(1)[0]["region"] == "Europe"
@@ -0,0 +1,75 @@
+import sqlite3
+import time
+
+from jobs import FAILED, QUEUED, JobRunner, JobStore
+
+
+PARAMS = {"region": "Europe", "current_cases": 100}
+
+
+def test_live_owners_jobs_are_left_alone(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    other = JobStore(path)
+    job_id = other.create(PARAMS, owner="other-process")
+
+    runner = JobRunner(None, JobStore(path), stale_after=60)
+    try:
+        assert runner.store.get(job_id).status == QUEUED
+        assert runner.store.find_unfinished(PARAMS, alive_since=time.time() - 60) == job_id
+    finally:
+        runner.close()
+
+
+def test_stale_jobs_are_failed(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    job_id = store.create(PARAMS, owner="stopped-process")
+    store._conn.execute("UPDATE jobs SET heartbeat = ?", (time.time() - 120,))
+    store._conn.commit()
+
+    # Not joined by new submissions either
+    assert store.find_unfinished(PARAMS, alive_since=time.time() - 60) is None
+
+    runner = JobRunner(None, JobStore(path), stale_after=60)
+    try:
+        job = runner.store.get(job_id)
+        assert job.status == FAILED and job.error_type == "Interrupted"
+    finally:
+        runner.close()
+
+
+def test_heartbeat_keeps_own_jobs_alive(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    runner = JobRunner(None, JobStore(path), stale_after=0.2)
+    try:
+        job_id = runner.store.create(PARAMS, owner=runner.owner)
+        time.sleep(0.5)
+        assert runner.store.get(job_id).status == QUEUED
+        # Once its runner stops, another one fails it
+        runner.close()
+        time.sleep(0.3)
+        other = JobRunner(None, JobStore(path), stale_after=0.2)
+        other.close()
+        assert other.store.get(job_id).status == FAILED
+    finally:
+        runner.close()
+
+
+def test_tables_without_owners_are_migrated(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, "
+        "progress TEXT NOT NULL DEFAULT '', result TEXT, error TEXT, error_type TEXT, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO jobs (id, status, params, created_at, updated_at) VALUES ('old', ?, '{}', ?, ?)",
+        (QUEUED, time.time(), time.time())
+    )
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    assert store.get("old").status == QUEUED
+    assert store.create(PARAMS, owner="me")
@@ -0,0 +1,25 @@
+import pytest
+
+from prewarm import PrewarmBudget
+from scheduler import Scheduler
+
+
+def test_budget_is_a_share_of_the_scheduler_limits():
+    budget = PrewarmBudget(Scheduler(requests_per_minute=40, tokens_per_minute=8000), share=0.25)
+    assert budget.requests.rate * 60 == pytest.approx(10)
+    assert budget.tokens.rate * 60 == pytest.approx(2000)
+
+
+def test_budget_counts_tokens_not_requests():
+    budget = PrewarmBudget(Scheduler(requests_per_minute=6000, tokens_per_minute=8000), share=0.25)
+    budget.acquire(1500)
+    # The next request is due in milliseconds, 1500 more tokens only in about 30 seconds
+    assert budget.tokens._level == pytest.approx(500, abs=1)
+    assert budget.tokens._take(1500, None) > 0
+
+
+def test_request_larger_than_the_share_is_owed():
+    budget = PrewarmBudget(Scheduler(requests_per_minute=6000, tokens_per_minute=8000), share=0.25)
+    budget.acquire(5000)
+    # 3000 tokens over the 2000-token bucket: about 1.5 minutes before the next call
+    assert budget.tokens._level < -2900
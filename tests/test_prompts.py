@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from groq_client import EchoLensAI
+from prompts import PREDICTION_SECTIONS, STRUCTURED_TOKENS, PromptBuilder
+from response_cache import ResponseCache
+from scheduler import Scheduler
+
+
+def test_reasoning_room_depends_on_model():
+    builder = PromptBuilder()
+    assert builder.reasoning_for("openai/gpt-oss-120b") > 0
+    assert builder.reasoning_for("llama-3.1-8b-instant") == 0
+    assert PromptBuilder(reasoning_tokens=64).reasoning_for("openai/gpt-oss-120b") == 64
+
+
+def test_large_model_keeps_room_to_answer():
+    # The full prediction had max_tokens=2000 before per-section allowances
+    builder = PromptBuilder()
+    plain = builder.prediction("Europe", 100, 90, "", model="openai/gpt-oss-120b")
+    structured = builder.prediction("Europe", 100, 90, "", structured=True, model="openai/gpt-oss-120b")
+    assert plain.max_tokens >= 2000
+    assert structured.max_tokens == plain.max_tokens + STRUCTURED_TOKENS
+    small = builder.prediction("Europe", 100, 90, "", model="llama-3.1-8b-instant")
+    assert small.max_tokens == sum(s.tokens for s in PREDICTION_SECTIONS)
+
+
+class FakeCompletions:
+    """Answers with finish_reason "length" until max_tokens reaches enough"""
+
+    def __init__(self, enough):
+        self.enough = enough
+        self.max_tokens = []
+
+    def create(self, max_tokens=None, **params):
+        self.max_tokens.append(max_tokens)
+        finish_reason = "stop" if max_tokens >= self.enough else "length"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(finish_reason=finish_reason, message=SimpleNamespace(content=finish_reason))],
+            usage=None
+        )
+
+
+def client(completions):
+    ai = EchoLensAI(
+        cache=ResponseCache(),
+        client=SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+        scheduler=Scheduler(requests_per_minute=6000, tokens_per_minute=10_000_000)
+    )
+    ai.prompts = PromptBuilder(budget=4000)
+    return ai
+
+
+def test_truncated_response_is_retried_with_more_tokens():
+    completions = FakeCompletions(enough=1500)
+    ai = client(completions)
+    messages = [{"role": "user", "content": "hi"}]
+    assert ai._complete(messages, max_tokens=1000) == "stop"
+    assert completions.max_tokens == [1000, 2000]
+    assert ai._complete(messages, max_tokens=1000) == "stop"  # Cached under the original request
+    assert len(completions.max_tokens) == 2
+
+
+def test_still_truncated_response_is_not_cached():
+    completions = FakeCompletions(enough=10_000)
+    ai = client(completions)
+    messages = [{"role": "user", "content": "hi"}]
+    assert ai._complete(messages, max_tokens=3000) == "length"
+    # The retry stays within the token budget
+    assert completions.max_tokens[0] == 3000 and completions.max_tokens[1] < 4000
+    ai._complete(messages, max_tokens=3000)
+    assert len(completions.max_tokens) == 4
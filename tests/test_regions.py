@@ -0,0 +1,61 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from groq_client import EchoLensAI
+from regions import Canonicalizer, Gazetteer, edit_distance
+from response_cache import ResponseCache
+
+
+GAZETTEER = os.path.join(os.path.dirname(__file__), os.pardir, "data", "regions.json")
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer.from_file(GAZETTEER)
+
+
+@pytest.mark.parametrize("spelling", ["USA", "U.S.A.", "united states", "Untied States"])
+def test_aliases_and_misspellings_merge(gazetteer, spelling):
+    assert gazetteer.resolve(spelling)[0] == "United States"
+
+
+@pytest.mark.parametrize("spelling, name", [
+    ("south-east asia", "Southeast Asia"),
+    ("Phillipines", "Philippines"),
+    ("Nigerai", "Nigeria"),
+])
+def test_near_misspellings_match(gazetteer, spelling, name):
+    assert gazetteer.resolve(spelling)[0] == name
+
+
+@pytest.mark.parametrize("place", ["Lagos", "Indiana", "Siberia", "Iberia"])
+def test_other_places_resolve_to_themselves(gazetteer, place):
+    assert gazetteer.resolve(place) == (place, "unknown")
+
+
+def test_exact_only_resolution(gazetteer):
+    assert gazetteer.resolve("Phillipines", fuzzy=False) == ("Phillipines", "unknown")
+    assert gazetteer.resolve("USA", fuzzy=False) == ("United States", "exact")
+
+
+def test_edit_distance():
+    assert edit_distance("nigeria", "nigerai", 2) == 1
+    assert edit_distance("indiana", "india", 1) == 2
+    assert edit_distance("lagos", "laos", 3) == 1
+
+
+def test_prompt_keeps_exact_count_and_key_uses_bucket(gazetteer):
+    ai = EchoLensAI(cache=ResponseCache(), client=SimpleNamespace())
+    ai.canonicalizer = Canonicalizer(gazetteer)
+
+    first = ai.prediction_request("Kenya", 1500, 90)
+    second = ai.prediction_request("Kenya", 1510, 90)
+    assert "1,510" in second["messages"][-1]["content"]
+    assert ai.request_key(first["messages"], None, {}, first.get("cache_messages")) == \
+        ai.request_key(second["messages"], None, {}, second.get("cache_messages"))
+
+    description = ai.describe("Kenya", 1510)
+    assert str(description) == "Region: Kenya, Cases: 1510"
+    assert description.key != description.text
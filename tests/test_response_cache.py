@@ -0,0 +1,64 @@
+import threading
+import time
+
+from cache_backends import CacheBackendError, MemoryBackend
+from response_cache import ResponseCache
+
+
+def test_get_set_and_expiry():
+    cache = ResponseCache(ttl=0.05)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    time.sleep(0.06)
+    assert cache.get("k") is None
+
+
+def test_claim_without_shared_backend_fetches_directly():
+    cache = ResponseCache()
+    assert cache.claim("k") == (None, None)
+
+
+def test_claim_leader_then_waiter_gets_value():
+    shared = MemoryBackend()
+    leader_cache = ResponseCache(backend=shared, poll_interval=0.01)
+    waiter_cache = ResponseCache(backend=shared, poll_interval=0.01)
+
+    value, token = leader_cache.claim("k")
+    assert value is None and token is not None
+
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(claim=waiter_cache.claim("k")))
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()  # Waiting for the leader's fetch
+
+    leader_cache.set("k", "fetched")
+    leader_cache.release("k", token)
+    waiter.join(1)
+    assert result["claim"] == ("fetched", None)
+
+
+def test_claim_times_out_when_leader_never_finishes():
+    shared = MemoryBackend()
+    ResponseCache(backend=shared).claim("k")
+    started = time.monotonic()
+    assert ResponseCache(backend=shared, lock_ttl=0.1, poll_interval=0.01).claim("k") == (None, None)
+    assert time.monotonic() - started < 0.5
+
+
+class FailingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        raise CacheBackendError("down")
+
+
+def test_failing_backend_is_a_miss_and_skipped_for_a_while():
+    backend = FailingBackend()
+    cache = ResponseCache(backend=backend, retry_after=60)
+    assert cache.get("k") is None
+    assert cache.claim("k") == (None, None)
+    assert backend.calls == 1
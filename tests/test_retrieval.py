@@ -0,0 +1,48 @@
+import os
+
+from groq_client import describe_outbreak
+from pandemic_store import get_store
+from retrieval import RetrievalIndex, spread_profile
+
+
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, "data", "pandemics.json")
+
+FAST_TREND = "300 new cases in the last 7 days; growth +12.0%/day, doubling every 5.8 days; Rt 1.90 (95% CrI 1.70-2.10)"
+
+
+def index():
+    return RetrievalIndex(get_store(os.path.abspath(DATASET)))
+
+
+def names(index, query, k=4):
+    return [index.store.columns["name"][i] for i in index.search(query, k)]
+
+
+def test_region_alone_matches_nothing():
+    # The dataset has no geography: no arbitrary (most recent) records instead
+    assert index().search(describe_outbreak("Southeast Asia", 1500)) == []
+    assert index().context("Region: Europe, Cases: 100") == ""
+
+
+def test_pathogen_hint_selects_records():
+    found = names(index(), describe_outbreak("Europe", 100, "novel influenza"))
+    assert found and all("Flu" in name for name in found)
+
+
+def test_only_matching_records_are_returned():
+    found = names(index(), describe_outbreak("Peru", 100, "waterborne"), k=10)
+    assert "Third Cholera Pandemic" in found
+    assert "Spanish Flu" not in found
+
+
+def test_spread_profile():
+    assert "respiratory" in spread_profile(FAST_TREND)
+    assert spread_profile("growth +1.0%/day, doubling every 69.7 days") == "contact"
+    assert spread_profile("growth -3.0%/day, halving every 23.1 days") == ""
+    assert spread_profile(None) == ""
+
+
+def test_fast_trend_ranks_respiratory_pandemics():
+    description = describe_outbreak("Europe", 100, trend=FAST_TREND)
+    found = names(index(), f"{description} {spread_profile(description)}")
+    assert found and "COVID-19" in found
@@ -0,0 +1,223 @@
+import asyncio
+import time
+
+import pytest
+
+from scheduler import CircuitBreaker, CircuitOpenError, DeadlineExceededError, Scheduler, TokenBucket
+
+
+class UpstreamError(Exception):
+    """Stand-in for a groq.APIStatusError"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = None
+
+
+def scheduler(**kwargs):
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    kwargs.setdefault("max_attempts", 1)
+    return Scheduler(requests_per_minute=6000, tokens_per_minute=10**6, **kwargs)
+
+
+def fail(timeout):
+    raise UpstreamError(500)
+
+
+def open_breaker(s):
+    with pytest.raises(UpstreamError):
+        s.call(fail)
+    assert s.breaker.state == "open"
+    time.sleep(0.06)
+    assert s.breaker.state == "half-open"
+
+
+# TokenBucket
+
+def test_bucket_takes_without_waiting_while_full():
+    bucket = TokenBucket(60, capacity=3)
+    started = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.05
+
+
+def test_bucket_waits_for_refill():
+    bucket = TokenBucket(600, capacity=1)  # 10 per second
+    bucket.acquire()
+    started = time.monotonic()
+    bucket.acquire()
+    assert 0.05 < time.monotonic() - started < 0.5
+
+
+def test_bucket_raises_when_wait_passes_deadline():
+    bucket = TokenBucket(1, capacity=1)
+    bucket.acquire()
+    with pytest.raises(DeadlineExceededError):
+        bucket.acquire(deadline=time.monotonic() + 0.1)
+
+
+def test_bucket_caps_requests_larger_than_capacity():
+    bucket = TokenBucket(60, capacity=5)
+    bucket.acquire(50, deadline=time.monotonic() + 0.1)
+
+
+def test_bucket_async_waits_without_blocking_the_loop():
+    bucket = TokenBucket(600, capacity=1)
+    bucket.acquire()
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(bucket.acquire_async(), ticker())
+
+    asyncio.run(main())
+    assert len(ticks) == 5
+
+
+# CircuitBreaker
+
+def test_breaker_opens_after_threshold_and_probes_after_cool_down():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    assert breaker.before_call() is True
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_aborted_probe_lets_next_call_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.before_call() is True
+    breaker.abort_probe()
+    assert breaker.before_call() is True
+
+
+# Scheduler
+
+def test_call_retries_server_errors():
+    s = scheduler(max_attempts=3, base_delay=0.01, breaker=CircuitBreaker(failure_threshold=5))
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise UpstreamError(503)
+        return "ok"
+
+    assert s.call(flaky) == "ok"
+    assert len(attempts) == 3
+
+
+def test_call_does_not_retry_client_errors():
+    s = scheduler(max_attempts=3)
+    attempts = []
+
+    def bad_request(timeout):
+        attempts.append(timeout)
+        raise UpstreamError(400)
+
+    with pytest.raises(UpstreamError):
+        s.call(bad_request)
+    assert len(attempts) == 1
+    assert s.breaker.state == "closed"
+
+
+def test_call_passes_remaining_deadline_as_timeout():
+    s = scheduler()
+    assert s.call(lambda timeout: timeout, deadline=5) <= 5
+
+
+def test_call_deadline_exceeded_while_waiting_for_rate_limit():
+    s = Scheduler(requests_per_minute=1, tokens_per_minute=10**6, max_attempts=1)
+    s.call(lambda timeout: "first")
+    with pytest.raises(DeadlineExceededError):
+        s.call(lambda timeout: "second", deadline=0.1)
+
+
+def test_open_circuit_rejects_without_calling():
+    s = scheduler(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    with pytest.raises(UpstreamError):
+        s.call(fail)
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        s.call(calls.append)
+    assert calls == []
+
+
+def test_successful_probe_closes_circuit():
+    s = scheduler()
+    open_breaker(s)
+    assert s.call(lambda timeout: "ok") == "ok"
+    assert s.breaker.state == "closed"
+
+
+def test_probe_stopped_by_deadline_does_not_wedge_circuit():
+    s = scheduler()
+    open_breaker(s)
+    # Drain the request bucket so the probe can't be sent before its deadline
+    s.requests._level = 0
+    s.requests.rate = 1 / 60
+    with pytest.raises(DeadlineExceededError):
+        s.call(lambda timeout: "never sent", deadline=0.01)
+
+    s.requests.rate = 100.0
+    s.requests._level = 1
+    assert s.call(lambda timeout: "ok") == "ok"
+    assert s.breaker.state == "closed"
+
+
+def test_cancelled_async_probe_does_not_wedge_circuit():
+    s = scheduler()
+    open_breaker(s)
+
+    async def hang(timeout):
+        await asyncio.sleep(10)
+
+    async def succeed(timeout):
+        return "ok"
+
+    async def main():
+        task = asyncio.ensure_future(s.call_async(hang))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await s.call_async(succeed)
+
+    assert asyncio.run(main()) == "ok"
+    assert s.breaker.state == "closed"
+
+
+def test_record_usage_returns_unused_tokens():
+    s = Scheduler(requests_per_minute=60, tokens_per_minute=1000)
+    s.call(lambda timeout: None, estimated_tokens=800)
+    level = s.tokens._level
+    s.record_usage(800, 300)
+    assert s.tokens._level == pytest.approx(min(1000, level + 500), abs=5)
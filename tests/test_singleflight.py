@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def run_concurrently(n, target):
+    results = [None] * n
+    errors = [None] * n
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    results, errors = run_concurrently(8, lambda: flight.do("key", slow))
+    assert results == ["answer"] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "shared": 7}
+
+
+def test_errors_are_shared_and_key_is_forgotten():
+    flight = SingleFlight()
+
+    def broken():
+        time.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    _, errors = run_concurrently(4, lambda: flight.do("key", broken))
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.do("key", lambda: "recovered") == "recovered"
+
+
+def test_stream_replays_every_chunk_to_late_joiners():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def chunks():
+        started.set()
+        for word in ("a", "b", "c"):
+            time.sleep(0.03)
+            yield word
+
+    first = flight.stream("key", chunks)
+    started.wait()
+    second = flight.stream("key", lambda: iter(["unused"]))
+    assert list(first) == ["a", "b", "c"]
+    assert list(second) == ["a", "b", "c"]
+
+
+def test_stream_error_reaches_readers():
+    flight = SingleFlight()
+
+    def chunks():
+        yield "partial"
+        raise RuntimeError("stream broke")
+
+    reader = flight.stream("key", chunks)
+    with pytest.raises(RuntimeError):
+        list(reader)